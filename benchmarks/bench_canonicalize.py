@@ -0,0 +1,73 @@
+import argparse
+import copy
+import os
+import re
+import sys
+import time
+import uuid
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[:-2]))
+
+from benchmarks.synthetic import make_figures
+from src.canonicalize import Canonicalizer
+
+IGNORE_PATHS = [
+    "root\\['requestId']",
+    "root\\['figures'\\]\\['\\[\\d+,\\d+\\)'\\]",
+    "root\\['figures'\\]\\['layout'\\]\\['margin'\\].*",
+    "root\\['figures'\\]\\['data'\\]\\[\\d+\\]\\['error_y'\\]\\['width'\\]",
+]
+RULES = [
+    {"type": "replace", "pattern": "c_c_[0-9a-f]{32}", "replacement": "c_c_COHORT"},
+    {"type": "round", "digits": 4, "path": "root\\['figures'\\]\\['data'\\]"},
+    {"type": "sort_list", "path": "root\\['figures'\\]\\['data'\\]", "key": "name"},
+]
+
+
+def make_report(traces, points):
+    """Generates report data with a plotly-like `figures` section of `traces` traces of `points` points each."""
+    return {"requestId": str(uuid.uuid4()), "type": "lab", "figures": make_figures(traces, points)}
+
+
+def legacy_normalize(figures):
+    """The figures normalization the comparer used before the canonicalizer."""
+    if isinstance(figures, dict):
+        return {k: legacy_normalize(v) for k, v in figures.items()}
+    elif isinstance(figures, list):
+        return [legacy_normalize(elem) for elem in figures]
+    elif isinstance(figures, str):
+        return re.sub(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", "PLACEHOLDER", figures)
+    return figures
+
+
+def bench(label, func, report, repeats):
+    """Prints the best time of `func` over copies of the report."""
+    best = None
+    for _ in range(repeats):
+        data = copy.deepcopy(report)
+        started = time.perf_counter()
+        func(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label}: {best * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the canonicalization of large figures payloads.")
+    parser.add_argument("--traces", type=int, default=50, help="Number of traces in the figures")
+    parser.add_argument("--points", type=int, default=5000, help="Number of points per trace")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    report = make_report(args.traces, args.points)
+    print(f"{args.traces} traces of {args.points} points")
+    bench("legacy figures normalization", lambda data: legacy_normalize(data["figures"]), report, args.repeats)
+    bench("canonicalizer, UUIDs only", Canonicalizer().canonicalize, report, args.repeats)
+    bench("canonicalizer, with ignore paths", Canonicalizer(IGNORE_PATHS).canonicalize, report, args.repeats)
+    bench("canonicalizer, all rules", Canonicalizer(IGNORE_PATHS, float_digits=6, sort_keys=True).canonicalize, report, args.repeats)
+    bench("canonicalizer, normalization rules", Canonicalizer(IGNORE_PATHS, rules=RULES).canonicalize, report, args.repeats)
+    bench("lossless (outputs)", Canonicalizer.lossless().canonicalize, report, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[:-2]))
+
+from benchmarks.synthetic import make_rows
+from src.utils import json_to_csv
+
+
+def bench(rows, repeats):
+    """Returns the best export throughput in rows per second."""
+    best = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "bench.csv")
+        for _ in range(repeats):
+            started = time.perf_counter()
+            json_to_csv(rows, csv_path)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    return len(rows) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CSV export of report data.")
+    parser.add_argument("--rows", type=int, default=200000, help="Number of rows to export")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    for label, heterogeneous_every in (("homogeneous", 0), ("heterogeneous", 7)):
+        rows = make_rows(args.rows, heterogeneous_every)
+        print(f"{label}: {bench(rows, args.repeats):,.0f} rows/s ({args.rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = "/".join(os.path.realpath(__file__).split("/")[:-2])
+
+# Code path -> (imports run by that path, modules it must not load)
+SCENARIOS = {
+    "cli": ("import wiser_tester", ("socketio", "httpx", "deepdiff", "pandas")),
+    "replay": (
+        "import wiser_tester; from src.tester import WiserTester; from src.shard import ShardCoordinator",
+        ("deepdiff", "pandas"),
+    ),
+    "compare": ("import wiser_tester; from src.compare import Compare", ("socketio", "httpx", "pandas")),
+}
+PROBE = "import json, sys; {imports}; print(json.dumps([m for m in {forbidden!r} if m in sys.modules]))"
+
+
+def time_command(command, repeats):
+    """Runs a command in a fresh process `repeats` times, returns the best wall time and the last output."""
+    best, output = None, ""
+    for _ in range(repeats):
+        started = time.perf_counter()
+        output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of wiser_tester and its code paths.")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of runs, the best one is reported")
+    parser.add_argument("--exe", help="Path to the packaged executable, its `--help` start is timed")
+    parser.add_argument("--budget", type=float, help="Cold start budget in seconds, exits with an error when exceeded")
+    args = parser.parse_args()
+
+    failed = False
+    for name, (imports, forbidden) in SCENARIOS.items():
+        elapsed, output = time_command([sys.executable, "-c", PROBE.format(imports=imports, forbidden=forbidden)], args.repeats)
+        loaded = json.loads(output)
+        failed |= bool(loaded)
+        print(f"{name}: {elapsed * 1000:.0f} ms{f', unexpectedly loaded {loaded}' if loaded else ''}")
+
+    elapsed, _ = time_command([sys.executable, "wiser_tester.py", "--help"], args.repeats)
+    print(f"wiser_tester.py --help: {elapsed * 1000:.0f} ms")
+    if args.exe:
+        elapsed, _ = time_command([os.path.abspath(args.exe), "--help"], args.repeats)
+        print(f"{os.path.basename(args.exe)} --help: {elapsed * 1000:.0f} ms")
+    if args.budget is not None and elapsed > args.budget:
+        print(f"Cold start of {elapsed:.2f}s is over the {args.budget:.2f}s budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
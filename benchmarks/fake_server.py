@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+import socketio
+from aiohttp import web
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[:-2]))
+
+from benchmarks.synthetic import make_report
+
+
+class FakeWiserServer:
+    """
+    A local stand-in for the Wiser server: cookie login, `POST /report` returning a request ID, and a socket.io
+    `report_ready` event with a synthetic report after `report_delay` seconds.
+    It runs on aiohttp (also required by the socket.io client) in its own thread and event loop.
+    """
+
+    def __init__(self, port=0, report_delay=0.01, rows=100, traces=2, points=100):
+        """
+        Args:
+            port (int): Port to listen on, 0 picks a free one.
+            report_delay (float): Seconds between a report request and its `report_ready` event.
+            rows, traces, points: Size of the synthetic reports, see `synthetic.make_report`.
+        """
+        self.requested_port = port
+        self.port = None
+        self.report_delay = report_delay
+        self.report = json.dumps(make_report(rows, traces, points))
+        self.requests_received = 0
+        self.sio = socketio.AsyncServer(async_mode="aiohttp", cors_allowed_origins="*")
+        self.app = web.Application()
+        self.sio.attach(self.app)
+        self.app.router.add_post("/login", self._login)
+        self.app.router.add_post("//login", self._login)  # the tester joins the server URL and login path with two slashes
+        self.app.router.add_post("/report", self._report)
+        self.loop = asyncio.new_event_loop()
+        self.runner = None
+        self.thread = None
+
+    @property
+    def host(self):
+        return f"127.0.0.1:{self.port}"
+
+    async def _login(self, request):
+        response = web.json_response({})
+        response.set_cookie("access_token_cookie", "bench")
+        response.set_cookie("csrf_access_token", "bench")
+        return response
+
+    async def _report(self, request):
+        body = await request.json()
+        request_id = uuid.uuid4().hex
+        self.requests_received += 1
+        asyncio.ensure_future(self._send_report(request.headers.get("S_ID"), request_id, body))
+        return web.json_response({"id": request_id})
+
+    async def _send_report(self, sid, request_id, request):
+        await asyncio.sleep(self.report_delay)
+        if request.get("dataType") == "appVersion":
+            data = json.dumps({"messageType": "retData", "dataType": "appVersion", "data": {"version": "bench"}})
+        else:
+            data = self.report
+        await self.sio.emit("report_ready", {"id": request_id, "data": data}, to=sid)
+
+    async def _start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", self.requested_port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        """Starts serving in a background thread, returns once the server accepts connections."""
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Wiser server for local replays.")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--report_delay", type=float, default=0.01, help="Seconds before a report is ready")
+    parser.add_argument("--rows", type=int, default=100, help="Rows of tabular data per report")
+    args = parser.parse_args()
+    server = FakeWiserServer(args.port, args.report_delay, args.rows).start()
+    print(f"Fake Wiser server listening on {server.host}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import copy
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[:-2]))
+
+from benchmarks.synthetic import make_figures, make_report, make_rows, perturb, scale_recordings
+from src.soak import percentile
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "baselines")
+# Metrics where a higher value is a regression, all the others are regressions when lower
+LOWER_IS_BETTER = ("latency_p50", "latency_p99", "peak_rss_bytes")
+
+
+def peak_rss_bytes():
+    """Returns the peak resident set size of the current process in bytes, or None if it can't be measured."""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return None
+
+
+def latency_stats(latencies):
+    latencies = sorted(latencies)
+    return {"latency_p50": percentile(latencies, 0.5), "latency_p99": percentile(latencies, 0.99)}
+
+
+def bench_replay(scale):
+    """Replays scaled recordings against the fake server, throughput in requests per second."""
+    from benchmarks.fake_server import FakeWiserServer
+    from src.tester import WiserTester
+
+    server = FakeWiserServer(rows=200).start()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_dir, output_dir = os.path.join(tmp_dir, "inputs"), os.path.join(tmp_dir, "outputs")
+        os.makedirs(output_dir)
+        scale_recordings(input_dir, 20 * scale)
+        config = {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "expected_dir": output_dir,
+            "host": server.host,
+            "origin": "http://localhost",
+            "request_headers": {"Accept": "application/json", "Content-Type": "application/json"},
+            "version_request": {"messageType": "getData", "dataType": "appVersion", "recreate": True},
+        }
+
+        async def replay():
+            tester = WiserTester("bench", "bench", 30, config, [], input_dir, output_dir)
+            started = time.perf_counter()
+            await tester.start_testing()
+            return tester, time.perf_counter() - started
+
+        tester, elapsed = asyncio.run(replay())
+    server.stop()
+    sent = server.requests_received
+    return {"throughput": sent / elapsed, "unit": "requests/s", **latency_stats(tester.requests.drain_latencies())}
+
+
+def bench_compare(scale):
+    """Canonicalizes and diffs perturbed report pairs like Compare does, throughput in pairs per second."""
+    from src.compare import Compare
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compare = Compare({}, os.path.join(tmp_dir, "reports"), tmp_dir, tmp_dir, tmp_dir)
+    compare.canonicalizers = {None: compare._create_canonicalizer(None)}
+    latencies = []
+    for _ in range(5 * scale):
+        expected = make_report(50, 2, 200)
+        output = perturb(copy.deepcopy(expected))
+        started = time.perf_counter()
+        compare._calculate_diff(compare._preprocess_data(output, "x"), compare._preprocess_data(expected, "x"))
+        latencies.append(time.perf_counter() - started)
+    return {"throughput": len(latencies) / sum(latencies), "unit": "pairs/s", **latency_stats(latencies)}
+
+
+def bench_save_json(scale):
+    """Saves reports with `save_json_file`, throughput in MB per second."""
+    from src.utils import save_json_file
+
+    reports = [make_report(2000, 5, 2000) for _ in range(2 * scale)]
+    latencies, written = [], 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i, report in enumerate(reports):
+            path = os.path.join(tmp_dir, f"{i}.json")
+            started = time.perf_counter()
+            save_json_file(report, path)
+            latencies.append(time.perf_counter() - started)
+            written += os.path.getsize(path)
+    return {"throughput": written / 1e6 / sum(latencies), "unit": "MB/s", **latency_stats(latencies)}
+
+
+def bench_csv_export(scale):
+    """Exports report rows with `json_to_csv`, throughput in rows per second."""
+    from src.utils import json_to_csv
+
+    rows = make_rows(50000 * scale, heterogeneous_every=7)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        started = time.perf_counter()
+        json_to_csv(rows, os.path.join(tmp_dir, "bench.csv"))
+        elapsed = time.perf_counter() - started
+    return {"throughput": len(rows) / elapsed, "unit": "rows/s"}
+
+
+def bench_canonicalize(scale):
+    """Normalizes figures sections like the comparison does, throughput in points per second."""
+    from src.canonicalize import Canonicalizer
+
+    canonicalizer = Canonicalizer(["root\\['requestId'\\]", "root\\['figures'\\]\\['layout'\\]\\['margin'\\].*"])
+    reports = [{"requestId": "x", "figures": make_figures(20, 2000)} for _ in range(scale)]
+    latencies = []
+    for report in reports:
+        started = time.perf_counter()
+        canonicalizer.canonicalize(report)
+        latencies.append(time.perf_counter() - started)
+    return {"throughput": 20 * 2000 * len(reports) / sum(latencies), "unit": "points/s", **latency_stats(latencies)}
+
+
+CASES = {
+    "replay": bench_replay,
+    "compare": bench_compare,
+    "save_json": bench_save_json,
+    "csv_export": bench_csv_export,
+    "canonicalize": bench_canonicalize,
+}
+
+
+def run_case(case, scale):
+    """Runs a case in a fresh interpreter, so its peak memory and imports are its own."""
+    command = [sys.executable, os.path.realpath(__file__), "--worker", case, "--scale", str(scale)]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def find_regressions(results, baseline, tolerance):
+    """Returns a message for every metric that is more than `tolerance` worse than in the baseline."""
+    regressions = []
+    for case, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(case, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)) or not base:
+                continue
+            change = (value - base) / base
+            if (change if metric in LOWER_IS_BETTER else -change) > tolerance:
+                regressions.append(f"{case} {metric}: {base:.4g} -> {value:.4g} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the replay, comparison and I/O hot paths.")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="Cases to run")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplies the size of every case")
+    parser.add_argument("--save_baseline", metavar="NAME", help="Store the results as a baseline")
+    parser.add_argument("--baseline", metavar="NAME", help="Compare the results against a stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change reported as a regression")
+    parser.add_argument("--worker", choices=list(CASES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = CASES[args.worker](args.scale)
+        result["peak_rss_bytes"] = peak_rss_bytes()
+        print(json.dumps(result))
+        return
+
+    results = {}
+    for case in args.cases:
+        results[case] = metrics = run_case(case, args.scale)
+        details = ", ".join(f"{key} {value:.4g}" for key, value in metrics.items() if key != "unit" and value is not None)
+        print(f"{case}: {metrics['throughput']:,.4g} {metrics['unit']} ({details})")
+
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = os.path.join(BASELINES_DIR, f"{args.save_baseline}.json")
+        with open(path, "w") as file:
+            json.dump({"scale": args.scale, "results": results}, file, indent=2)
+        print(f"Baseline saved to {path}")
+
+    if args.baseline:
+        with open(os.path.join(BASELINES_DIR, f"{args.baseline}.json"), "r") as file:
+            baseline = json.load(file)
+        if baseline["scale"] != args.scale:
+            print(f"Warning: baseline was recorded at scale {baseline['scale']}, not {args.scale}")
+        regressions = find_regressions(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Synthetic data generators for the benchmarks, scaled from the real recordings and reports."""
+import os
+import random
+import shutil
+import uuid
+
+ROOT = "/".join(os.path.realpath(__file__).split("/")[:-2])
+RECORDINGS_DIR = os.path.join(ROOT, "data", "inputs")
+
+
+def make_rows(count, heterogeneous_every=0):
+    """Generates patient_data-like rows, every `heterogeneous_every` row misses a column and adds another."""
+    rows = []
+    for i in range(count):
+        row = {
+            "patient_id": f"p_{i:08d}",
+            "age": random.randint(0, 99),
+            "gender": random.choice(["M", "F"]),
+            "index_date": f"20{random.randint(0, 23):02d}-01-01",
+            "lab_value": random.random() * 100,
+            "is_case": bool(i % 2),
+        }
+        if heterogeneous_every and i % heterogeneous_every == 0:
+            del row["lab_value"]
+            row["comment"] = "missing lab"
+        rows.append(row)
+    return rows
+
+
+def make_figures(traces, points):
+    """Generates a plotly-like `figures` section of `traces` traces of `points` points each."""
+    data = []
+    for i in range(traces):
+        data.append(
+            {
+                "type": "scatter",
+                "name": f"{uuid.uuid4()}.c_c_{i:032x}.cluster_heatmap_.png",
+                "x": [random.random() for _ in range(points)],
+                "y": [random.random() * 100 for _ in range(points)],
+                "text": [f"patient {uuid.uuid4()}" for _ in range(points)],
+                "error_y": {"type": "data", "width": 4, "array": [random.random() for _ in range(points)]},
+            }
+        )
+    figures = {"data": data, "layout": {"margin": {"l": 10, "r": 10}, "title": {"text": "Lab values"}}}
+    figures.update({f"[{i},{i + 10})": f"{uuid.uuid4()}.png" for i in range(0, 100, 10)})
+    return figures
+
+
+def make_report(rows, traces, points):
+    """Generates the report data of a `report_ready` event, with tabular data and figures."""
+    return {
+        "messageType": "retData",
+        "dataType": "report",
+        "requestId": str(uuid.uuid4()),
+        "data": make_rows(rows),
+        "figures": make_figures(traces, points),
+    }
+
+
+def perturb(report, fraction=0.01):
+    """Changes a fraction of the figure values of a report in place, to compare it against the original."""
+    for trace in report["figures"]["data"]:
+        for i in random.sample(range(len(trace["y"])), int(len(trace["y"]) * fraction)):
+            trace["y"][i] = -trace["y"][i]
+    return report
+
+
+def scale_recordings(dest_dir, request_count, input_dir=RECORDINGS_DIR):
+    """
+    Builds recordings totalling `request_count` requests from the real ones, by copying them whole (so builds keep
+    preceding the reports that use them) under numbered names, the last copy truncated to the requested count.
+    Returns:
+        list: The names of the generated recordings.
+    """
+    sources = sorted(d for d in os.listdir(input_dir) if os.path.isdir(os.path.join(input_dir, d)) and not d.startswith("."))
+    names, remaining, copy_number = [], request_count, 0
+    while remaining > 0:
+        for source in sources:
+            files = sorted(f for f in os.listdir(os.path.join(input_dir, source)) if f.endswith(".json"))[:remaining]
+            if not files:
+                continue
+            name = f"{source}_{copy_number}"
+            os.makedirs(os.path.join(dest_dir, name))
+            for file_name in files:
+                shutil.copy(os.path.join(input_dir, source, file_name), os.path.join(dest_dir, name, file_name))
+            names.append(name)
+            remaining -= len(files)
+            if remaining <= 0:
+                break
+        copy_number += 1
+    return names
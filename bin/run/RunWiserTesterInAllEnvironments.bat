@@ -0,0 +1,2 @@
+@echo off
+wiser_tester.exe --username maya --password mayah --config config/config_weizmann.json config/config_clalit.json
\ No newline at end of file
@@ -1,5 +1,6 @@
 import argparse
 import os
+from src.selector import parse_selector_term
 
 
 def parse_args():
@@ -11,7 +12,13 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Run Wiser Tester")
     parser.add_argument("--username", type=str, required=True, help="Username for login")
     parser.add_argument("--password", type=str, required=True, help="Password for login")
-    parser.add_argument("--config", type=str, required=True, help="Path to the configuration file")
+    parser.add_argument(
+        "--config",
+        type=str,
+        nargs="+",
+        required=True,
+        help="Path to the configuration file, several files replay against every environment concurrently",
+    )
     parser.add_argument("--input_dir", type=str, help="Location of input dirs")
     parser.add_argument("--output_dir", type=str, help="Location of test output")
     parser.add_argument("--expected_dir", type=str, help="Location of expectations")
@@ -23,6 +30,22 @@ def parse_args():
     )
     parser.add_argument("--request_timeout", type=int, default=60, help="Request timeout in seconds")
     parser.add_argument("--exclude_inputs", nargs="+", default=[], help="List of input files to exclude from testing")
+    parser.add_argument("--report_types", nargs="+", help="Only send reports of these types, other requests are always sent")
+    parser.add_argument(
+        "--select",
+        nargs="+",
+        type=parse_selector_term,
+        help="Only send requests matching all the terms, e.g. messageType=*genReport report.type=lab_clusters_*",
+    )
     parser.add_argument("--no_preprocessing", action="store_true", help="Don't preprocess outputs before comparison")
+    parser.add_argument("--soak_duration", type=int, help="Replay the inputs in a loop for this many seconds")
+    parser.add_argument("--soak_iterations", type=int, help="Replay the inputs in a loop this many times")
+    parser.add_argument("--shards", type=int, default=1, help="Number of worker processes to split the recordings across")
+    parser.add_argument(
+        "--profile", action="store_true", help="Profile the run phases, the results are saved next to the comparison reports"
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.shards > 1 and (args.soak_duration is not None or args.soak_iterations is not None):
+        parser.error("--soak_duration and --soak_iterations can't be combined with --shards, soak runs use a single session")
+    return args
@@ -1,7 +1,11 @@
 # Authentication
+import base64
+import json
 import httpx
 from src.exceptions import handle_exceptions
-from src.configure import LOG_CONFIG, LOGGER
+from src.configure import LOG_CONFIG, get_logger
+
+LOGGER = get_logger("auth")
 
 
 @handle_exceptions("Login failed", True)
@@ -35,3 +39,29 @@ def handle_cookies(response_cookies):
 
     cookies_str = f"access_token_cookie={access_token_cookie}; csrf_access_token={csrf_token}"
     return cookies_str, access_token_cookie, csrf_token
+
+
+def _jwt_expiry(token):
+    """Returns the `exp` claim of a JWT, without verifying it, or None if the token isn't a JWT."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def session_expiry(response_cookies):
+    """
+    Returns when the login session expires, as a UNIX timestamp: the earliest expiry of the session cookies
+    or of the access token JWT. None if neither carries an expiry.
+    """
+    expiries = []
+    for cookie in getattr(response_cookies, "jar", []):
+        if cookie.name in ("access_token_cookie", "csrf_access_token") and cookie.expires:
+            expiries.append(float(cookie.expires))
+    access_token = response_cookies.get("access_token_cookie")
+    if access_token:
+        expiries.append(_jwt_expiry(access_token))
+    expiries = [expiry for expiry in expiries if expiry is not None]
+    return min(expiries) if expiries else None
@@ -0,0 +1,307 @@
+from datetime import datetime
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from deepdiff import DeepDiff, Delta
+from src.canonicalize import Canonicalizer
+from src.configure import get_logger
+from src.utils import (
+    contains_csv_data,
+    json_to_csv,
+    json_to_parquet,
+    list_outputs,
+    load_json_file,
+    parquet_available,
+    save_json_file,
+    wants_parquet,
+)
+
+LOGGER = get_logger("baseline")
+
+INDEX_FILE = "index.json"
+MANIFEST_FILE = "manifest.json"
+ENTRY_SUFFIX = ".gz"
+
+
+def version_key(version_info):
+    """Names a baseline after its Wiser version, or a digest of the version info if it has no `version` field."""
+    if isinstance(version_info, dict) and version_info.get("version"):
+        key = str(version_info["version"])
+    else:
+        key = hashlib.sha1(json.dumps(version_info, sort_keys=True).encode()).hexdigest()[:12]
+    return re.sub(r"[^\w.-]", "_", key)
+
+
+def _type_name(obj):
+    """Serializes the types of `type_changes` deltas by name, the values themselves are plain JSON."""
+    return obj.__name__ if isinstance(obj, type) else str(obj)
+
+
+def _diff_flat_dicts(old, new):
+    """Returns the exact difference between two JSON documents as Delta flat dicts, an empty list if they are equal."""
+    diff = DeepDiff(old, new)  # exact, a delta computed with ignore_order can't rebuild the list order
+    if not diff:
+        return []
+    return json.loads(json.dumps(Delta(diff, bidirectional=True).to_flat_dicts(), default=_type_name))
+
+
+def _clear_expectations(expected_dir):
+    """Removes the recording folders and version info of an expectations directory, other files are kept."""
+    os.makedirs(expected_dir, exist_ok=True)
+    for item in os.listdir(expected_dir):
+        item_path = os.path.join(expected_dir, item)
+        if os.path.isdir(item_path) and not item.startswith("."):
+            shutil.rmtree(item_path)
+        elif item == "version_info.json":
+            os.remove(item_path)
+
+
+class BaselineStore:
+    """
+    Keeps the expected outputs of every promoted Wiser version.
+    Each version stores only the outputs that changed since the previous version, as deepdiff `Delta` flat dicts
+    (or in full when the delta isn't smaller), plus a full snapshot every `snapshot_interval` versions, which bounds
+    the number of deltas applied to rebuild an output. Outputs are rebuilt one file at a time, a version is never
+    materialized as a whole unless it is checked out into the expectations directory.
+    """
+
+    def __init__(self, path, snapshot_interval=30, config=None):
+        """
+        Args:
+            path (str): Directory of the store.
+            snapshot_interval (int): Number of versions between full snapshots.
+            config (dict, optional): The configuration, its `parquet_reports` are exported to Parquet on checkout,
+                like the tester does.
+        """
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.config = config or {}
+        self.manifests = {}  # version -> manifest, read once
+        index_path = os.path.join(path, INDEX_FILE)
+        self.index = load_json_file(index_path) if os.path.exists(index_path) else {"versions": [], "current": None}
+
+    # Reading
+
+    def versions(self):
+        """Returns the manifests of the stored versions, oldest first."""
+        return [self.manifest(version) for version in self.index["versions"]]
+
+    def manifest(self, version):
+        if version not in self.manifests:
+            if version not in self.index["versions"]:
+                raise KeyError(f"Unknown baseline version {version}")
+            self.manifests[version] = load_json_file(os.path.join(self.path, version, MANIFEST_FILE))
+        return self.manifests[version]
+
+    def _entry_path(self, version, output):
+        return os.path.join(self.path, version, *output.split("/")) + ENTRY_SUFFIX
+
+    def _read_entry(self, version, output):
+        """Returns what a version stores for an output, None if the output is unchanged since the parent version."""
+        entry_path = self._entry_path(version, output)
+        if not os.path.exists(entry_path):
+            return None
+        with gzip.open(entry_path, "rt") as file:
+            return json.load(file)
+
+    def load_output(self, version, output):
+        """
+        Rebuilds an output of a version from the nearest full copy and the deltas stored since.
+        Args:
+            version (str): The baseline version.
+            output (str): The `folder/file.json` path of the output.
+        Returns:
+            The output JSON data, None if the version has no such output.
+        """
+        if output not in self.manifest(version)["outputs"]:
+            return None
+        deltas = []
+        while True:
+            entry = self._read_entry(version, output)
+            if entry is not None:
+                if "content" in entry:
+                    break
+                deltas.append(entry["delta"])
+            version = self.manifest(version)["parent"]
+        data = entry["content"]
+        for flat_dicts in reversed(deltas):
+            data = data + Delta(flat_dict_list=flat_dicts, mutate=True)
+        return data
+
+    # Writing
+
+    def _write_entry(self, version, output, entry):
+        entry_path = self._entry_path(version, output)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        with gzip.open(entry_path, "wt") as file:
+            json.dump(entry, file, separators=(",", ":"), default=_type_name)
+
+    def _save_index(self):
+        os.makedirs(self.path, exist_ok=True)
+        save_json_file(self.index, os.path.join(self.path, INDEX_FILE))
+
+    def _is_snapshot_due(self, parent):
+        """A version is a snapshot when it has no parent, or the last `snapshot_interval` versions are deltas."""
+        distance = 0
+        while parent is not None:
+            manifest = self.manifest(parent)
+            if manifest["snapshot"]:
+                return distance + 1 >= self.snapshot_interval
+            distance += 1
+            parent = manifest["parent"]
+        return True
+
+    def add_version(self, output_dir, version=None):
+        """
+        Stores the outputs of a run as a new version, as deltas against the latest version.
+        Args:
+            output_dir (str): The output directory of the run, with its `version_info.json`.
+            version (str, optional): Name of the version. Defaults to the Wiser version of the run.
+        Returns:
+            str: The name of the stored version.
+        """
+        version_info = load_json_file(os.path.join(output_dir, "version_info.json"))
+        version = version or version_key(version_info)
+        versions = self.index["versions"]
+        if version in versions:
+            if version != versions[-1]:
+                raise ValueError(f"Version {version} is already stored and isn't the latest one, pick another name")
+            LOGGER.info(f"Replacing the latest version {version}")
+            parent = self.manifest(version)["parent"]
+            shutil.rmtree(os.path.join(self.path, version))
+            versions.pop()
+            self.manifests.pop(version)
+            self._save_index()
+        else:
+            parent = versions[-1] if versions else None
+
+        snapshot = self._is_snapshot_due(parent)
+        parent_outputs = set(self.manifest(parent)["outputs"]) if parent else set()
+        outputs = sorted(list_outputs(output_dir))
+        counts = {"full": 0, "delta": 0, "unchanged": 0}
+        for output in outputs:
+            data = load_json_file(os.path.join(output_dir, *output.split("/")))
+            entry = {"content": data}
+            if not snapshot and output in parent_outputs:
+                previous = self.load_output(parent, output)
+                flat_dicts = _diff_flat_dicts(previous, data)
+                if not flat_dicts:
+                    counts["unchanged"] += 1
+                    continue
+                # Deltas are verified, and only kept when they are smaller than the output itself
+                if len(json.dumps(flat_dicts)) < len(json.dumps(data)):
+                    if previous + Delta(flat_dict_list=flat_dicts, mutate=True) == data:
+                        entry = {"delta": flat_dicts}
+            self._write_entry(version, output, entry)
+            counts["delta" if "delta" in entry else "full"] += 1
+
+        manifest = {
+            "version": version,
+            "version_info": version_info,
+            "parent": parent,
+            "snapshot": snapshot,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "outputs": outputs,
+            "stored": counts,
+        }
+        os.makedirs(os.path.join(self.path, version), exist_ok=True)  # no entries are written if nothing changed
+        save_json_file(manifest, os.path.join(self.path, version, MANIFEST_FILE))
+        self.manifests[version] = manifest
+        versions.append(version)
+        self._save_index()
+        LOGGER.info(f"Stored version {version}: {counts}")
+        return version
+
+    # Expectations
+
+    def promote(self, output_dir, expected_dir, version=None):
+        """
+        Stores the outputs of a run as a new version and makes them the expectations.
+        Returns:
+            str: The name of the promoted version.
+        """
+        version = self.add_version(output_dir, version)
+        _clear_expectations(expected_dir)
+        for folder in sorted({output.split("/")[0] for output in self.manifest(version)["outputs"]}):
+            shutil.copytree(os.path.join(output_dir, folder), os.path.join(expected_dir, folder))
+        shutil.copy(os.path.join(output_dir, "version_info.json"), os.path.join(expected_dir, "version_info.json"))
+        self._set_current(version)
+        return version
+
+    def checkout(self, version, expected_dir):
+        """Rebuilds the outputs of a stored version into the expectations directory, with their CSV or Parquet exports."""
+        manifest = self.manifest(version)
+        _clear_expectations(expected_dir)
+        save_json_file(manifest["version_info"], os.path.join(expected_dir, "version_info.json"))
+        for output in manifest["outputs"]:
+            folder, file_name = output.split("/")
+            folder_path = os.path.join(expected_dir, folder)
+            if not os.path.isdir(folder_path):
+                os.makedirs(folder_path)
+                save_json_file(manifest["version_info"], os.path.join(folder_path, "version_info.json"))
+            data = self.load_output(version, output)
+            save_json_file(data, os.path.join(folder_path, file_name))
+            if contains_csv_data(data):
+                self._export_table(data.get("data", {}).get("data", None), folder_path, file_name[:-5])
+        self._set_current(version)
+
+    def _export_table(self, csv_data, folder_path, input_file_name):
+        """Exports the table of an output the way the tester did when the output was saved."""
+        if wants_parquet(self.config, input_file_name, csv_data):
+            if parquet_available():
+                json_to_parquet(csv_data, os.path.join(folder_path, f"{input_file_name}.parquet"))
+                return
+            LOGGER.warning(f"No parquet engine installed, saving {input_file_name} as CSV")
+        json_to_csv(csv_data, os.path.join(folder_path, f"{input_file_name}.csv"))
+
+    def rollback(self, expected_dir, version=None):
+        """
+        Makes an earlier version the expectations, by default the one promoted before the current one.
+        Returns:
+            str: The name of the version rolled back to.
+        """
+        if version is None:
+            current = self.index["current"]
+            if current is None or self.manifest(current)["parent"] is None:
+                raise ValueError("There is no earlier version to roll back to")
+            version = self.manifest(current)["parent"]
+        self.checkout(version, expected_dir)
+        return version
+
+    def _set_current(self, version):
+        self.index["current"] = version
+        self._save_index()
+        LOGGER.info(f"Expectations are now version {version}")
+
+    # Comparison
+
+    def compare(self, old_version, new_version, ignore_paths=()):
+        """
+        Compares two versions output by output, without materializing either of them.
+        Args:
+            ignore_paths (list): Regex paths excluded from the comparison, like the `ignore_paths` config key.
+        Returns:
+            dict: The added and removed outputs, and the Delta flat dicts of every changed output.
+        """
+        old_outputs = set(self.manifest(old_version)["outputs"])
+        new_outputs = set(self.manifest(new_version)["outputs"])
+        canonicalizer = Canonicalizer(ignore_paths)
+        changed = {}
+        for output in sorted(old_outputs & new_outputs):
+            # Only the report data is compared, like `Compare` does, the ignored paths are relative to it
+            old_data = canonicalizer.canonicalize(self.load_output(old_version, output).get("data"))
+            new_data = canonicalizer.canonicalize(self.load_output(new_version, output).get("data"))
+            flat_dicts = _diff_flat_dicts(old_data, new_data)
+            if flat_dicts:
+                changed[output] = flat_dicts
+        return {
+            "from": old_version,
+            "to": new_version,
+            "added": sorted(new_outputs - old_outputs),
+            "removed": sorted(old_outputs - new_outputs),
+            "changed": changed,
+        }
+
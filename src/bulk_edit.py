@@ -0,0 +1,176 @@
+import difflib
+import fnmatch
+import json
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+WILDCARD = "*"
+JSONPATH_TOKEN = re.compile(r"\.([^.\[\]]+)|\[(\d+|\*)\]|\['([^']*)'\]|\[\"([^\"]*)\"\]")
+
+
+def escape_token(key):
+    """Escapes a key as a JSON Pointer token, `~` as `~0` and `/` as `~1`."""
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def parse_path(path):
+    """
+    Parses a JSON Pointer (`/report/labs/0`) or a simple JSONPath (`$.report.labs[0]`, `$.report['type']`)
+    into a list of tokens. `*` matches every key or index at its level.
+    Raises:
+        ValueError: If the path can't be parsed.
+    """
+    if path.startswith("$"):
+        tokens, pos = [], 1
+        while pos < len(path):
+            match = JSONPATH_TOKEN.match(path, pos)
+            if not match:
+                raise ValueError(f"Invalid JSONPath '{path}' at position {pos}")
+            tokens.append(next(group for group in match.groups() if group is not None))
+            pos = match.end()
+        return tokens
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise ValueError(f"Invalid path '{path}', expected a JSON Pointer or a JSONPath starting with $")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _children(container, token):
+    """Yields the child containers of `container` selected by `token`."""
+    if token == WILDCARD:
+        values = container.values() if isinstance(container, dict) else container if isinstance(container, list) else []
+        yield from values
+    elif isinstance(container, dict) and token in container:
+        yield container[token]
+    elif isinstance(container, list) and token.isdigit() and int(token) < len(container):
+        yield container[int(token)]
+
+
+def apply_operation(data, operation):
+    """
+    Applies one patch operation to a document in place.
+    Args:
+        data: The JSON document.
+        operation (dict): `op` (`add`, `replace` or `remove`), `path` and, except for `remove`, `value`.
+            `replace` and `remove` only touch existing locations, `add` creates keys and inserts into lists
+            (`-` appends).
+    Returns:
+        int: The number of locations changed.
+    """
+    op, tokens = operation["op"], parse_path(operation["path"])
+    if not tokens:
+        raise ValueError("Patching the document root is not supported")
+    parents = [data]
+    for token in tokens[:-1]:
+        parents = [child for parent in parents for child in _children(parent, token)]
+    last, changed = tokens[-1], 0
+    for parent in parents:
+        if isinstance(parent, dict):
+            keys = list(parent) if last == WILDCARD else [last]
+            for key in keys:
+                if op == "add" or (op == "replace" and key in parent):
+                    parent[key] = operation["value"]
+                    changed += 1
+                elif op == "remove" and key in parent:
+                    del parent[key]
+                    changed += 1
+        elif isinstance(parent, list):
+            if last == WILDCARD:
+                if op == "remove":
+                    changed += len(parent)
+                    parent.clear()
+                elif op == "replace":
+                    parent[:] = [operation["value"]] * len(parent)
+                    changed += len(parent)
+            elif op == "add" and last == "-":
+                parent.append(operation["value"])
+                changed += 1
+            elif last.isdigit():
+                index = int(last)
+                if op == "add" and index <= len(parent):
+                    parent.insert(index, operation["value"])
+                    changed += 1
+                elif op == "replace" and index < len(parent):
+                    parent[index] = operation["value"]
+                    changed += 1
+                elif op == "remove" and index < len(parent):
+                    del parent[index]
+                    changed += 1
+    return changed
+
+
+def patch_file(file_path, operations):
+    """
+    Computes the patched content of a request file, without writing it.
+    Operations with a `files` glob only apply to matching file names.
+    Returns:
+        tuple: (file path, original text, patched text), the patched text is None if nothing changed.
+    """
+    with open(file_path, "r") as file:
+        original = file.read()
+    data = json.loads(original)
+    file_name = os.path.basename(file_path)
+    changed = 0
+    for operation in operations:
+        if fnmatch.fnmatch(file_name, operation.get("files", "*")):
+            changed += apply_operation(data, operation)
+    if not changed or data == json.loads(original):
+        return file_path, original, None
+    return file_path, original, json.dumps(data, indent=2)
+
+
+def atomic_write(file_path, text):
+    """
+    Writes a file through a temporary file in the same directory, so readers never see a partial file.
+    The permissions of an existing file are kept, the temporary file is only readable by its owner.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(text)
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def bulk_patch(directories, operations, workers=1, dry_run=False):
+    """
+    Applies patch operations to every request file in the directories.
+    All patched contents are computed first, in parallel worker processes when `workers` is more than 1. Files are
+    only written once every file was patched successfully, each through an atomic replace.
+    Args:
+        directories (list): Directories holding request JSON files.
+        operations (list): Patch operations, see `apply_operation`.
+        workers (int): Number of worker processes.
+        dry_run (bool): Print a unified diff of every change instead of writing.
+    Returns:
+        dict: The number of files scanned and changed.
+    """
+    for operation in operations:
+        parse_path(operation["path"])  # fail before touching any file
+    file_paths = sorted(
+        os.path.join(directory, f) for directory in directories for f in os.listdir(directory) if f.endswith(".json")
+    )
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(patch_file, file_paths, [operations] * len(file_paths), chunksize=16))
+    else:
+        results = [patch_file(file_path, operations) for file_path in file_paths]
+
+    changes = [(file_path, original, patched) for file_path, original, patched in results if patched is not None]
+    for file_path, original, patched in changes:
+        if dry_run:
+            diff = difflib.unified_diff(
+                original.splitlines(), patched.splitlines(), fromfile=file_path, tofile=f"{file_path} (patched)", lineterm=""
+            )
+            print("\n".join(diff))
+        else:
+            atomic_write(file_path, patched)
+    return {"scanned": len(file_paths), "changed": len(changes)}
@@ -0,0 +1,179 @@
+import json
+import re
+
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+UUID_PLACEHOLDER = "PLACEHOLDER"
+RULE_TYPES = ("replace", "remove", "round", "sort_list")
+
+
+def report_type_from_file_name(file_name):
+    """Returns the report type of a request or output file name, e.g. `lab` for `123_genReport_lab.json`, or None."""
+    _, sep, report_type = file_name.partition("genReport_")
+    return report_type.split(".", 1)[0] if sep else None
+
+
+def path_matcher(patterns):
+    """
+    Compiles path regular expressions into one function searching them in DeepDiff-style paths.
+    Paths always start with `root`, so patterns starting with it are only tried there.
+    """
+    pattern = re.compile("|".join(f"(?:{path})" for path in patterns))
+    anchored = all(path.startswith(("root", "^")) for path in patterns)
+    return pattern.match if anchored else pattern.search
+
+
+def _sort_value(value):
+    """Orders numbers numerically before any other value, which are ordered by their JSON form."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 0, value, ""
+    return 1, 0, json.dumps(value, sort_keys=True, default=str)
+
+
+class Canonicalizer:
+    """
+    Brings report data into a canonical form in a single in-place pass over the document.
+    The rules are compiled once, when the canonicalizer is created:
+        - UUIDs in the strings under the `uuid_keys` top-level sections are replaced with a placeholder.
+        - Values whose DeepDiff-style path (e.g. `root['figures']['layout']`) matches one of `ignore_paths` are removed.
+        - Floats are rounded to `float_digits` digits.
+        - Dictionary keys are sorted.
+        - Declarative normalization `rules`, see `_compile_rules`.
+    """
+
+    def __init__(self, ignore_paths=(), uuid_keys=("figures",), float_digits=None, sort_keys=False, rules=()):
+        """
+        Args:
+            ignore_paths (list): Regular expressions searched in the path of every value.
+            uuid_keys (iterable): Top-level keys whose strings get their UUIDs replaced.
+            float_digits (int, optional): Number of digits floats are rounded to, no rounding if None.
+            sort_keys (bool): Whether to sort dictionary keys.
+            rules (list): Normalization rules, as found in the `normalization_rules` config.
+        Raises:
+            ValueError: If a rule is malformed.
+        """
+        self.uuid_keys = frozenset(uuid_keys)
+        self.float_digits = float_digits
+        self.sort_keys = sort_keys
+        self.replace_rules, self.round_rules, self.sort_rules = [], [], []
+        ignore_paths = list(ignore_paths) + self._compile_rules(rules)
+        self._ignored = path_matcher(ignore_paths) if ignore_paths else None
+        scoped = any(rule[-1] for rule in self.replace_rules + self.round_rules)
+        self.track_paths = bool(self._ignored or self.sort_rules or scoped)
+
+    def _compile_rules(self, rules):
+        """
+        Compiles normalization rules, each a dict with a `type`:
+            - `replace`: replaces the `pattern` matches in strings with `replacement` (default `PLACEHOLDER`).
+            - `remove`: removes the values at `path`.
+            - `round`: rounds floats to `digits` digits.
+            - `sort_list`: sorts the lists whose path fully matches `path` by the `key` of their items, or by the
+              items themselves.
+        `replace` and `round` rules apply to the whole document, or to the values under `path` if given.
+        Returns:
+            list: The paths removed by `remove` rules.
+        """
+        removed = []
+        for rule in rules:
+            rule_type = rule.get("type")
+            if rule_type not in RULE_TYPES:
+                raise ValueError(f"Unknown normalization rule type '{rule_type}', expected one of {list(RULE_TYPES)}")
+            try:
+                matcher = path_matcher([rule["path"]]) if "path" in rule else None
+                if rule_type == "replace":
+                    pattern = re.compile(rule["pattern"])
+                    self.replace_rules.append((pattern, rule.get("replacement", UUID_PLACEHOLDER), matcher))
+                elif rule_type == "remove":
+                    removed.append(rule["path"])
+                elif rule_type == "round":
+                    self.round_rules.append((int(rule["digits"]), matcher))
+                else:
+                    self.sort_rules.append((rule.get("key"), re.compile(rule["path"]).fullmatch))
+            except (KeyError, re.error) as e:
+                raise ValueError(f"Invalid normalization rule {rule}: {e}") from e
+        return removed
+
+    @classmethod
+    def lossless(cls):
+        """Returns a canonicalizer that only sorts keys, for saving outputs without losing information."""
+        return cls(uuid_keys=(), sort_keys=True)
+
+    def canonicalize(self, data):
+        """
+        Canonicalizes a document in place.
+        Returns:
+            The canonicalized document, the same object as `data` unless it is a scalar.
+        """
+        path = "root" if self.track_paths else None
+        if isinstance(data, dict):
+            self._walk_dict(data, path, False, True)
+        elif isinstance(data, list):
+            self._walk_list(data, path, False)
+        else:
+            data = self._scalar(data, path, False)
+        return data
+
+    def _scalar(self, value, path, replace_uuids):
+        if isinstance(value, str):
+            if replace_uuids and "-" in value:
+                value = UUID_PATTERN.sub(UUID_PLACEHOLDER, value)
+            for pattern, replacement, matcher in self.replace_rules:
+                if matcher is None or matcher(path):
+                    value = pattern.sub(replacement, value)
+        elif isinstance(value, float):
+            digits = self.float_digits
+            for rule_digits, matcher in self.round_rules:
+                if matcher is None or matcher(path):
+                    digits = rule_digits
+                    break
+            if digits is not None:
+                return round(value, digits)
+        return value
+
+    def _walk_dict(self, data, path, replace_uuids, at_root=False):
+        ignored = []
+        for key, value in data.items():
+            child_path = None
+            if path is not None:
+                child_path = f"{path}[{key!r}]"
+                if self._ignored and self._ignored(child_path):
+                    ignored.append(key)
+                    continue
+            child_uuids = replace_uuids or (at_root and key in self.uuid_keys)
+            if isinstance(value, dict):
+                self._walk_dict(value, child_path, child_uuids)
+            elif isinstance(value, list):
+                self._walk_list(value, child_path, child_uuids)
+            else:
+                canonical = self._scalar(value, child_path, child_uuids)
+                if canonical is not value:
+                    data[key] = canonical
+        for key in ignored:
+            del data[key]
+        if self.sort_keys:
+            items = sorted(data.items(), key=lambda item: str(item[0]))
+            data.clear()
+            data.update(items)
+
+    def _walk_list(self, data, path, replace_uuids):
+        ignored = []
+        for index, value in enumerate(data):
+            child_path = None
+            if path is not None:
+                child_path = f"{path}[{index}]"
+                if self._ignored and self._ignored(child_path):
+                    ignored.append(index)
+                    continue
+            if isinstance(value, dict):
+                self._walk_dict(value, child_path, replace_uuids)
+            elif isinstance(value, list):
+                self._walk_list(value, child_path, replace_uuids)
+            else:
+                canonical = self._scalar(value, child_path, replace_uuids)
+                if canonical is not value:
+                    data[index] = canonical
+        for index in reversed(ignored):
+            del data[index]
+        for key, matcher in self.sort_rules:
+            if matcher(path):
+                data.sort(key=lambda item: _sort_value(item.get(key) if key and isinstance(item, dict) else item))
+                break
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import sqlite3
+from src.configure import get_logger
+from src.selector import selector_sql
+from src.utils import extract_timestamp_from_filename
+
+LOGGER = get_logger("catalog")
+
+CATALOG_FILE = ".catalog.sqlite"
+CATALOG_VERSION = 2  # bump when the schema or the extracted fields change, the catalog is then rebuilt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    path TEXT PRIMARY KEY,
+    recording TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    timestamp INTEGER,
+    message_type TEXT,
+    report_type TEXT,
+    cohort_ids TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS request_cohorts (
+    path TEXT NOT NULL REFERENCES requests(path) ON DELETE CASCADE,
+    cohort_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requests_by_recording ON requests(recording, timestamp, file_name);
+CREATE INDEX IF NOT EXISTS requests_by_report_type ON requests(report_type);
+CREATE INDEX IF NOT EXISTS requests_by_hash ON requests(content_hash);
+CREATE INDEX IF NOT EXISTS cohorts_by_id ON request_cohorts(cohort_id);
+CREATE INDEX IF NOT EXISTS cohorts_by_path ON request_cohorts(path);
+"""
+
+
+def request_cohort_ids(json_request):
+    """Returns the sorted IDs of the cohorts a request builds or reads."""
+    cohorts = {json_request.get("cohortId")}
+    cohorts.update(json_request.get("cohortIds") or [])
+    for section in ("cohort", "background"):
+        if isinstance(json_request.get(section), dict):
+            cohorts.add(json_request[section].get("id"))
+    report = json_request.get("report")
+    if isinstance(report, dict):
+        cohorts.add(report.get("cohortsId"))
+        if isinstance(report.get("background"), dict):
+            cohorts.add(report["background"].get("id"))
+    cohorts.discard(None)
+    return sorted(cohorts)
+
+
+class RecordingCatalog:
+    """
+    A persistent SQLite index of the request files under the input directory, one row per request file.
+    The index is refreshed incrementally: only files whose size or modification time changed are read again.
+    """
+
+    def __init__(self, input_dir, db_path=None, only_recordings=None):
+        """
+        Args:
+            input_dir (str): The input directory holding one folder per recording.
+            db_path (str, optional): Path of the catalog database, defaults to a hidden file in the input directory.
+            only_recordings (iterable, optional): Only catalog these recording folders, the others are left out.
+        """
+        self.input_dir = input_dir
+        self.db_path = db_path or os.path.join(input_dir, CATALOG_FILE)
+        self.only_recordings = set(only_recordings) if only_recordings is not None else None
+        self.connection = sqlite3.connect(self.db_path, timeout=30)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+            self.connection.executescript("DROP TABLE IF EXISTS request_cohorts; DROP TABLE IF EXISTS requests;")
+            self.connection.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def _scan(self):
+        """Yields (relative path, recording, file name, stat) for every request file under the input directory."""
+        with os.scandir(self.input_dir) as recordings:
+            for recording in recordings:
+                if recording.name.startswith(".") or not recording.is_dir():
+                    continue
+                if self.only_recordings is not None and recording.name not in self.only_recordings:
+                    continue
+                with os.scandir(recording.path) as files:
+                    for entry in files:
+                        if entry.name.endswith(".json") and entry.is_file():
+                            yield f"{recording.name}/{entry.name}", recording.name, entry.name, entry.stat()
+
+    def _describe(self, path, recording, file_name, stat):
+        """Reads a request file and returns its catalog row and cohort IDs."""
+        with open(os.path.join(self.input_dir, path), "rb") as file:
+            content = file.read()
+        json_request = json.loads(content)
+        try:
+            timestamp = extract_timestamp_from_filename(file_name)
+        except ValueError:
+            timestamp = None
+        report = json_request.get("report")
+        report_type = report.get("type") if isinstance(report, dict) else None
+        message_type = (json_request.get("messageType") or "").replace("chronicDiseaseCohorts.", "")
+        cohort_ids = request_cohort_ids(json_request)
+        row = (
+            path,
+            recording,
+            file_name,
+            timestamp,
+            message_type,
+            report_type,
+            json.dumps(cohort_ids),
+            hashlib.sha1(content).hexdigest(),
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+        return row, cohort_ids
+
+    def refresh(self):
+        """
+        Brings the catalog up to date with the input directory.
+        Returns:
+            dict: The number of added or updated, removed and unchanged request files.
+        """
+        rows = self.connection.execute("SELECT path, size, mtime_ns FROM requests")
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+        counts = {"updated": 0, "removed": 0, "unchanged": 0}
+        with self.connection:
+            for path, recording, file_name, stat in self._scan():
+                if known.pop(path, None) == (stat.st_size, stat.st_mtime_ns):
+                    counts["unchanged"] += 1
+                    continue
+                try:
+                    row, cohort_ids = self._describe(path, recording, file_name, stat)
+                except Exception as e:  # one malformed request file must not stop the cataloging
+                    LOGGER.warning(f"Skipping {path} in catalog: {e}")
+                    self.connection.execute("DELETE FROM requests WHERE path = ?", (path,))
+                    continue
+                self.connection.execute("DELETE FROM requests WHERE path = ?", (path,))
+                self.connection.execute("INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                self.connection.executemany(
+                    "INSERT INTO request_cohorts VALUES (?, ?)", [(path, cohort_id) for cohort_id in cohort_ids]
+                )
+                counts["updated"] += 1
+            self.connection.executemany("DELETE FROM requests WHERE path = ?", [(path,) for path in known])
+            counts["removed"] = len(known)
+        LOGGER.info(f"Catalog refreshed: {counts}")
+        return counts
+
+    def recordings(self):
+        """Returns the names of the recordings in the catalog."""
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT recording FROM requests ORDER BY recording")]
+
+    def request_counts(self):
+        """Returns the number of request files of each recording."""
+        return dict(self.connection.execute("SELECT recording, count(*) FROM requests GROUP BY recording"))
+
+    def requests(self, recording, exclude=(), report_types=None, selector=None):
+        """
+        Returns the request file names of a recording in replay order.
+        Args:
+            recording (str): The recording folder name.
+            exclude (iterable): File names to leave out.
+            report_types (list, optional): Only keep reports of these types, requests that aren't reports are kept.
+            selector (list, optional): Parsed selector terms, only the matching requests and their builds are kept.
+        """
+        query = "SELECT file_name FROM requests WHERE recording = ?"
+        params = [recording]
+        if selector:
+            selected = self._select_with_prerequisites(recording, selector)
+            query += f" AND file_name IN ({', '.join('?' * len(selected))})"
+            params += selected
+        exclude = list(exclude)
+        if exclude:
+            query += f" AND file_name NOT IN ({', '.join('?' * len(exclude))})"
+            params += exclude
+        if report_types:
+            query += f" AND (report_type IS NULL OR report_type IN ({', '.join('?' * len(report_types))}))"
+            params += list(report_types)
+        query += " ORDER BY timestamp IS NULL, timestamp, file_name"
+        return [row[0] for row in self.connection.execute(query, params)]
+
+    def _select_with_prerequisites(self, recording, selector):
+        """
+        Returns the file names of the requests of a recording matching the selector, plus the build requests
+        they depend on: earlier builds of any cohort they use, and recursively the builds those depend on.
+        """
+        condition, params = selector_sql(selector)
+        rows = self.connection.execute(
+            f"SELECT file_name, timestamp, message_type, cohort_ids, {condition} FROM requests WHERE recording = ? "
+            "ORDER BY timestamp IS NULL, timestamp, file_name",
+            params + [recording],
+        ).fetchall()
+        selected = {file_name for file_name, _, _, _, matches in rows if matches}
+        needed = set()  # cohorts whose builds are required
+        # Walk backwards so every build is checked against the cohorts needed by the requests after it
+        for file_name, _, message_type, cohort_ids, _ in reversed(rows):
+            cohorts = set(json.loads(cohort_ids))
+            if file_name in selected:
+                needed |= cohorts
+            elif "build" in message_type and cohorts & needed:
+                selected.add(file_name)
+                needed |= cohorts
+        return sorted(selected)
+
+    def duplicates(self, recording=None):
+        """
+        Returns groups of request files with identical content.
+        Args:
+            recording (str, optional): Only look for duplicates within this recording.
+        Returns:
+            list: Lists of relative request paths, one list per group of identical files.
+        """
+        query = "SELECT content_hash, group_concat(path, '|') FROM requests"
+        params = []
+        if recording:
+            query += " WHERE recording = ?"
+            params.append(recording)
+        query += " GROUP BY content_hash HAVING count(*) > 1"
+        return [sorted(paths.split("|")) for _, paths in self.connection.execute(query, params)]
@@ -2,24 +2,40 @@ from datetime import datetime
 import os
 import re
 import shutil
-from src.configure import LOGGER
+from src.canonicalize import Canonicalizer, report_type_from_file_name
+from src.configure import get_logger
+from src.dashboard import DiffDashboard
 from src.exceptions import handle_exceptions
-from src.utils import contains_csv_data, json_to_csv, load_json_file, save_json_file
+from src.profiler import PhaseProfiler
+from src.utils import MISSING_OUTPUTS_FILE, contains_csv_data, json_to_csv, load_json_file, save_json_file
 from deepdiff import DeepDiff, Delta
 
+LOGGER = get_logger("compare")
+
 
 class Compare:
     """A class for comparing output files with expected files and generating reports."""
 
-    def __init__(self, config, reports_path, input_dir=None, output_dir=None, expected_dir=None, specific_list=None):
+    def __init__(
+        self, config, reports_path, input_dir=None, output_dir=None, expected_dir=None, specific_list=None, profiler=None
+    ):
         self.input_dir = input_dir or config["input_dir"]
         self.output_dir = output_dir or config["output_dir"]
         self.expected_dir = expected_dir or config["expected_dir"]
         self.reports_path = reports_path
         self.report_paths = []
         self.ignore_paths = self.ignore_paths = config.get("ignore_paths", [])
+        self.float_digits = config.get("compare_float_digits")
+        self.normalization_rules = config.get("normalization_rules", {})
         self.no_preprocessing = False
+        self.canonicalizers = {}  # report type -> Canonicalizer, rules are compiled once per report type
         self.specific_list = specific_list
+        self.profiler = profiler or PhaseProfiler()
+        self.dashboard = (
+            DiffDashboard(reports_path, config.get("dashboard_page_size", 200), config.get("dashboard_value_chars", 2000))
+            if config.get("dashboard", True)
+            else None
+        )
         LOGGER.info(f"Excluding paths: {self.ignore_paths}")
         self._handle_existing_reports()
 
@@ -48,14 +64,20 @@ class Compare:
         """
         LOGGER.info("Comparing outputs to expectations")
         self.no_preprocessing = no_preprocessing
+        # Compile the configured rules up front, so a malformed rule fails before any comparison
+        self.canonicalizers = {
+            report_type: self._create_canonicalizer(report_type) for report_type in self.normalization_rules if report_type != "*"
+        }
         target_folders = self.specific_list if self.specific_list is not None else os.listdir(self.output_dir)
-        LOGGER.info(f"target folders: {target_folders}")
+        LOGGER.info(f"{len(target_folders)} target folders")
+        LOGGER.debug(f"target folders: {target_folders}")
         for folder in target_folders:
             expectation_folder_path = os.path.join(self.expected_dir, folder)
             if os.path.isdir(expectation_folder_path):
                 output_folder_path = os.path.join(self.output_dir, folder)
                 self._compare_folder(folder, output_folder_path, expectation_folder_path)
-        return self.generate_summary_report()
+        with self.profiler.phase("summary"):
+            return self.generate_summary_report()
 
     @handle_exceptions("Failed to compare folder", False)
     def _compare_folder(self, folder, expectation_folder_path, output_folder_path):
@@ -92,18 +114,20 @@ class Compare:
         output_data = load_json_file(output_file_path).get("data")
         expected_data = load_json_file(expected_file_path).get("data")
 
-        if not self.no_preprocessing:
-            output_data = self._preprocess_data(output_data)
-            expected_data = self._preprocess_data(expected_data)
-
         if output_data and expected_data:
+            request_id = output_data.get("requestId", "N/A")  # read before the ignored paths are removed
+            output_data = self._preprocess_data(output_data, input_file_name)
+            expected_data = self._preprocess_data(expected_data, input_file_name)
             diff = self._calculate_diff(output_data, expected_data)
             if diff:
                 # If differences are found, prepare a dedicated folder for this comparison
                 os.makedirs(report_dir, exist_ok=True)
-                request_id = output_data.get("requestId", "N/A")
-                self._handle_differences(diff, input_file_name, output_file_path, expected_file_path, report_dir, request_id)
+                report = self._handle_differences(
+                    diff, input_file_name, output_file_path, expected_file_path, report_dir, request_id
+                )
                 self._copy_json_files_for_review(input_file_name, output_file_path, expected_file_path, report_dir, folder_name)
+                if self.dashboard:
+                    self.dashboard.add_request(report, report_dir, input_file_name)
 
             else:
                 LOGGER.info(f"No difference found in output for {input_file_name}")
@@ -111,14 +135,12 @@ class Compare:
             LOGGER.warning(f"Missing data for comparison in {input_file_name}")
 
     def _calculate_diff(self, expected_data, output_data):
-        """Calculate differences between expected and actual data."""
-        exclude_regex = [re.compile(path) for path in self.ignore_paths]
+        """Calculate differences between expected and actual data, both already canonicalized."""
         return DeepDiff(
             expected_data,
             output_data,
             ignore_order=True,
             report_repetition=True,
-            exclude_regex_paths=exclude_regex,
             cutoff_intersection_for_pairs=1,
             get_deep_distance=True,
             max_passes=3,
@@ -128,7 +150,7 @@ class Compare:
         )
 
     def _handle_differences(self, diff, input_file_name, output_file_path, expected_file_path, report_dir, request_id):
-        """Handles the found differences by creating detailed reports and copying relevant files."""
+        """Handles the found differences by creating detailed reports and copying relevant files, returns the report."""
         delta = Delta(diff, bidirectional=True)
         flat_dicts = delta.to_flat_dicts()
         report = {
@@ -147,6 +169,7 @@ class Compare:
 
         self.report_paths.append(report_path)
         LOGGER.info(f"Comparison report generated for {input_file_name}")
+        return report
 
     def _copy_json_files_for_review(self, input_file_name, output_file_path, expected_file_path, report_dir, folder_name):
         """Copy input, expected, and output files to the report directory for further review."""
@@ -178,29 +201,44 @@ class Compare:
                 csv_path = os.path.join(dedicated_folder_path, csv_name)
                 json_to_csv(data.get("data", {}).get("data", None), csv_path)
 
-    def _preprocess_data(self, data):
-        """Preprocess data to normalize dynamic content like file names within the `figures` section."""
-        if "figures" in data:
-            data["figures"] = self.traverse_and_normalize_figures(data["figures"])
-        return data
-
-    def traverse_and_normalize_figures(self, figures):
-        """Recursively traverse and normalize file names within the figures structure."""
-        if isinstance(figures, dict):
-            return {k: self.traverse_and_normalize_figures(v) for k, v in figures.items()}
-        elif isinstance(figures, list):
-            return [self.traverse_and_normalize_figures(elem) for elem in figures]
-        elif isinstance(figures, str):
-            # Replace UUIDs within file names with 'PLACEHOLDER'
-            return re.sub(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", "PLACEHOLDER", figures)
-        else:
-            return figures
+    def _preprocess_data(self, data, input_file_name):
+        """Canonicalizes data before comparison: removes ignored paths and normalizes dynamic content like file names
+        within the `figures` section and the volatile values matched by the report type's normalization rules."""
+        report_type = report_type_from_file_name(input_file_name)
+        if report_type not in self.canonicalizers:
+            self.canonicalizers[report_type] = self._create_canonicalizer(report_type)
+        return self.canonicalizers[report_type].canonicalize(data)
+
+    def _create_canonicalizer(self, report_type):
+        """Compiles the canonicalization rules of a report type, only the ignored paths apply without preprocessing."""
+        if self.no_preprocessing:
+            return Canonicalizer(self.ignore_paths, uuid_keys=())
+        rules = self.normalization_rules.get("*", []) + self.normalization_rules.get(report_type, [])
+        return Canonicalizer(self.ignore_paths, float_digits=self.float_digits, rules=rules)
+
+    def _missing_outputs(self):
+        """Returns the outputs of the compared folders whose report was dropped during the replay."""
+        missing_outputs_path = os.path.join(self.output_dir, MISSING_OUTPUTS_FILE)
+        if not os.path.exists(missing_outputs_path):
+            return []
+        missing_outputs = load_json_file(missing_outputs_path)
+        if self.specific_list is None:
+            return missing_outputs
+        return [output for output in missing_outputs if output.split("/")[0] in self.specific_list]
 
     @handle_exceptions("Failed to generate summary report", False)
     def generate_summary_report(self):
         """Generate a summary report of all comparisons."""
         version_info = load_json_file(os.path.join(self.output_dir, "version_info.json"))
-        summary = {"output_version_info": version_info, "total_comparisons": len(self.report_paths), "differences": []}
+        missing_outputs = self._missing_outputs()
+        summary = {
+            "output_version_info": version_info,
+            "total_comparisons": len(self.report_paths),
+            "missing_outputs": missing_outputs,
+            "differences": [],
+        }
+        if missing_outputs:
+            LOGGER.warning(f"{len(missing_outputs)} outputs are missing, their reports were dropped during the replay")
 
         for report_path in self.report_paths:
             report_data = load_json_file(report_path)
@@ -218,4 +256,6 @@ class Compare:
         summary_report_path = os.path.join(self.reports_path, "comparison_summary.json")
         save_json_file(summary, summary_report_path)
         LOGGER.info(f"Summary report generated at {summary_report_path}")
+        if self.dashboard:
+            self.dashboard.write_index(version_info, len(self.report_paths))
         return summary_report_path
@@ -1,6 +1,11 @@
 from datetime import datetime
+import atexit
+import itertools
+import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 import argparse
 from enum import Enum, auto
@@ -12,34 +17,108 @@ LOG_CONFIG = {
     "LOGIN_JSON_HEADERS": {"Accept": "application/json", "Content-Type": "application/json"},
     "LOG_FORMAT": "%(asctime)s | %(levelname)s | %(message)s",
     "LOG_FILE": f"logs/testlog_{datetime.now().strftime('%Y%m%d')}.log",
+    "LOG_FIELDS": ("request_id", "input_file", "duration"),  # structured fields included in JSON records
 }
 
 # Setup logging
 
+_listener, _listener_pid = None, None  # forked worker processes inherit the handlers but not the listener thread
 
-def setup_logging(level=logging.INFO):
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines, with the structured fields passed through `extra` when present."""
+
+    def format(self, record):
+        entry = {"time": self.formatTime(record), "level": record.levelname, "logger": record.name}
+        entry["message"] = record.getMessage()
+        for field in LOG_CONFIG["LOG_FIELDS"]:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every `1 / rate` records below WARNING, warnings and errors are always kept."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.every = max(1, round(1 / rate))
+        self.counter = itertools.count()
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or next(self.counter) % self.every == 0
+
+
+def setup_logging(level=logging.INFO, config=None):
     """
     Sets up and returns a configured logger with both stdout and file handlers.
+    Records are put on a queue and written by a listener thread, so logging never blocks the event loop on I/O.
+    Called by the entry points, so importing modules doesn't create the logs directory or open the log file.
+    Calling it again in the same process keeps the handlers and only reconfigures the levels, format and sampling,
+    so the entry points can log while loading the configuration and apply it once it is loaded.
     Args:
         level (int): Logging level.
+        config (dict, optional): The configuration, for the optional `log_levels` (subsystem -> level name),
+            `log_format` ("text" or "json") and `log_sample_rate` (fraction of records below WARNING to keep) keys.
     Returns:
         logging.Logger: Configured logger.
     """
-    if not os.path.isdir("logs"):
-        os.mkdir("logs")
-
+    global _listener, _listener_pid
+    config = config or {}
     logger = logging.getLogger(__name__)
     logger.setLevel(level)
+    for subsystem, subsystem_level in config.get("log_levels", {}).items():
+        get_logger(subsystem).setLevel(subsystem_level.upper())
+    if _listener is None or _listener_pid != os.getpid():
+        logger.handlers.clear()  # inherited from a parent process whose listener doesn't run here
 
-    formatter = logging.Formatter(LOG_CONFIG["LOG_FORMAT"])
+        if not os.path.isdir("logs"):
+            os.mkdir("logs")
 
-    handlers = [logging.StreamHandler(sys.stdout), logging.FileHandler(LOG_CONFIG["LOG_FILE"])]
-    for handler in handlers:
-        handler.setLevel(logging.DEBUG)
+        handlers = [logging.StreamHandler(sys.stdout), logging.FileHandler(LOG_CONFIG["LOG_FILE"])]
+        for handler in handlers:
+            handler.setLevel(logging.DEBUG)
+
+        log_queue = queue.Queue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, *handlers)
+        _listener.start()
+        _listener_pid = os.getpid()
+        atexit.register(shutdown_logging)
+
+    if config.get("log_format") == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(LOG_CONFIG["LOG_FORMAT"])
+    for handler in _listener.handlers:
         handler.setFormatter(formatter)
-        logger.addHandler(handler)
+
+    for queue_handler in logger.handlers:
+        for sampling_filter in [f for f in queue_handler.filters if isinstance(f, SamplingFilter)]:
+            queue_handler.removeFilter(sampling_filter)
+        if config.get("log_sample_rate"):
+            queue_handler.addFilter(SamplingFilter(config["log_sample_rate"]))
 
     return logger
 
 
-LOGGER = setup_logging()
+def shutdown_logging():
+    """
+    Writes the queued records and stops the listener thread. Worker processes exit without running `atexit`
+    hooks, so they call it themselves before returning.
+    """
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        logging.getLogger(__name__).handlers.clear()
+
+
+def get_logger(subsystem):
+    """Returns the logger of a subsystem, its level can be set with the `log_levels` config."""
+    return LOGGER.getChild(subsystem)
+
+
+LOGGER = logging.getLogger(__name__)  # handlers are added by setup_logging
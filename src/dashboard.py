@@ -0,0 +1,186 @@
+import html
+import json
+import os
+from src.configure import get_logger
+
+LOGGER = get_logger("dashboard")
+
+INDEX_FILE = "index.html"
+PAGE_FILE = "diff.html"
+
+STYLE = """
+body { font-family: sans-serif; margin: 1.5em; }
+table { border-collapse: collapse; width: 100%; table-layout: fixed; }
+th, td { border: 1px solid #ccc; padding: 4px 6px; text-align: left; vertical-align: top; }
+th { background: #f0f0f0; }
+td.path { width: 25%; word-break: break-all; font-family: monospace; }
+td.action { width: 10%; }
+pre { margin: 0; white-space: pre-wrap; word-break: break-all; max-height: 30em; overflow: auto; }
+.absent { color: #999; font-style: italic; }
+.output { background: #fff0f0; }
+.expected { background: #f0fff0; }
+summary { cursor: pointer; font-weight: bold; margin: 0.5em 0; }
+nav { margin: 1em 0; }
+"""
+
+
+def _is_output_side(action):
+    """
+    Whether the `value` of a flat dict is the output's side of the diff: the output is the first DeepDiff argument,
+    so everything removed (`dictionary_item_removed`, `unordered_iterable_item_removed`,
+    `iterable_items_removed_at_indexes`, ...) is only in the output.
+    """
+    return "removed" in action
+
+
+def _page_name(base, page):
+    """`diff.html`, `diff_2.html`, ... for the pages of a paginated document."""
+    stem, extension = os.path.splitext(base)
+    return base if page == 1 else f"{stem}_{page}{extension}"
+
+
+def _document(title, body):
+    return (
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+        f"<style>{STYLE}</style></head><body><h1>{html.escape(title)}</h1>{body}</body></html>"
+    )
+
+
+def _navigation(base, page, page_count):
+    """Links to the previous and next pages, empty for a single page."""
+    if page_count == 1:
+        return ""
+    links = []
+    if page > 1:
+        links.append(f"<a href='{_page_name(base, page - 1)}'>&larr; previous</a>")
+    links.append(f"page {page} of {page_count}")
+    if page < page_count:
+        links.append(f"<a href='{_page_name(base, page + 1)}'>next &rarr;</a>")
+    return f"<nav>{' | '.join(links)}</nav>"
+
+
+def _write_pages(directory, base, title, header, sections, page_size):
+    """
+    Writes a document split into pages of at most `page_size` rows.
+    Args:
+        sections (list): (section title, table header HTML, list of row HTML), every section is collapsible.
+    """
+    rows = [(section_title, table_header, row) for section_title, table_header, section_rows in sections for row in section_rows]
+    page_count = max(1, -(-len(rows) // page_size))
+    for page in range(1, page_count + 1):
+        body = [header, _navigation(base, page, page_count)]
+        current = None
+        for section_title, table_header, row in rows[(page - 1) * page_size : page * page_size]:
+            if section_title != current:
+                if current is not None:
+                    body.append("</table></details>")
+                body.append(f"<details open><summary>{html.escape(section_title)}</summary><table>{table_header}")
+                current = section_title
+            body.append(row)
+        if current is not None:
+            body.append("</table></details>")
+        body.append(_navigation(base, page, page_count))
+        with open(os.path.join(directory, _page_name(base, page)), "w", encoding="utf-8") as file:
+            file.write(_document(title, "".join(body)))
+
+
+class DiffDashboard:
+    """
+    Renders the comparison results as static HTML: one page per differing request, written as soon as its
+    comparison finishes, and an index page linking them, written with the summary.
+    Diffs are paginated and long values are truncated, the full files are linked, so the pages open quickly
+    even for thousands of differences and multi-MB figures.
+    """
+
+    def __init__(self, reports_path, page_size=200, value_chars=2000):
+        """
+        Args:
+            reports_path (str): The comparison reports directory, the index is written there.
+            page_size (int): Maximum number of differences per request page, and of requests per index page.
+            value_chars (int): Values longer than this are truncated.
+        """
+        self.reports_path = reports_path
+        self.page_size = page_size
+        self.value_chars = value_chars
+        self.requests = []  # (folder, input file name, request ID, difference count, page path), for the index
+
+    def _value(self, value, css_class):
+        text = json.dumps(value, indent=1, sort_keys=True, default=str)
+        if len(text) > self.value_chars:
+            text = f"{text[: self.value_chars]}\n... {len(text) - self.value_chars:,} more characters"
+        return f"<td class='{css_class}'><pre>{html.escape(text)}</pre></td>"
+
+    def _diff_row(self, flat_dict):
+        """Renders a flat dict of a Delta as a row: path, action, output value and expected value side by side."""
+        action = flat_dict.get("action", "")
+        absent = "<td class='absent'>absent</td>"
+        if "old_value" in flat_dict:
+            output, expected = self._value(flat_dict["old_value"], "output"), self._value(flat_dict.get("value"), "expected")
+        elif _is_output_side(action):
+            output, expected = self._value(flat_dict.get("value"), "output"), absent
+        else:
+            output, expected = absent, self._value(flat_dict.get("value"), "expected")
+        path = "".join(f"[{element!r}]" for element in flat_dict.get("path", []))
+        return f"<tr><td class='path'>root{html.escape(path)}</td><td class='action'>{html.escape(action)}</td>{output}{expected}</tr>"
+
+    def add_request(self, report, report_dir, input_file_name):
+        """
+        Writes the pages of a request's differences next to its comparison report.
+        Args:
+            report (dict): The comparison report, with the Delta flat dicts under `diff`.
+            report_dir (str): The request's comparison directory.
+            input_file_name (str): The name of the request's input file.
+        """
+        sections = {}
+        for flat_dict in report["diff"]:
+            path = flat_dict.get("path") or ["root"]
+            sections.setdefault(str(path[0]), []).append(self._diff_row(flat_dict))
+        table_header = "<tr><th>Path</th><th>Change</th><th>Output</th><th>Expected</th></tr>"
+        index_link = os.path.relpath(os.path.join(self.reports_path, INDEX_FILE), report_dir).replace(os.sep, "/")
+        header = (
+            f"<p><a href='{index_link}'>All requests</a> | "
+            f"request ID {html.escape(str(report['request_id']))} | {len(report['diff'])} differences | "
+            f"full files: <a href='input_{input_file_name}.json'>input</a>, <a href='output_{input_file_name}.json'>output</a>, "
+            f"<a href='expected_{input_file_name}.json'>expected</a></p>"
+        )
+        _write_pages(
+            report_dir,
+            PAGE_FILE,
+            input_file_name,
+            header,
+            [(key, table_header, rows) for key, rows in sections.items()],
+            self.page_size,
+        )
+        folder = os.path.basename(os.path.dirname(report_dir))
+        page = os.path.relpath(os.path.join(report_dir, PAGE_FILE), self.reports_path)
+        self.requests.append((folder, input_file_name, report["request_id"], len(report["diff"]), page))
+
+    def write_index(self, version_info, total_comparisons):
+        """
+        Writes the index pages, the differing requests grouped by recording folder.
+        Returns:
+            str: The path of the first index page.
+        """
+        sections = {}
+        for folder, input_file_name, request_id, count, page in sorted(self.requests):
+            sections.setdefault(folder, []).append(
+                f"<tr><td><a href='{html.escape(page.replace(os.sep, '/'))}'>{html.escape(input_file_name)}</a></td>"
+                f"<td>{html.escape(str(request_id))}</td><td>{count}</td></tr>"
+            )
+        table_header = "<tr><th>Request</th><th>Request ID</th><th>Differences</th></tr>"
+        header = (
+            f"<p>Output version: <code>{html.escape(json.dumps(version_info, default=str))}</code></p>"
+            f"<p>{total_comparisons} requests with differences in {len(sections)} recordings</p>"
+        )
+        os.makedirs(self.reports_path, exist_ok=True)
+        _write_pages(
+            self.reports_path,
+            INDEX_FILE,
+            "Comparison summary",
+            header,
+            [(folder, table_header, rows) for folder, rows in sections.items()],
+            self.page_size,
+        )
+        index_path = os.path.join(self.reports_path, INDEX_FILE)
+        LOGGER.info(f"Diff dashboard generated at {index_path}")
+        return index_path
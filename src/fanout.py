@@ -0,0 +1,182 @@
+import asyncio
+import os
+from src.configure import get_logger
+from src.exceptions import handle_exceptions
+from src.utils import list_outputs, load_json_file, save_json_file
+
+LOGGER = get_logger("fanout")
+
+PARITY_REPORT_FILE = "environment_parity.json"
+
+# The replay and comparison modules are imported when they are used, like in wiser_tester, so a --compare_only
+# fan-out doesn't load socketio and a --no_comparison one doesn't load deepdiff.
+
+
+def environment_name(config_path):
+    """Names an environment after its config file, e.g. `config/config_clalit.json` -> `clalit`."""
+    name = os.path.splitext(os.path.basename(config_path))[0]
+    return name[len("config_") :] if name.startswith("config_") and name != "config_" else name
+
+
+class EnvironmentFanOut:
+    """
+    Replays the same recordings concurrently against several Wiser deployments, one config file per deployment.
+    Every environment gets its own session and output root, `<output_dir>/<environment>`. The outputs of every
+    environment are compared with its expectations and with the outputs of the first (reference) environment.
+    """
+
+    def __init__(
+        self,
+        username,
+        password,
+        request_timeout,
+        configs,
+        exclude_inputs,
+        input_dir=None,
+        output_dir=None,
+        report_types=None,
+        selector=None,
+        shard_count=1,
+    ):
+        """
+        Initializes the EnvironmentFanOut instance.
+        Args:
+            username (str): Username for login, used for every environment.
+            password (str): Password for login.
+            request_timeout (int): Timeout for waiting on reports.
+            configs (dict): Environment name -> config file dictionary, the first environment is the reference.
+            exclude_inputs (lst): List of input files to exclude
+            output_dir (str, optional): Root of the environment output roots. Defaults to each config's `output_dir`.
+            report_types (lst, optional): Only send reports of these types, other requests are always sent
+            selector (lst, optional): Parsed selector terms, only matching requests and the builds they need are sent
+            shard_count (int): Number of worker processes to split the recordings across, per environment.
+        """
+        self.username = username
+        self.password = password
+        self.request_timeout = request_timeout
+        self.configs = configs
+        self.exclude_inputs = exclude_inputs
+        self.input_dir = input_dir or next(iter(configs.values()))["input_dir"]
+        self.output_dirs = {name: os.path.join(output_dir or config["output_dir"], name) for name, config in configs.items()}
+        self.report_types = report_types
+        self.selector = selector
+        self.shard_count = shard_count
+
+    async def run(self, specific_inputs=None, soak_duration=None, soak_iterations=None):
+        """
+        Replays the recordings against every environment concurrently.
+        Args:
+            specific_inputs (list, optional): Recordings to replay. If None, all recordings are replayed.
+            soak_duration (int, optional): Replay the inputs in a loop for this many seconds.
+            soak_iterations (int, optional): Replay the inputs in a loop this many times.
+        Returns:
+            list: The names of the environments that were replayed without failing, reference first.
+        """
+        names = list(self.configs)
+        results = await asyncio.gather(
+            *(self._replay(name, specific_inputs, soak_duration, soak_iterations) for name in names), return_exceptions=True
+        )
+        replayed = []
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                LOGGER.error(f"environment {name} failed: {result}")
+            else:
+                replayed.append(name)
+        return replayed
+
+    async def _replay(self, name, specific_inputs, soak_duration, soak_iterations):
+        config, output_dir = self.configs[name], self.output_dirs[name]
+        os.makedirs(output_dir, exist_ok=True)
+        LOGGER.info(f"replaying against {name} ({config['host']}) into {output_dir}")
+        tester_args = (self.username, self.password, self.request_timeout, config, self.exclude_inputs)
+        if self.shard_count > 1:
+            from src.shard import ShardCoordinator
+
+            coordinator = ShardCoordinator(
+                *tester_args, self.shard_count, self.input_dir, output_dir, self.report_types, self.selector
+            )
+            await coordinator.run(specific_inputs)
+            return
+        from src.tester import WiserTester
+
+        tester = WiserTester(*tester_args, self.input_dir, output_dir, self.report_types, self.selector)
+        try:
+            await tester.start_testing(specific_inputs, soak_duration, soak_iterations)
+        finally:
+            await tester.close()
+
+    def compare(self, environments, reports_path, expected_dir=None, specific_inputs=None, no_preprocessing=False):
+        """
+        Compares every environment with its expectations, then with the reference environment, and writes the
+        environment parity report.
+        Args:
+            environments (list): Names of the environments to compare, the first one is the reference.
+            reports_path (str): Root of the comparison reports, one directory per comparison.
+            expected_dir (str, optional): Location of the expectations. Defaults to each config's `expected_dir`.
+            specific_inputs (list, optional): Recordings to compare. If None, all recordings are compared.
+            no_preprocessing (bool): Whether to skip data preprocessing.
+        Returns:
+            str: Path to the environment parity report, None if there are no environments to compare.
+        """
+        from src.compare import Compare
+
+        os.makedirs(reports_path, exist_ok=True)
+        for name in environments:
+            LOGGER.info(f"Comparing {name} outputs to expectations")
+            comparison = Compare(
+                config=self.configs[name],
+                reports_path=os.path.join(reports_path, name),
+                input_dir=self.input_dir,
+                output_dir=self.output_dirs[name],
+                expected_dir=expected_dir,
+                specific_list=specific_inputs,
+            )
+            comparison.compare_outputs_with_expectations(no_preprocessing)
+
+        if len(environments) < 2:
+            LOGGER.error("Environment parity needs at least two replayed environments")
+            return None
+        reference = environments[0]
+        reference_outputs = list_outputs(self.output_dirs[reference], specific_inputs)
+        parity = {
+            "reference": reference,
+            "reference_version_info": self._version_info(reference),
+            "environments": {},
+        }
+        for name in environments[1:]:
+            LOGGER.info(f"Comparing {name} outputs to {reference}")
+            comparison = Compare(
+                config=self._parity_config(reference, name),
+                reports_path=os.path.join(reports_path, f"{reference}_vs_{name}"),
+                input_dir=self.input_dir,
+                output_dir=self.output_dirs[name],
+                expected_dir=self.output_dirs[reference],
+                specific_list=specific_inputs,
+            )
+            summary_path = comparison.compare_outputs_with_expectations(no_preprocessing)
+            outputs = list_outputs(self.output_dirs[name], specific_inputs)
+            parity["environments"][name] = {
+                "host": self.configs[name]["host"],
+                "version_info": self._version_info(name),
+                "compared_outputs": len(reference_outputs & outputs),
+                "differing_outputs": len(comparison.report_paths),
+                "missing_outputs": sorted(reference_outputs - outputs),
+                "extra_outputs": sorted(outputs - reference_outputs),
+                "summary_report": summary_path,
+            }
+            LOGGER.info(
+                f"{name}: {len(comparison.report_paths)} of {len(reference_outputs & outputs)} outputs differ from {reference}"
+            )
+
+        parity_path = os.path.join(reports_path, PARITY_REPORT_FILE)
+        save_json_file(parity, parity_path)
+        return parity_path
+
+    def _parity_config(self, reference, name):
+        """The reference config, ignoring the paths ignored by either environment."""
+        ignore_paths = self.configs[reference].get("ignore_paths", []) + self.configs[name].get("ignore_paths", [])
+        return {**self.configs[reference], "ignore_paths": list(dict.fromkeys(ignore_paths))}
+
+    @handle_exceptions("Failed to load environment version information", False)
+    def _version_info(self, name):
+        return load_json_file(os.path.join(self.output_dirs[name], "version_info.json"))
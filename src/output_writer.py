@@ -0,0 +1,61 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from src.configure import get_logger
+from src.work_queue import WorkQueue
+
+LOGGER = get_logger("output_writer")
+
+
+class OutputWriter(WorkQueue):
+    """
+    Runs blocking output writes in a thread pool, off the event loop.
+    Writes are queued in a bounded queue, `submit` waits while the queue is full, and `flush` waits until
+    every queued write has finished.
+    """
+
+    name = "Output writer"
+    failure_message = "Background write failed"
+    logger = LOGGER
+
+    def __init__(self, max_pending=32, workers=2):
+        """
+        Args:
+            max_pending (int): Maximum number of queued writes before `submit` blocks.
+            workers (int): Number of writer threads.
+        """
+        super().__init__(max_pending, workers)
+        self.executor = None
+
+    def _start(self):
+        """Creates the writer threads, queue and writer tasks, inside the running event loop."""
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="output-writer")
+        super()._start()
+
+    def _stop(self):
+        self.executor.shutdown(wait=True)
+        self.executor = None
+
+    async def submit(self, func, *args):
+        """
+        Queues a blocking write, waiting for a free slot when the queue is full.
+        Args:
+            func (Callable): The blocking function performing the write.
+            *args: Arguments for `func`.
+        """
+        if self.queue is None:
+            self._start()
+        await self.queue.put((func, args))
+        self._queued()
+
+    async def _process(self, item):
+        func, args = item
+        await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def stats(self):
+        """Returns the write counters of the writer."""
+        return {
+            "written": self.processed,
+            "failed": self.failed,
+            "write_seconds": round(self.processing_seconds, 3),
+            "max_queue_depth": self.max_queue_depth,
+        }
@@ -0,0 +1,167 @@
+import asyncio
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from src.configure import get_logger
+from src.soak import percentile
+
+LOGGER = get_logger("profiler")
+
+PROFILE_SUMMARY_FILE = "profile_summary.json"
+PROFILE_TOP_N = 25  # hot functions listed per phase
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples of all threads
+LOOP_LAG_INTERVAL = 0.05  # seconds between event loop lag probes
+
+
+def _function_label(code_key):
+    """Formats a (file, line, function) key like pstats does."""
+    file_name, line, function = code_key
+    return f"{os.path.basename(file_name)}:{line}({function})"
+
+
+class PhaseProfiler:
+    """
+    Profiles the phases of a run (login, replay, save, compare, summary).
+    Each phase runs under its own cProfile profile, nested phases pause the enclosing one. A sampling thread records
+    the stacks of every thread, which also covers the output writer threads that cProfile doesn't see, and phases
+    can measure the event loop lag: how late a callback scheduled on the loop actually runs.
+    A disabled profiler costs nothing, its phases are no-ops.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stack = []  # (phase name, cProfile.Profile) of the active phases, innermost last
+        self.profiles = {}  # phase -> cProfile.Profile, accumulated when a phase is entered again
+        self.durations = defaultdict(float)
+        self.samples = defaultdict(Counter)  # phase -> Counter of (thread name, function label)
+        self.sample_counts = Counter()
+        self.loop_lags = defaultdict(list)
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+
+    def start(self):
+        """Starts the sampling thread."""
+        if self.enabled and self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        """Stops the sampling thread."""
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._sampler = None
+
+    @contextlib.contextmanager
+    def phase(self, name, monitor_loop=False):
+        """
+        Profiles the code run inside the context as phase `name`.
+        Args:
+            name (str): The phase name.
+            monitor_loop (bool): Measure the event loop lag during the phase, requires a running event loop.
+        """
+        if not self.enabled:
+            yield
+            return
+        if self.stack:
+            self.stack[-1][1].disable()
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        self.stack.append((name, profile))
+        monitor = asyncio.ensure_future(self._monitor_loop_lag(name)) if monitor_loop else None
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.durations[name] += time.perf_counter() - started
+            if monitor:
+                monitor.cancel()
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1][1].enable()
+
+    async def _monitor_loop_lag(self, name):
+        """Records how late a sleep of `LOOP_LAG_INTERVAL` wakes up, a busy loop wakes up late."""
+        while True:
+            expected = time.perf_counter() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.loop_lags[name].append(max(0.0, time.perf_counter() - expected))
+
+    def _sample(self):
+        """Counts the innermost function of every thread, attributed to the active phase."""
+        own_id = threading.get_ident()
+        while not self._stop_sampling.wait(SAMPLE_INTERVAL):
+            try:
+                name = self.stack[-1][0]
+            except IndexError:  # no active phase
+                continue
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                label = _function_label((code.co_filename, code.co_firstlineno, code.co_name))
+                self.samples[name][(thread_names.get(thread_id, str(thread_id)), label)] += 1
+            self.sample_counts[name] += 1
+
+    def _top_functions(self, profile):
+        """Returns the `PROFILE_TOP_N` functions with the highest own time in a profile."""
+        stats = pstats.Stats(profile).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:PROFILE_TOP_N]
+        return [
+            {"function": _function_label(key), "calls": calls, "tottime": round(tottime, 4), "cumtime": round(cumtime, 4)}
+            for key, (_, calls, tottime, cumtime, _) in ranked
+        ]
+
+    def summary(self):
+        """Returns the per-phase durations, hot functions, sampled hot spots and event loop lag."""
+        phases = {}
+        for name, profile in self.profiles.items():
+            sample_count = self.sample_counts[name] or 1
+            phases[name] = {
+                "seconds": round(self.durations[name], 3),
+                "top_functions": self._top_functions(profile),
+                "sampled": [
+                    {"thread": thread, "function": label, "share": round(count / sample_count, 3)}
+                    for (thread, label), count in self.samples[name].most_common(PROFILE_TOP_N)
+                ],
+            }
+        loop_lag = {}
+        for name, lags in self.loop_lags.items():
+            lags = sorted(lags)
+            loop_lag[name] = {
+                "probes": len(lags),
+                "mean": round(sum(lags) / len(lags), 4),
+                "p99": round(percentile(lags, 0.99), 4),
+                "max": round(lags[-1], 4),
+            }
+        return {"phases": phases, "event_loop_lag": loop_lag}
+
+    def save(self, directory):
+        """
+        Writes one `profile_<phase>.prof` file per phase (readable with pstats or snakeviz) and the summary.
+        Returns:
+            str: The path of the summary file, None if profiling is disabled.
+        """
+        if not self.enabled:
+            return None
+        self.stop()
+        os.makedirs(directory, exist_ok=True)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(directory, f"profile_{name}.prof"))
+        summary = self.summary()
+        summary_path = os.path.join(directory, PROFILE_SUMMARY_FILE)
+        with open(summary_path, "w") as file:
+            json.dump(summary, file, indent=2)
+        for name, phase in summary["phases"].items():
+            hottest = phase["top_functions"][0]["function"] if phase["top_functions"] else None
+            LOGGER.info(f"Phase {name}: {phase['seconds']}s, hottest {hottest}")
+        LOGGER.info(f"Profile saved to {summary_path}")
+        return summary_path
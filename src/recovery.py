@@ -0,0 +1,130 @@
+import asyncio
+import time
+from src.auth import login, session_expiry
+from src.configure import get_logger
+from src.exceptions import handle_exceptions
+
+LOGGER = get_logger("recovery")
+
+SESSION_EXPIRED_STATUSES = (401, 403)  # responses of requests sent with expired cookies or CSRF token
+
+
+class SessionRecovery:
+    """
+    Recovers the session of a tester after a socket reconnect or a login expiry.
+    The server assigns a new sid on reconnect and never delivers the reports of requests sent on the old one, so
+    those in-flight requests are sent again once connected, unless they were sent longer than the request timeout
+    ago. The login is renewed shortly before the session cookies expire, or when the server rejects a request as
+    unauthorized.
+    """
+
+    def __init__(self, tester, expiry_margin=None):
+        """
+        Initializes the SessionRecovery instance.
+        Args:
+            tester (WiserTester): The tester whose session is recovered.
+            expiry_margin (float, optional): Log in again this many seconds before the session expires.
+        """
+        self.tester = tester
+        self.expiry_margin = expiry_margin if expiry_margin is not None else tester.config.get("session_expiry_margin", 60)
+        self.session_expiry = None  # UNIX timestamp, None if the cookies don't tell
+        self.disconnected_at = None
+        self.recovery_seconds = []  # per reconnect, from the disconnect until the in-flight requests were sent again
+        self.relogins, self.reissued = 0, 0
+        self.login_lock = asyncio.Lock()
+
+    async def login(self):
+        """Logs in and stores the session cookies on the tester."""
+        _, self.tester.cookies = await login(self.tester.username, self.tester.password, self.tester.server_url)
+        self.session_expiry = session_expiry(self.tester.cookies)
+        LOGGER.debug(f"Obtained cookies {sorted(self.tester.cookies)}, expiring at {self.session_expiry}")
+
+    async def relogin(self, reason, stale_cookies=None):
+        """
+        Logs in again, unless the cookies were already renewed since `stale_cookies` were used.
+        Args:
+            reason (str): Why the session is renewed, for the log.
+            stale_cookies (optional): The cookies a rejected request was sent with.
+        """
+        async with self.login_lock:
+            if stale_cookies is not None and self.tester.cookies is not stale_cookies:
+                return
+            started = time.monotonic()
+            LOGGER.warning(f"Logging in again: {reason}")
+            await self.login()
+            self.relogins += 1
+            LOGGER.info(f"Logged in again in {time.monotonic() - started:.2f}s")
+
+    async def ensure_session(self):
+        """Logs in again when the session expires within the expiry margin."""
+        if self.session_expiry and time.time() > self.session_expiry - self.expiry_margin:
+            await self.relogin("session cookies are expiring", self.tester.cookies)
+
+    def on_disconnect(self):
+        """Called when the socket disconnects, new requests wait until the session is recovered."""
+        self.tester.connected.clear()
+        if self.disconnected_at is None:
+            self.disconnected_at = time.monotonic()
+
+    def on_connect(self, sid):
+        """Called when the socket (re)connects, sends the requests of a previous sid again before resuming."""
+        previous_sid, self.tester.session_id = self.tester.session_id, sid
+        if previous_sid is None or previous_sid == sid:
+            self._recovered()
+            return
+        # Taken before any new request is sent on the new sid. Requests older than the request timeout are no
+        # longer waited for, they are timed out rather than sent again.
+        requests = self.tester.requests
+        stale_requests = requests.in_flight(previous_sid, max_age=self.tester.request_timeout)
+        expired_requests = set(requests.in_flight(previous_sid)) - set(stale_requests)
+        for request_id in expired_requests:
+            requests.time_out(request_id)
+        LOGGER.warning(
+            f"Session ID changed, {len(stale_requests)} in-flight requests will be sent again, "
+            f"{len(expired_requests)} older requests timed out"
+        )
+        asyncio.ensure_future(self._recover(stale_requests))
+
+    async def _recover(self, stale_requests):
+        try:
+            await self.ensure_session()
+            for request_id in stale_requests:
+                await self._reissue(request_id)
+        finally:
+            self._recovered()
+
+    def _recovered(self):
+        self.tester.connected.set()
+        if self.disconnected_at is not None:
+            elapsed = time.monotonic() - self.disconnected_at
+            self.recovery_seconds.append(elapsed)
+            self.disconnected_at = None
+            LOGGER.info(f"Session recovered after {elapsed:.2f}s", extra={"duration": elapsed})
+
+    @handle_exceptions("Failed to send an in-flight request again", False)
+    async def _reissue(self, request_id):
+        """Sends an in-flight request again on the current sid, its old request ID is forgotten."""
+        record = self.tester.requests.discard(request_id)
+        if record is None or record.request_path is None:
+            return
+        json_request, _ = self.tester.load_request(record.request_path)
+        json_request, headers = self.tester.prepare_request_data(json_request)
+        new_request_id, _ = await self.tester.send_request(
+            json_request, headers, record.input_file_name, record.request_path, record.input_dir
+        )
+        if new_request_id:
+            self.reissued += 1
+            LOGGER.info(
+                f"Sent request {request_id} again as {new_request_id}",
+                extra={"request_id": new_request_id, "input_file": record.input_file_name},
+            )
+
+    def stats(self):
+        """Returns the reconnect, login and re-sent request counters and the recovery times."""
+        return {
+            "reconnects": len(self.recovery_seconds),
+            "relogins": self.relogins,
+            "reissued": self.reissued,
+            "recovery_seconds_max": round(max(self.recovery_seconds), 3) if self.recovery_seconds else None,
+            "recovery_seconds_total": round(sum(self.recovery_seconds), 3),
+        }
@@ -0,0 +1,71 @@
+import asyncio
+from src.configure import get_logger
+from src.work_queue import WorkQueue
+
+LOGGER = get_logger("report_dispatcher")
+
+
+class ReportDispatcher(WorkQueue):
+    """
+    Processes incoming socket events with a fixed number of worker tasks.
+    Events are queued in a bounded queue. When the queue is full the event is dropped instead of piling up
+    another coroutine holding its payload, so memory stays bounded when the server emits reports in bursts.
+    Dropped events are passed to `on_drop`, so whoever waits for them can stop waiting.
+    """
+
+    name = "Report dispatcher"
+    failure_message = "Processing a report failed"
+    logger = LOGGER
+
+    def __init__(self, handler, max_pending=64, workers=4, on_drop=None):
+        """
+        Args:
+            handler (Callable): Coroutine function processing one event payload.
+            max_pending (int): Maximum number of queued events, further events are dropped.
+            workers (int): Number of worker tasks processing events concurrently.
+            on_drop (Callable, optional): Function called with the payload of every dropped event.
+        """
+        super().__init__(max_pending, workers)
+        self.handler = handler
+        self.on_drop = on_drop
+        self.received, self.dropped = 0, 0
+
+    def dispatch(self, data):
+        """
+        Queues an event for processing, never waits.
+        Returns:
+            bool: False if the queue was full and the event was dropped.
+        """
+        if self.queue is None:
+            self._start()
+        self.received += 1
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            report_id = data.get("id") if isinstance(data, dict) else None
+            LOGGER.error(
+                f"Report queue full ({self.max_pending} pending), dropped report {report_id}",
+                extra={"request_id": report_id},
+            )
+            if self.on_drop:
+                self.on_drop(data)
+            return False
+        self._queued()
+        return True
+
+    async def _process(self, item):
+        await self.handler(item)
+
+    def stats(self):
+        """Returns the event counters, queue depth and processing times of the dispatcher."""
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "processing_seconds": round(self.processing_seconds, 3),
+            "max_processing_seconds": round(self.max_processing_seconds, 3),
+        }
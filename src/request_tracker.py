@@ -0,0 +1,175 @@
+import time
+from collections import deque
+
+
+class RequestRecord:
+    """Bookkeeping for a single request sent to the server."""
+
+    __slots__ = (
+        "request_id",
+        "input_file_name",
+        "input_dir",
+        "sent_at",
+        "completed_at",
+        "timed_out_at",
+        "request_path",
+        "session_id",
+    )
+
+    def __init__(self, request_id, input_file_name, input_dir, sent_at, request_path=None, session_id=None):
+        self.request_id = request_id
+        self.input_file_name = input_file_name
+        self.input_dir = input_dir
+        self.sent_at = sent_at
+        self.request_path = request_path  # where the request was loaded from, to send it again
+        self.session_id = session_id  # socket sid the report will be emitted to
+        self.completed_at = None
+        self.timed_out_at = None  # set when the wait for the report timed out, a late report may still complete it
+
+    @property
+    def settled_at(self):
+        """When the request stopped waiting for its report, completed or timed out, None while in flight."""
+        return self.completed_at if self.completed_at is not None else self.timed_out_at
+
+    @property
+    def latency(self):
+        """Seconds between sending the request and receiving its report, None while in flight."""
+        if self.completed_at is None:
+            return None
+        return self.completed_at - self.sent_at
+
+
+class RequestTracker:
+    """
+    Tracks in-flight requests and keeps completed or timed out ones for a grace window, so late reports can still be
+    mapped to their input file. Requests settled longer than the grace window ago are evicted, as are in-flight
+    requests older than the request timeout plus the grace window, which keeps memory bounded for long-running sessions.
+    """
+
+    def __init__(self, grace_period=300, max_latency_samples=10000, request_timeout=None):
+        """
+        Args:
+            grace_period (float): Seconds to keep a completed or timed out request before evicting it.
+            max_latency_samples (int): Maximum number of undrained latency samples to keep.
+            request_timeout (float, optional): Seconds to wait for a report. In-flight requests older than the timeout
+                plus the grace period are evicted. If None, in-flight requests are kept until they complete or time out.
+        """
+        self.grace_period = grace_period
+        self.request_timeout = request_timeout
+        self._records = {}  # request ID -> RequestRecord
+        self._settled = deque()  # (settled_at, request ID) in completion or timeout order, for eviction
+        self._sent = deque()  # (sent_at, request ID) in sending order, for evicting stale in-flight requests
+        self._in_flight = 0
+        self._latencies = deque(maxlen=max_latency_samples)
+
+    def __contains__(self, request_id):
+        return request_id in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, request_id, input_file_name, input_dir, request_path=None, session_id=None):
+        """Registers a newly sent request and returns its record."""
+        self.evict_expired()
+        record = RequestRecord(request_id, input_file_name, input_dir, time.monotonic(), request_path, session_id)
+        previous = self._records.get(request_id)
+        if previous is None or previous.settled_at is not None:
+            self._in_flight += 1
+        self._records[request_id] = record
+        if self.request_timeout is not None:
+            self._sent.append((record.sent_at, request_id))
+        return record
+
+    def get(self, request_id):
+        """Returns the record of a request, or None if it is unknown or was evicted."""
+        return self._records.get(request_id)
+
+    def input_file_name(self, request_id, default="unknown"):
+        """Returns the input file name the request was sent from."""
+        record = self._records.get(request_id)
+        return record.input_file_name if record else default
+
+    def complete(self, request_id):
+        """
+        Marks a request as completed, also when its report arrives after it timed out.
+        Returns:
+            RequestRecord: The request record, or None if the request is unknown or was evicted.
+        """
+        record = self._records.get(request_id)
+        if record is not None and record.completed_at is None:
+            if record.timed_out_at is None:
+                self._in_flight -= 1
+            record.completed_at = time.monotonic()
+            self._settled.append((record.completed_at, request_id))
+            self._latencies.append(record.latency)
+        self.evict_expired()
+        return record
+
+    def time_out(self, request_id):
+        """
+        Marks an in-flight request as timed out, it is no longer waited for but is kept for the grace window.
+        Returns:
+            RequestRecord: The request record, or None if the request is unknown or was evicted.
+        """
+        record = self._records.get(request_id)
+        if record is not None and record.settled_at is None:
+            record.timed_out_at = time.monotonic()
+            self._settled.append((record.timed_out_at, request_id))
+            self._in_flight -= 1
+        return record
+
+    def fail(self, request_id):
+        """Marks an in-flight request whose report was lost, e.g. dropped when the report queue was full, as timed out."""
+        return self.time_out(request_id)
+
+    def in_flight(self, session_id=None, max_age=None):
+        """
+        Returns the IDs of the requests still waiting for a report.
+        Args:
+            session_id (str, optional): Only the requests sent on this sid.
+            max_age (float, optional): Only the requests sent less than this many seconds ago.
+        """
+        sent_after = time.monotonic() - max_age if max_age is not None else None
+        return [
+            request_id
+            for request_id, record in self._records.items()
+            if record.settled_at is None
+            and (session_id is None or record.session_id == session_id)
+            and (sent_after is None or record.sent_at >= sent_after)
+        ]
+
+    def discard(self, request_id):
+        """Forgets an in-flight request whose report will never arrive, e.g. because it was sent again."""
+        record = self._records.get(request_id)
+        if record is not None and record.settled_at is None:
+            del self._records[request_id]
+            self._in_flight -= 1
+        return record
+
+    def drain_latencies(self):
+        """Returns the latencies of the requests completed since the last call, and clears them."""
+        latencies = list(self._latencies)
+        self._latencies.clear()
+        return latencies
+
+    def evict_expired(self, now=None):
+        """Drops settled requests whose grace window has passed, and in-flight requests past the timeout and grace window."""
+        now = time.monotonic() if now is None else now
+        while self._settled and now - self._settled[0][0] > self.grace_period:
+            settled_at, request_id = self._settled.popleft()
+            record = self._records.get(request_id)
+            # The ID may have been re-registered or completed late since, only evict the record settled at this time
+            if record is not None and record.settled_at == settled_at:
+                del self._records[request_id]
+        if self.request_timeout is None:
+            return
+        while self._sent and now - self._sent[0][0] > self.request_timeout + self.grace_period:
+            sent_at, request_id = self._sent.popleft()
+            record = self._records.get(request_id)
+            if record is not None and record.sent_at == sent_at and record.settled_at is None:
+                del self._records[request_id]
+                self._in_flight -= 1
+
+    def stats(self):
+        """Returns the current number of in-flight requests and of retained completed requests."""
+        return {"in_flight": self._in_flight, "retained": len(self._records) - self._in_flight}
@@ -0,0 +1,43 @@
+import argparse
+
+# Selector field -> SQL expression over the catalog, `?` is bound to a glob pattern
+SELECTOR_FIELDS = {
+    "messageType": "requests.message_type GLOB ?",
+    "report.type": "requests.report_type GLOB ?",
+    "cohortId": "EXISTS (SELECT 1 FROM request_cohorts WHERE request_cohorts.path = requests.path AND cohort_id GLOB ?)",
+}
+
+
+def parse_selector_term(term):
+    """
+    Parses a selector term of the form `field=pattern[,pattern...]` or `field!=pattern[,pattern...]`.
+    Patterns are globs (`*`, `?`, `[...]`), a term matches when any of its patterns matches.
+    Returns:
+        tuple: (field, negated, patterns)
+    Raises:
+        argparse.ArgumentTypeError: If the term is malformed or the field is unknown.
+    """
+    negated = "!=" in term
+    field, sep, value = term.partition("!=" if negated else "=")
+    if not sep or not value:
+        raise argparse.ArgumentTypeError(f"Invalid selector '{term}', expected field=pattern")
+    if field not in SELECTOR_FIELDS:
+        raise argparse.ArgumentTypeError(f"Unknown selector field '{field}', expected one of {list(SELECTOR_FIELDS)}")
+    return field, negated, [pattern.strip() for pattern in value.split(",")]
+
+
+def selector_sql(terms):
+    """
+    Builds the SQL condition matching requests selected by all the terms.
+    Args:
+        terms (list): Parsed selector terms, see `parse_selector_term`.
+    Returns:
+        tuple: (SQL condition, parameters)
+    """
+    conditions, params = [], []
+    for field, negated, patterns in terms:
+        condition = " OR ".join([SELECTOR_FIELDS[field]] * len(patterns))
+        # A missing report type only matches negated terms
+        conditions.append(f"NOT coalesce(({condition}), 0)" if negated else f"({condition})")
+        params += patterns
+    return " AND ".join(conditions), params
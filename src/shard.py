@@ -0,0 +1,214 @@
+import asyncio
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from src.catalog import RecordingCatalog
+from src.configure import get_logger, setup_logging, shutdown_logging
+from src.exceptions import handle_exceptions
+from src.tester import RECORDING_DURATIONS_FILE, WiserTester
+from src.utils import MISSING_OUTPUTS_FILE, load_json_file, save_json_file
+
+LOGGER = get_logger("shard")
+
+SHARD_DIR_PREFIX = ".shard_"
+
+
+def partition_recordings(recordings, weights, shard_count):
+    """
+    Splits recordings into balanced shards using longest-processing-time-first assignment.
+    Args:
+        recordings (list): Recording folder names.
+        weights (dict): Recording folder name -> expected replay duration.
+        shard_count (int): Number of shards to create.
+    Returns:
+        list: A list of `shard_count` lists of recording names, empty shards are dropped.
+    """
+    shards = [[] for _ in range(shard_count)]
+    loads = [0.0] * shard_count
+    for recording in sorted(recordings, key=lambda rec: (-weights[rec], rec)):
+        lightest = loads.index(min(loads))
+        shards[lightest].append(recording)
+        loads[lightest] += weights[recording]
+    return [shard for shard in shards if shard]
+
+
+def _replay_shard(*tester_args, recordings):
+    """Worker process entry point, replays one shard with its own Wiser session."""
+    setup_logging(config=tester_args[3])  # the tester arguments start with username, password, timeout, config
+    try:
+        return asyncio.run(_replay_shard_async(*tester_args, recordings=recordings))
+    finally:
+        shutdown_logging()
+
+
+async def _replay_shard_async(*tester_args, recordings):
+    # The tester is created inside the worker's event loop so its asyncio primitives are bound to it
+    tester = WiserTester(*tester_args)
+    try:
+        await tester.start_testing(recordings)
+    finally:
+        await tester.close()
+    return tester.recording_durations
+
+
+class ShardCoordinator:
+    """Partitions the recordings between local worker processes and merges their outputs."""
+
+    def __init__(
+        self,
+        username,
+        password,
+        request_timeout,
+        config,
+        exclude_inputs,
+        shard_count,
+        input_dir=None,
+        output_dir=None,
+        report_types=None,
+        selector=None,
+    ):
+        """
+        Initializes the ShardCoordinator instance.
+        Args:
+            username (str): Username for login, every worker opens its own session.
+            password (str): Password for login.
+            request_timeout (int): Timeout for waiting on reports.
+            config (dict): Config file dictionary
+            exclude_inputs (lst): List of input files to exclude
+            shard_count (int): Number of worker processes to split the recordings across.
+            report_types (lst, optional): Only send reports of these types, other requests are always sent
+            selector (lst, optional): Parsed selector terms, only matching requests and the builds they need are sent
+        """
+        self.username = username
+        self.password = password
+        self.request_timeout = request_timeout
+        self.config = config
+        self.exclude_inputs = exclude_inputs
+        self.shard_count = shard_count
+        self.input_dir = input_dir or config["input_dir"]
+        self.output_dir = output_dir or config["output_dir"]
+        self.report_types = report_types
+        self.selector = selector
+
+    def _recording_weights(self, recordings, request_counts):
+        """
+        Estimates the replay duration of each recording from the durations history.
+        Recordings without history are weighted by their request count and the average per-request duration.
+        """
+        durations_path = os.path.join(self.output_dir, RECORDING_DURATIONS_FILE)
+        history = load_json_file(durations_path) if os.path.exists(durations_path) else {}
+        request_counts = {rec: request_counts.get(rec, 0) for rec in recordings}
+        known = [rec for rec in recordings if rec in history and request_counts[rec]]
+        if known:
+            per_request = sum(history[rec] for rec in known) / sum(request_counts[rec] for rec in known)
+        else:
+            per_request = 1.0
+        return {rec: history.get(rec, request_counts[rec] * per_request) for rec in recordings}
+
+    def plan(self, specific_inputs=None):
+        """
+        Builds the shard plan for the selected recordings.
+        Args:
+            specific_inputs (list, optional): Recordings to replay. If None, all recordings in the input directory are used.
+        Returns:
+            list: Lists of recording names, one per shard.
+        """
+        catalog = RecordingCatalog(self.input_dir, self.config.get("catalog_path"))
+        try:
+            catalog.refresh()
+            recordings = catalog.recordings() if specific_inputs is None else list(specific_inputs)
+            request_counts = catalog.request_counts()
+        finally:
+            catalog.close()
+        weights = self._recording_weights(recordings, request_counts)
+        shards = partition_recordings(recordings, weights, self.shard_count)
+        for index, shard in enumerate(shards):
+            LOGGER.info(f"shard {index}: {shard} (estimated {sum(weights[rec] for rec in shard):.1f}s)")
+        return shards
+
+    async def run(self, specific_inputs=None):
+        """
+        Replays the shards in parallel worker processes and merges the outputs into the output directory.
+        Args:
+            specific_inputs (list, optional): Recordings to replay. If None, all recordings are replayed.
+        """
+        shards = self.plan(specific_inputs)
+        if not shards:
+            LOGGER.warning("No recordings selected, nothing to replay")
+            return
+        shard_dirs = [os.path.join(self.output_dir, f"{SHARD_DIR_PREFIX}{index}") for index in range(len(shards))]
+        for shard_dir in shard_dirs:
+            if os.path.isdir(shard_dir):
+                shutil.rmtree(shard_dir)
+            os.makedirs(shard_dir)
+
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [
+                loop.run_in_executor(
+                    executor,
+                    partial(
+                        _replay_shard,
+                        self.username,
+                        self.password,
+                        self.request_timeout,
+                        self.config,
+                        self.exclude_inputs,
+                        self.input_dir,
+                        shard_dir,
+                        self.report_types,
+                        self.selector,
+                        recordings=shard,
+                    ),
+                )
+                for shard, shard_dir in zip(shards, shard_dirs)
+            ]
+            results = await asyncio.gather(*futures, return_exceptions=True)
+
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                LOGGER.error(f"shard {index} failed: {result}")
+        self.merge_outputs(shard_dirs)
+
+    @handle_exceptions("Failed to merge shard outputs", False)
+    def merge_outputs(self, shard_dirs):
+        """
+        Moves the recording folders of every shard into the output directory and writes a unified version info file.
+        Args:
+            shard_dirs (list): The output directories of the shards.
+        """
+        version_infos = []
+        durations_path = os.path.join(self.output_dir, RECORDING_DURATIONS_FILE)
+        durations = load_json_file(durations_path) if os.path.exists(durations_path) else {}
+        missing_outputs = []
+
+        for shard_dir in shard_dirs:
+            for item in os.listdir(shard_dir):
+                item_path = os.path.join(shard_dir, item)
+                if item == "version_info.json":
+                    version_infos.append(load_json_file(item_path))
+                elif item == RECORDING_DURATIONS_FILE:
+                    durations.update(load_json_file(item_path))
+                elif item == MISSING_OUTPUTS_FILE:
+                    missing_outputs.extend(load_json_file(item_path))
+                elif os.path.isdir(item_path):
+                    destination = os.path.join(self.output_dir, item)
+                    if os.path.isdir(destination):
+                        shutil.rmtree(destination)
+                    shutil.move(item_path, destination)
+            shutil.rmtree(shard_dir)
+
+        save_json_file(durations, durations_path)
+        missing_outputs_path = os.path.join(self.output_dir, MISSING_OUTPUTS_FILE)
+        if missing_outputs:
+            save_json_file(sorted(missing_outputs), missing_outputs_path)
+        elif os.path.exists(missing_outputs_path):
+            os.remove(missing_outputs_path)
+        if not version_infos:
+            LOGGER.error("No shard reported version information.")
+            return
+        if any(info != version_infos[0] for info in version_infos[1:]):
+            LOGGER.error(f"Shards reported different versions: {version_infos}")
+        save_json_file(version_infos[0], os.path.join(self.output_dir, "version_info.json"))
+        LOGGER.info(f"Merged {len(shard_dirs)} shards into {self.output_dir}")
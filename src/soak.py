@@ -0,0 +1,129 @@
+from datetime import datetime
+import json
+import os
+import time
+from src.configure import get_logger
+from src.utils import current_rss_bytes
+
+LOGGER = get_logger("soak")
+
+SOAK_TELEMETRY_FILE = "soak_telemetry.jsonl"
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list, None if it is empty."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def relative_trend(values):
+    """
+    Fits a least-squares line through the values and returns the fitted rise over the series,
+    relative to the fitted starting value. Returns None when there are fewer than 3 values.
+    """
+    points = [(index, value) for index, value in enumerate(values) if value is not None]
+    if len(points) < 3:
+        return None
+    count = len(points)
+    mean_x = sum(x for x, _ in points) / count
+    mean_y = sum(y for _, y in points) / count
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+    start = mean_y - slope * mean_x
+    if start <= 0:
+        return None
+    return slope * (points[-1][0] - points[0][0]) / start
+
+
+class SoakRunner:
+    """Replays the selected inputs in a loop and records per-iteration latency, error and memory telemetry."""
+
+    def __init__(self, tester, duration=None, iterations=None, telemetry_path=None, trend_threshold=None):
+        """
+        Initializes the SoakRunner instance.
+        Args:
+            tester (WiserTester): A logged in and connected tester.
+            duration (int, optional): Stop starting new iterations after this many seconds.
+            iterations (int, optional): Stop after this many iterations.
+            telemetry_path (str, optional): Path of the JSON lines telemetry file. Defaults to the output directory.
+            trend_threshold (float, optional): Relative rise of the median latency over the run that is flagged.
+        """
+        self.tester = tester
+        self.duration = duration
+        self.iterations = iterations
+        self.telemetry_path = telemetry_path or os.path.join(tester.output_dir, SOAK_TELEMETRY_FILE)
+        self.trend_threshold = trend_threshold or tester.config.get("soak_trend_threshold", 0.2)
+        self.samples = []
+
+    def _should_continue(self, iteration, started):
+        if self.iterations and iteration >= self.iterations:
+            return False
+        if self.duration and time.monotonic() - started >= self.duration:
+            return False
+        return True
+
+    async def run(self, inputs_list=None):
+        """
+        Runs the soak loop.
+        Args:
+            inputs_list (list, optional): A list of specific inputs to be tested. If None, all inputs will be tested.
+        Returns:
+            list: The telemetry samples, one per iteration.
+        """
+        LOGGER.info(f"Starting soak run (duration: {self.duration}s, iterations: {self.iterations})")
+        started = time.monotonic()
+        iteration = 0
+        with open(self.telemetry_path, "w") as telemetry_file:
+            while self._should_continue(iteration, started):
+                iteration += 1
+                sample = await self._run_iteration(iteration, started, inputs_list)
+                telemetry_file.write(json.dumps(sample) + "\n")
+                telemetry_file.flush()
+        LOGGER.info(f"Soak run finished after {iteration} iterations, telemetry saved to {self.telemetry_path}")
+        return self.samples
+
+    async def _run_iteration(self, iteration, started, inputs_list):
+        """Replays the inputs once and returns the telemetry sample of the iteration."""
+        errors_before, timeouts_before = self.tester.error_count, self.tester.timeout_count
+        self.tester.requests.drain_latencies()
+        iteration_started = time.monotonic()
+
+        await self.tester.test_inputs(inputs_list)
+
+        latencies = sorted(round(latency, 4) for latency in self.tester.requests.drain_latencies())
+        errors = self.tester.error_count - errors_before
+        timeouts = self.tester.timeout_count - timeouts_before
+        requests = len(latencies) + timeouts
+        sample = {
+            "iteration": iteration,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "elapsed": round(time.monotonic() - started, 3),
+            "iteration_duration": round(time.monotonic() - iteration_started, 3),
+            "completed_requests": len(latencies),
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p90": percentile(latencies, 0.9),
+            "latency_p99": percentile(latencies, 0.99),
+            "latency_max": latencies[-1] if latencies else None,
+            "errors": errors,
+            "timeouts": timeouts,
+            "error_rate": errors / requests if requests else 0.0,
+            "timeout_rate": timeouts / requests if requests else 0.0,
+            "rss_bytes": current_rss_bytes(),
+            "tracked_requests": self.tester.requests.stats(),
+            "report_dispatcher": self.tester.report_dispatcher.stats(),
+            "session_recovery": self.tester.recovery.stats(),
+        }
+        self.samples.append(sample)
+
+        trend = relative_trend([s["latency_p50"] for s in self.samples])
+        sample["latency_trend"] = trend
+        sample["latency_trend_flagged"] = trend is not None and trend > self.trend_threshold
+        if sample["latency_trend_flagged"]:
+            LOGGER.warning(f"Median latency is trending upwards: +{trend:.0%} over {len(self.samples)} iterations")
+        LOGGER.info(
+            f"Soak iteration {iteration}: p50 {sample['latency_p50']}, p99 {sample['latency_p99']}, "
+            f"errors {errors}, timeouts {timeouts}, rss {sample['rss_bytes']}"
+        )
+        return sample
@@ -3,17 +3,52 @@ from datetime import datetime
 import json
 import os
 import shutil
+import time
 from pathlib import Path
 import socketio
 import httpx
 from src.exceptions import handle_exceptions
-from src.configure import LOGGER
-from src.auth import handle_cookies, login
-from src.utils import contains_csv_data, json_to_csv, load_json_file, save_json_file, extract_timestamp_from_filename
+from src.configure import get_logger
+from src.auth import handle_cookies
+from src.canonicalize import Canonicalizer
+from src.catalog import RecordingCatalog
+from src.output_writer import OutputWriter
+from src.profiler import PhaseProfiler
+from src.recovery import SESSION_EXPIRED_STATUSES, SessionRecovery
+from src.report_dispatcher import ReportDispatcher
+from src.request_tracker import RequestTracker
+from src.soak import SoakRunner
+from src.utils import (
+    MISSING_OUTPUTS_FILE,
+    contains_csv_data,
+    json_to_csv,
+    json_to_parquet,
+    load_json_file,
+    parquet_available,
+    save_json_file,
+    wants_parquet,
+)
+
+LOGGER = get_logger("tester")
+
+RECORDING_DURATIONS_FILE = "replay_durations.json"  # per-recording replay durations, used to balance shards
+REQUEST_MAPPING_TIMEOUT = 5  # seconds a report waits for the request ID of its POST response to be mapped
 
 
 class WiserTester:
-    def __init__(self, username, password, request_timeout, config, exclude_inputs, input_dir=None, output_dir=None):
+    def __init__(
+        self,
+        username,
+        password,
+        request_timeout,
+        config,
+        exclude_inputs,
+        input_dir=None,
+        output_dir=None,
+        report_types=None,
+        selector=None,
+        profiler=None,
+    ):
         """
         Initializes the WiserTester instance.
         Args:
@@ -22,6 +57,9 @@ class WiserTester:
             request_timeout (int): Timeout for waiting on reports.
             config (dict): Config file dictionary
             exclude_inputs (lst): List of input files to exclude
+            report_types (lst, optional): Only send reports of these types, other requests are always sent
+            selector (lst, optional): Parsed selector terms, only matching requests and the builds they need are sent
+            profiler (PhaseProfiler, optional): Profiles the login, replay and save phases
         """
         self.socket_client = socketio.AsyncClient(reconnection_attempts=10)
         self.http_client = httpx.AsyncClient()
@@ -32,43 +70,66 @@ class WiserTester:
         self.input_dir = input_dir or config["input_dir"]
         self.output_dir = output_dir or config["output_dir"]
         self.exclude_inputs = exclude_inputs
+        self.report_types = report_types
+        self.selector = selector
+        self.profiler = profiler or PhaseProfiler()
+        self.catalog = None  # opened when testing starts
         self.server_url = f"http://{self.server_host}/"
         self.request_timeout = request_timeout  # seconds
         self.config = config
         self.session_id, self.cookies = None, None
         self.current_input_dir, self.current_output_dir = None, None
-        self.is_server_connected = False
-        self.request_to_input_map = {}  # dictionary to map request IDs to input file names
-        self.request_to_input_dir_map = {}  # Map request IDs to input directories
+        self.connected = asyncio.Event()  # set while the socket is connected and the session recovered
+        # Maps request IDs to input files and directories, completed and timed out requests are kept for late reports
+        self.requests = RequestTracker(config.get("completed_request_grace", 300), request_timeout=request_timeout)
         self.request_mapping_event = asyncio.Event()
         self.report_event = asyncio.Event()
         self.request_id_lock = asyncio.Lock()  # Lock for synchronizing request ID mapping
         self.client_lock = asyncio.Lock()
-        self.pending_requests = set()
+        self.output_writer = OutputWriter(config.get("output_writer_queue_size", 32), config.get("output_writer_threads", 2))
+        self.report_dispatcher = ReportDispatcher(
+            self._handle_report_ready,
+            config.get("report_queue_size", 64),
+            config.get("report_workers", 4),
+            self._handle_dropped_report,
+        )
+        self.output_canonicalizer = Canonicalizer.lossless() if config.get("canonical_outputs", True) else None
+        self.recovery = SessionRecovery(self)
         self.version_info = None
-        self.is_csv = []
+        self.error_count, self.timeout_count = 0, 0
+        self.recording_durations = {}  # recording folder name -> replay duration in seconds
+        self.missing_outputs = []  # `folder/file.json` of the outputs whose report was dropped
 
         # Define event handlers for the socket events
         self._define_event_handlers()
 
     # Initial setup methods
 
-    async def start_testing(self, specific_inputs=None):
+    async def start_testing(self, specific_inputs=None, soak_duration=None, soak_iterations=None):
         """
         Starts the testing process. Tests either all inputs or a specific list of input directories.
         Args:
             specific_inputs (list, optional): A list of specific inputs to be tested. If None, all inputs will be tested.
+            soak_duration (int, optional): Replay the inputs in a loop for this many seconds.
+            soak_iterations (int, optional): Replay the inputs in a loop this many times.
         """
-        # Perform login and store cookies
-        _, self.cookies = await login(self.username, self.password, self.server_url)
-        LOGGER.info(f"Logged in and obtained cookies {self.cookies}")
+        with self.profiler.phase("login"):
+            # Perform login and store cookies
+            await self.recovery.login()
+            LOGGER.info("Logged in")
 
-        await self.connect_to_server()
+            await self.connect_to_server()
 
-        await self.fetch_version_info()
-        await self.save_version_info()
+            await self.fetch_version_info()
+            await self.save_version_info()
 
-        await self.test_inputs(specific_inputs)
+        with self.profiler.phase("replay", monitor_loop=True):
+            if soak_duration or soak_iterations:
+                soak_runner = SoakRunner(self, soak_duration, soak_iterations)
+                await soak_runner.run(specific_inputs)
+            else:
+                await self.test_inputs(specific_inputs)
+        await self.close()
 
         # await self.socket_client.wait()
 
@@ -78,34 +139,58 @@ class WiserTester:
         @self.socket_client.event
         async def connect():
             LOGGER.info("Socket connected")
-            self.session_id = self.socket_client.get_sid()
-            LOGGER.info(f"sid: {self.session_id}")
-            self.is_server_connected = True
+            sid = self.socket_client.get_sid()
+            LOGGER.debug(f"sid: {sid}")
+            self.recovery.on_connect(sid)
 
         @self.socket_client.event
         async def disconnect():
             LOGGER.info("Socket disconnected")
-            self.is_server_connected = False
+            self.recovery.on_disconnect()
 
         @self.socket_client.event
         async def report_ready(data):
-            await self._handle_report_ready(data)
+            self.report_dispatcher.dispatch(data)
 
         @self.socket_client.event
         async def error(data):
             await self._handle_error(data)
 
     async def _handle_report_ready(self, data):
-        """Handle incoming report readiness."""
-        await self.request_mapping_event.wait()
-        self.request_mapping_event.clear()
-        await asyncio.sleep(0.3)
+        """
+        Handle incoming report readiness, runs in a report dispatcher worker.
+        A report can arrive before the response of its request, so it first waits for its request ID to be mapped.
+        """
+        report_id = data.get("id")
+        deadline = time.monotonic() + REQUEST_MAPPING_TIMEOUT
+        while report_id and report_id not in self.requests:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.request_mapping_event.clear()
+            try:
+                await asyncio.wait_for(self.request_mapping_event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
         await self.process_report(data)
 
+    def _handle_dropped_report(self, data):
+        """Handles a report dropped by the report dispatcher: its request fails and its output is missing."""
+        report_id = data.get("id") if isinstance(data, dict) else None
+        record = self.requests.fail(report_id) if report_id else None
+        if record is not None and record.input_dir is None:  # the version request isn't read from a recording
+            self.missing_outputs.append(f"{record.input_file_name}.json")
+        elif record is not None:
+            self.missing_outputs.append(f"{os.path.basename(record.input_dir)}/{record.input_file_name}.json")
+        else:
+            self.missing_outputs.append(f"unknown/{report_id}.json")
+        self.report_event.set()  # the report will never be saved, stop waiting for it
+
     async def _handle_error(self, data):
         """Handle errors reported by the server."""
         error_msg = data.get("error")
         report_id = data.get("id")
+        self.error_count += 1
         if report_id:
             async with self.client_lock:
                 LOGGER.error(f"Error for ID {report_id}: {error_msg}")
@@ -119,7 +204,6 @@ class WiserTester:
         """retrieve the wiser version information from server"""
         request_id, _ = await self.send_request_wait_for_response("get_version")
         if request_id:
-            self.pending_requests.add(request_id)
             await self.wait_for_report(request_id)
         return request_id
 
@@ -138,18 +222,30 @@ class WiserTester:
         req_headers["Cookie"] = f"{cookies_str}"
         return json_request, req_headers
 
-    async def send_request(self, json_request, headers, input_file_name):
-        """sends request using http post, returns request_id, response object."""
+    async def send_request(self, json_request, headers, input_file_name, request_path=None, input_dir=None):
+        """
+        sends request using http post, returns request_id, response object.
+        A request rejected because the session expired is sent again once after logging in again.
+        """
+        cookies = self.cookies
         response = await self.http_client.post(f"{self.server_url}report", json=json_request, headers=headers)
+        if response.status_code in SESSION_EXPIRED_STATUSES:
+            await self.recovery.relogin(f"request rejected with HTTP {response.status_code}", cookies)
+            json_request, headers = self.prepare_request_data(json_request)
+            response = await self.http_client.post(f"{self.server_url}report", json=json_request, headers=headers)
         response.raise_for_status()
         response_json = response.json()
         request_id = response_json.get("id")
         if request_id:
             async with self.request_id_lock:
-                self.request_to_input_map[request_id] = input_file_name
-                self.request_to_input_dir_map[request_id] = self.current_input_dir
+                self.requests.add(
+                    request_id, input_file_name, input_dir or self.current_input_dir, request_path, self.session_id
+                )
             self.request_mapping_event.set()  # Signal that mapping is complete
-            LOGGER.info(f"request: {request_id}, input file name {input_file_name}")
+            LOGGER.info(
+                f"request: {request_id}, input file name {input_file_name}",
+                extra={"request_id": request_id, "input_file": input_file_name},
+            )
             return request_id, response
         else:
             LOGGER.error("No request ID found in response")
@@ -166,23 +262,24 @@ class WiserTester:
         """
         self.report_event.clear()  # Reset the event for the next report
 
-        # Wait for the socket to be connected before proceeding
-        while not self.is_server_connected:
+        # Wait for the socket to be connected and the session recovered before proceeding
+        if not self.connected.is_set():
             LOGGER.info("Waiting for socket to reconnect...")
-            await asyncio.sleep(1)  # Check connection status every second
-
-        if json_request_path == "get_version":
-            json_request = self.config["version_request"]
-            input_file_name = json_request_path
-        else:
-            json_request = load_json_file(json_request_path)
-            input_file_name = Path(json_request_path).stem
+            await asyncio.wait_for(self.connected.wait(), timeout=self.request_timeout)
+        await self.recovery.ensure_session()
 
+        json_request, input_file_name = self.load_request(json_request_path)
         json_request, headers = self.prepare_request_data(json_request)
 
-        request_id, response = await self.send_request(json_request, headers, input_file_name)
+        request_id, response = await self.send_request(json_request, headers, input_file_name, json_request_path)
         return request_id, response
 
+    def load_request(self, json_request_path):
+        """Loads a request from its JSON file, or the version request for `get_version`. Returns request, input file name."""
+        if json_request_path == "get_version":
+            return self.config["version_request"], json_request_path
+        return load_json_file(json_request_path), Path(json_request_path).stem
+
     # Report handling methods
 
     async def process_report(self, data):
@@ -196,10 +293,15 @@ class WiserTester:
             LOGGER.error("Report ID missing in data")
             return
         report_data = json.loads(data.get("data"))
-        LOGGER.info(f"Report received for ID {report_id}")
-
-        if report_id in self.pending_requests:
-            self.pending_requests.remove(report_id)
+        record = self.requests.complete(report_id)
+        LOGGER.info(
+            f"Report received for ID {report_id}",
+            extra={
+                "request_id": report_id,
+                "input_file": record.input_file_name if record else None,
+                "duration": record.latency if record else None,
+            },
+        )
 
         if report_data.get("messageType") == "retData":
             if report_data.get("dataType") == "appVersion":
@@ -208,10 +310,8 @@ class WiserTester:
                 self.report_event.set()
                 return
 
-        if report_id in self.request_to_input_map:
-            input_dir = self.request_to_input_dir_map.get(report_id)
-
-            if input_dir == self.current_input_dir:
+        if record:
+            if record.input_dir == self.current_input_dir:
                 await self.save_output({"data": report_data, "id": report_id}, self.current_output_dir)
                 self.report_event.set()
 
@@ -227,7 +327,7 @@ class WiserTester:
             report_id (str): The unique identifier for the report.
             report_data (dict): The report data.
         """
-        inp_dir = self.request_to_input_dir_map.get(report_id)
+        inp_dir = self.requests.get(report_id).input_dir
         input_folder = os.path.basename(inp_dir)
         path = os.path.join(self.output_dir, input_folder)
         LOGGER.warning(f"Late report received for ID {report_id} which should be in {inp_dir}")
@@ -238,8 +338,13 @@ class WiserTester:
         try:
             await asyncio.wait_for(self.report_event.wait(), timeout=self.request_timeout)
         except asyncio.TimeoutError:
-            input_file_name = self.request_to_input_map.get(request_id, "unknown")
-            LOGGER.warning(f"Timeout occurred for request ID {request_id}, input file: {input_file_name}")
+            self.timeout_count += 1
+            self.requests.time_out(request_id)  # no longer waited for, a late report is still saved
+            input_file_name = self.requests.input_file_name(request_id)
+            LOGGER.warning(
+                f"Timeout occurred for request ID {request_id}, input file: {input_file_name}",
+                extra={"request_id": request_id, "input_file": input_file_name, "duration": self.request_timeout},
+            )
 
     @handle_exceptions("An error occurred while waiting for all reports", False)
     async def wait_for_all_reports(self, timeout=120):
@@ -248,10 +353,18 @@ class WiserTester:
         Args:
             timeout (int): The maximum time to wait for all reports, in seconds.
         """
-        if self.pending_requests:
+        pending_requests = self.requests.in_flight()
+        if pending_requests:
             LOGGER.info("Waiting for all reports to be completed...")
-            await asyncio.wait([self.wait_for_report(request_id) for request_id in self.pending_requests], timeout=timeout)
-            LOGGER.info("All reports have been completed.")
+            waiters = [asyncio.ensure_future(self.wait_for_report(request_id)) for request_id in pending_requests]
+            await asyncio.wait(waiters, timeout=timeout)
+            timed_out = sorted(set(pending_requests) & set(self.requests.in_flight()))
+            for request_id in timed_out:
+                self.requests.time_out(request_id)
+            if timed_out:
+                LOGGER.warning(f"{len(timed_out)} reports did not arrive in time: {timed_out}")
+            else:
+                LOGGER.info("All reports have been completed.")
         else:
             LOGGER.info("No pending reports to wait for.")
 
@@ -263,19 +376,34 @@ class WiserTester:
         Args:
             inputs_list (list, optional): A list of specific inputs to be tested. If None, all inputs will be tested.
         """
+        if self.catalog is None:
+            self.catalog = RecordingCatalog(self.input_dir, self.config.get("catalog_path"))
+        self.catalog.refresh()
+
         if inputs_list is None:  # If inputs_list is not provided, test all inputs
             LOGGER.info("Started testing all inputs")
-            directories = [os.path.join(self.input_dir, f) for f in os.listdir(self.input_dir) if f != ".gitkeep"]
+            directories = [os.path.join(self.input_dir, rec) for rec in self.catalog.recordings()]
         else:  # If inputs_list is provided, test only those inputs
             LOGGER.info(f"Started testing inputs {inputs_list}")
             directories = [os.path.join(self.input_dir, rec) for rec in inputs_list]
+        if self.selector:  # skip recordings without selected requests
+            directories = [rec_dir for rec_dir in directories if self._requests_to_send(rec_dir)]
 
         for rec_dir in directories:
+            started = time.monotonic()
             await self.test_input(rec_dir)
+            self.recording_durations[os.path.basename(rec_dir)] = round(time.monotonic() - started, 3)
             await asyncio.sleep(1)  # pause between inputs
 
         await self.wait_for_all_reports()
-        await self.close()
+        with self.profiler.phase("save"):
+            await self.report_dispatcher.flush()  # queued reports submit their outputs to the writer
+            await self.output_writer.flush()  # all outputs must be on disk before they are compared
+            LOGGER.info(f"Request tracking: {self.requests.stats()}")
+            LOGGER.info(f"Report dispatching: {self.report_dispatcher.stats()}")
+            LOGGER.info(f"Session recovery: {self.recovery.stats()}")
+            self.save_recording_durations()
+            self.save_missing_outputs()
 
     @handle_exceptions("An error occurred during testing of specific input", False)
     async def test_input(self, inp_dir):
@@ -288,23 +416,21 @@ class WiserTester:
         self.current_input_dir = inp_dir
         self.current_output_dir = await self.create_output_directory()
         LOGGER.info(f"made directory {self.current_output_dir}")
-        lst = os.listdir(inp_dir)
-        files_sorted = sorted(lst, key=lambda x: extract_timestamp_from_filename(x))
-        LOGGER.info(files_sorted)
+        files_sorted = self._requests_to_send(inp_dir)
+        LOGGER.info(f"{len(files_sorted)} requests to send")
+        LOGGER.debug(files_sorted)
         for filename in files_sorted:
-            if filename not in self.exclude_inputs:
-                file_path = os.path.join(inp_dir, filename)
-                if file_path.endswith(".json"):
-                    await self.process_request_file(file_path)
-            else:
-                LOGGER.info(f"ignoring {filename}")
+            await self.process_request_file(os.path.join(inp_dir, filename))
         LOGGER.info(f"all requests completed for {inp_dir}")
 
+    def _requests_to_send(self, inp_dir):
+        """Returns the file names of the requests to send from an input directory, in replay order."""
+        return self.catalog.requests(os.path.basename(inp_dir), self.exclude_inputs, self.report_types, self.selector)
+
     async def process_request_file(self, file_path):
         LOGGER.info(f"sending request for file: {file_path}")
         request_id, _ = await self.send_request_wait_for_response(file_path)
         if request_id:
-            self.pending_requests.add(request_id)
             await self.wait_for_report(request_id)
 
     # Utilities
@@ -328,25 +454,32 @@ class WiserTester:
 
     async def save_output(self, output_data, output_dir):
         """
-        Saves the test output to a JSON file, naming it with the request ID and a timestamp.
+        Queues the test output to be saved to a JSON file named after its input file, by the background output writer.
         Returns:
-            str: The path to the saved output file.
+            str: The path the output file will be saved to.
         """
+        input_file_name = self.requests.input_file_name(output_data["id"])
+        file_name = f"{input_file_name}.json"
+        output_path = os.path.join(output_dir, file_name)
+        await self.output_writer.submit(self.write_output, output_data, output_dir, input_file_name, output_path)
+        return output_path
+
+    def write_output(self, output_data, output_dir, input_file_name, output_path):
+        """Writes an output JSON file and its CSV export, runs in an output writer thread."""
         try:
-            input_file_name = self.request_to_input_map.get(output_data["id"], "unknown")
-            file_name = f"{input_file_name}.json"
-            output_path = os.path.join(output_dir, file_name)
+            self.handle_csv(output_data, output_dir, input_file_name)  # before sorting, keeps the CSV column order
+            if self.output_canonicalizer:
+                output_data = self.output_canonicalizer.canonicalize(output_data)
             saved = save_json_file(output_data, output_path)
             if saved:
-                LOGGER.info(f"saved report {output_path}")
-            self.handle_csv(output_data, output_dir, input_file_name)
-            return output_path
+                LOGGER.info(f"saved report {output_path}", extra={"request_id": output_data["id"], "input_file": input_file_name})
         except Exception as e:
             LOGGER.error(f"Failed to save output for request ID {output_data['id']}: {e}")
 
     @handle_exceptions("An error occurred during csv checks", False)
     def handle_csv(self, output_data, output_dir, input_file_name):
         """This function handles CSV data by converting JSON data to a CSV file.
+        Large reports of the types listed in `parquet_reports` are saved as Parquet instead, when an engine is installed.
         Args:
             output_data: Output data containing information to be processed
             output_dir: The directory where the CSV file will be saved after the conversion from JSON to CSV is completed
@@ -354,9 +487,21 @@ class WiserTester:
         """
         if contains_csv_data(output_data):
             csv_data = output_data.get("data", {}).get("data", None)
+            if self._use_parquet(input_file_name, csv_data):
+                json_to_parquet(csv_data, os.path.join(output_dir, f"{input_file_name}.parquet"))
+                return
             csv_path = os.path.join(output_dir, f"{input_file_name}.csv")
             json_to_csv(csv_data, csv_path)
 
+    def _use_parquet(self, input_file_name, csv_data):
+        """Checks whether a report should be exported to Parquet instead of CSV."""
+        if not wants_parquet(self.config, input_file_name, csv_data):
+            return False
+        if not parquet_available():
+            LOGGER.warning(f"No parquet engine installed, saving {input_file_name} as CSV")
+            return False
+        return True
+
     async def save_version_info(self):
         """
         Saves the version information to a JSON file in a designated location.
@@ -369,10 +514,37 @@ class WiserTester:
         else:
             LOGGER.error("Version information is not available to save.")
 
+    @handle_exceptions("Failed to save recording durations", False)
+    def save_recording_durations(self):
+        """
+        Merges the replay durations of this run into the durations history file in the output directory.
+        The history is used by the shard coordinator to balance recordings between workers.
+        """
+        durations_path = os.path.join(self.output_dir, RECORDING_DURATIONS_FILE)
+        durations = load_json_file(durations_path) if os.path.exists(durations_path) else {}
+        durations.update(self.recording_durations)
+        save_json_file(durations, durations_path)
+
+    @handle_exceptions("Failed to save missing outputs", False)
+    def save_missing_outputs(self):
+        """Saves the outputs whose report was dropped in the output directory, the comparison summary lists them."""
+        missing_outputs_path = os.path.join(self.output_dir, MISSING_OUTPUTS_FILE)
+        if self.missing_outputs:
+            LOGGER.error(f"{len(self.missing_outputs)} outputs are missing, their reports were dropped")
+            save_json_file(sorted(set(self.missing_outputs)), missing_outputs_path)
+        elif os.path.exists(missing_outputs_path):
+            os.remove(missing_outputs_path)
+
     # Cleanup methods
 
     async def close(self):
-        """Closes the WebSocket connection and HTTP client they are open."""
+        """Closes the WebSocket connection and HTTP client they are open, after flushing pending reports and outputs."""
+        await self.report_dispatcher.close()
+        await self.output_writer.close()
+        if self.catalog:
+            self.catalog.close()
+            self.catalog = None
+
         if self.socket_client:
             await self.socket_client.disconnect()
 
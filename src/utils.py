@@ -1,15 +1,22 @@
 # Utility Functions
 import csv
+import importlib.util
 import json
-import pandas as pd
+import os
+import sys
+from operator import itemgetter
 from src.exceptions import handle_exceptions
 
+CSV_BATCH_SIZE = 5000  # rows per csv writerows call
+MISSING_OUTPUTS_FILE = "missing_outputs.json"  # outputs whose report was dropped, listed in the comparison summary
+
 
 def custom_serializer(obj):
     """
     Attempts to JSON-serialize objects of known non-serializable types.
     """
-    if isinstance(obj, pd.DataFrame):
+    pd = sys.modules.get("pandas")  # a DataFrame can only exist if pandas was imported
+    if pd is not None and isinstance(obj, pd.DataFrame):
         return obj.to_dict(orient="records")
     else:
         return str(obj)
@@ -35,6 +42,36 @@ def extract_timestamp_from_filename(filename):
     return int(timestamp_str)  # Convert to integer for sorting
 
 
+def list_outputs(output_dir, folders=None):
+    """Returns the `folder/file` paths of the JSON outputs in the recording folders of an output directory."""
+    if not os.path.isdir(output_dir):
+        return set()
+    folders = folders if folders is not None else os.listdir(output_dir)
+    outputs = set()
+    for folder in folders:
+        folder_path = os.path.join(output_dir, folder)
+        if os.path.isdir(folder_path) and not folder.startswith("."):
+            outputs.update(
+                f"{folder}/{file}" for file in os.listdir(folder_path) if file.endswith(".json") and file != "version_info.json"
+            )
+    return outputs
+
+
+def current_rss_bytes():
+    """Returns the resident set size of the current process in bytes, or None if it can't be measured."""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
 def check_json_structure(data):
     try:
         # Check the first level
@@ -72,13 +109,55 @@ def contains_csv_data(data):
         return False
 
 
+def csv_fieldnames(rows):
+    """Returns the union of the keys of all rows, in order of first appearance."""
+    fieldnames = dict.fromkeys(rows[0])
+    known = fieldnames.keys()
+    for row in rows:
+        if row.keys() != known:
+            for key in row:
+                if key not in fieldnames:
+                    fieldnames[key] = None
+    return list(fieldnames)
+
+
 @handle_exceptions("Failed to save csv file", True)
 def json_to_csv(csv_data, csv_filename):
-    """converts JSON data into a CSV file."""
+    """
+    converts JSON data into a CSV file.
+    The header is the union of the keys of all rows, rows missing a column get an empty value.
+    """
+    fieldnames = csv_fieldnames(csv_data)
+    get_row = itemgetter(*fieldnames) if len(fieldnames) > 1 else lambda row: (row[fieldnames[0]],)
     with open(csv_filename, "w", newline="") as csv_file:
         csv_writer = csv.writer(csv_file)
-        header = csv_data[0].keys()
-        csv_writer.writerow(header)
+        csv_writer.writerow(fieldnames)
+
+        for start in range(0, len(csv_data), CSV_BATCH_SIZE):
+            batch = csv_data[start : start + CSV_BATCH_SIZE]
+            try:
+                rows = list(map(get_row, batch))
+            except KeyError:  # heterogeneous rows
+                rows = [[row.get(key, "") for key in fieldnames] for row in batch]
+            csv_writer.writerows(rows)
+
+
+def wants_parquet(config, input_file_name, csv_data):
+    """Checks whether a report is exported to Parquet instead of CSV: a large report of a `parquet_reports` type."""
+    parquet_reports = config.get("parquet_reports", [])
+    if not any(input_file_name.endswith(f"_{report_type}") for report_type in parquet_reports):
+        return False
+    return len(csv_data) >= config.get("parquet_min_rows", 100000)
+
+
+def parquet_available():
+    """Checks whether a parquet engine for pandas is installed."""
+    return any(importlib.util.find_spec(engine) is not None for engine in ("pyarrow", "fastparquet"))
+
+
+@handle_exceptions("Failed to save parquet file", True)
+def json_to_parquet(csv_data, parquet_filename):
+    """converts JSON data into a Parquet file, requires pyarrow or fastparquet."""
+    import pandas as pd  # imported on demand, pandas is slow to import
 
-        for row in csv_data:
-            csv_writer.writerow(row.values())
+    pd.DataFrame(csv_data, columns=csv_fieldnames(csv_data)).to_parquet(parquet_filename, index=False)
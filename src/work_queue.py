@@ -0,0 +1,89 @@
+import asyncio
+import time
+from src.configure import get_logger
+
+LOGGER = get_logger("work_queue")
+
+
+class WorkQueue:
+    """
+    Base of the components processing queued items with a fixed number of worker tasks.
+    The queue is bounded by `max_pending` and created lazily, inside the running event loop. Subclasses decide
+    how items are queued (waiting for a free slot or dropping them) and implement `_process`.
+    """
+
+    name = "Work queue"  # for the log
+    failure_message = "Processing a queued item failed"
+    logger = LOGGER
+
+    def __init__(self, max_pending, workers):
+        """
+        Args:
+            max_pending (int): Maximum number of queued items.
+            workers (int): Number of worker tasks processing items concurrently.
+        """
+        self.max_pending = max_pending
+        self.workers = workers
+        self.queue = None
+        self.worker_tasks = []
+        self.processed, self.failed = 0, 0
+        self.processing_seconds, self.max_processing_seconds = 0.0, 0.0
+        self.max_queue_depth = 0
+
+    def _start(self):
+        """Creates the queue and worker tasks, inside the running event loop."""
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.worker_tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    def _stop(self):
+        """Releases the resources created by `_start`, once the worker tasks are stopped."""
+
+    def _queued(self):
+        """Records the queue depth after an item was queued."""
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    async def _process(self, item):
+        """Processes one queued item."""
+        raise NotImplementedError
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            started = time.monotonic()
+            try:
+                await self._process(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                self.logger.error(f"{self.failure_message}: {e}")
+            finally:
+                elapsed = time.monotonic() - started
+                self.processing_seconds += elapsed
+                self.max_processing_seconds = max(self.max_processing_seconds, elapsed)
+                self.queue.task_done()
+
+    async def flush(self):
+        """Waits until all queued items are processed."""
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def close(self):
+        """Processes the queued items and stops the worker tasks."""
+        if self.queue is None:
+            return
+        await self.flush()
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self._stop()
+        self.queue, self.worker_tasks = None, []
+        self.logger.info(f"{self.name} closed: {self.stats()}")
+
+    def stats(self):
+        """Returns the counters of the queue."""
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "max_queue_depth": self.max_queue_depth,
+            "processing_seconds": round(self.processing_seconds, 3),
+        }
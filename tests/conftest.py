@@ -0,0 +1,4 @@
+import os
+import sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[:-2]))
@@ -0,0 +1,142 @@
+import json
+import os
+import pytest
+from src.baseline import BaselineStore
+from src.utils import parquet_available
+
+LAB = "rec1/1_genReport_lab.json"
+COHORT = "rec1/2_buildCohort.json"
+SURVIVAL = "rec2/3_genReport_survival.json"
+AGE = "rec2/4_genReport_age_gender.json"
+
+
+def _report(rows, **extra):
+    return {"id": "r", "data": {"type": "report", "data": rows, **extra}}
+
+
+# The outputs of each run, None for outputs the run doesn't have
+RUNS = [
+    {
+        LAB: _report([{"lab": "hb", "value": 12}, {"lab": "wbc", "value": 7}]),
+        COHORT: _report([{"size": 100}], name="cohort"),
+        SURVIVAL: _report([{"day": 1, "rate": 0.99}], figures={"data": [1, 2, 3]}),
+    },
+    {  # changed values, an added row, a type change, a removed and an added output
+        LAB: _report([{"lab": "hb", "value": "12"}, {"lab": "wbc", "value": 8}, {"lab": "plt", "value": 250}]),
+        SURVIVAL: _report([{"day": 1, "rate": 0.99}], figures={"data": [1, 2, 3]}),
+        AGE: _report([{"age": "0-10", "count": 5}]),
+    },
+    {  # the removed output is added again, the type changes again, list items are removed
+        LAB: _report([{"lab": "hb", "value": 12.5}, {"lab": "plt", "value": 250}]),
+        COHORT: _report([{"size": 120}], name="cohort 2"),
+        SURVIVAL: _report([{"day": 1, "rate": 0.98}], figures={"data": [3]}),
+        AGE: _report([{"age": "0-10", "count": 5}]),
+    },
+    {  # unchanged
+        LAB: _report([{"lab": "hb", "value": 12.5}, {"lab": "plt", "value": 250}]),
+        COHORT: _report([{"size": 120}], name="cohort 2"),
+        SURVIVAL: _report([{"day": 1, "rate": 0.98}], figures={"data": [3]}),
+        AGE: _report([{"age": "0-10", "count": 5}]),
+    },
+    {  # a whole recording folder is removed, values change to and from null
+        LAB: _report([{"lab": "hb", "value": None}, {"lab": "plt", "value": 250}]),
+        COHORT: _report(None, name="cohort 2"),
+    },
+]
+
+
+def _write_run(directory, index, outputs):
+    os.makedirs(directory)
+    with open(os.path.join(directory, "version_info.json"), "w") as file:
+        json.dump({"version": f"1.0.{index}"}, file)
+    for output, data in outputs.items():
+        os.makedirs(os.path.join(directory, output.split("/")[0]), exist_ok=True)
+        with open(os.path.join(directory, *output.split("/")), "w") as file:
+            json.dump(data, file)
+
+
+def _expectations(expected_dir):
+    """The JSON outputs of an expectations directory."""
+    outputs = {}
+    for folder in os.listdir(expected_dir):
+        if os.path.isdir(os.path.join(expected_dir, folder)):
+            for file_name in os.listdir(os.path.join(expected_dir, folder)):
+                if file_name.endswith(".json") and file_name != "version_info.json":
+                    with open(os.path.join(expected_dir, folder, file_name)) as file:
+                        outputs[f"{folder}/{file_name}"] = json.load(file)
+    return outputs
+
+
+@pytest.fixture(params=[1, 2, 30], ids=lambda interval: f"snapshot_interval_{interval}")
+def promoted(tmp_path, request):
+    """A store with every run promoted in turn, and the expectations directory."""
+    store = BaselineStore(str(tmp_path / "store"), request.param, {"parquet_reports": ["lab"], "parquet_min_rows": 2})
+    expected_dir = str(tmp_path / "expected")
+    versions = []
+    for index, outputs in enumerate(RUNS):
+        output_dir = str(tmp_path / f"run{index}")
+        _write_run(output_dir, index, outputs)
+        versions.append(store.promote(output_dir, expected_dir))
+    return store, expected_dir, versions
+
+
+def test_every_version_rebuilds_its_outputs(promoted):
+    store, _, versions = promoted
+    assert versions == [f"1.0.{index}" for index in range(len(RUNS))]
+    for version, outputs in zip(versions, RUNS):
+        assert sorted(store.manifest(version)["outputs"]) == sorted(outputs)
+        for output in (LAB, COHORT, SURVIVAL, AGE):
+            assert store.load_output(version, output) == outputs.get(output)
+    unchanged = store.manifest(versions[3])
+    if not unchanged["snapshot"]:
+        assert unchanged["stored"] == {"full": 0, "delta": 0, "unchanged": 4}
+
+
+def test_rollback_walks_back_through_every_version(promoted):
+    store, expected_dir, versions = promoted
+    assert _expectations(expected_dir) == RUNS[-1]
+    for index in range(len(RUNS) - 2, -1, -1):
+        assert store.rollback(expected_dir) == versions[index]
+        assert _expectations(expected_dir) == RUNS[index]
+        with open(os.path.join(expected_dir, "version_info.json")) as file:
+            assert json.load(file) == {"version": f"1.0.{index}"}
+    with pytest.raises(ValueError):
+        store.rollback(expected_dir)
+    store.rollback(expected_dir, versions[2])
+    assert _expectations(expected_dir) == RUNS[2]
+    assert store.index["current"] == versions[2]
+
+
+def test_checkout_exports_tables_like_the_tester(promoted):
+    store, expected_dir, versions = promoted
+    store.rollback(expected_dir, versions[0])
+    files = set(os.listdir(os.path.join(expected_dir, "rec1")))
+    if parquet_available():
+        assert "1_genReport_lab.parquet" in files and "1_genReport_lab.csv" not in files
+    else:
+        assert "1_genReport_lab.csv" in files
+    assert "2_buildCohort.csv" in files  # below parquet_min_rows and not a parquet report type
+
+
+def test_compare_reports_added_removed_and_changed_outputs(promoted):
+    store, _, versions = promoted
+    for old in range(len(RUNS)):
+        for new in range(len(RUNS)):
+            result = store.compare(versions[old], versions[new])
+            old_outputs, new_outputs = RUNS[old], RUNS[new]
+            assert result["added"] == sorted(set(new_outputs) - set(old_outputs))
+            assert result["removed"] == sorted(set(old_outputs) - set(new_outputs))
+            changed = sorted(
+                output
+                for output in set(old_outputs) & set(new_outputs)
+                if old_outputs[output]["data"] != new_outputs[output]["data"]
+            )
+            assert sorted(result["changed"]) == changed
+
+
+def test_compare_ignores_paths(promoted):
+    store, _, versions = promoted
+    result = store.compare(versions[0], versions[2], ["root\\['data'\\]"])
+    assert sorted(result["changed"]) == [COHORT, SURVIVAL]
+    result = store.compare(versions[0], versions[2], ["root\\['data'\\]", "root\\['name'\\]", "root\\['figures'\\]"])
+    assert result["changed"] == {}
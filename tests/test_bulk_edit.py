@@ -0,0 +1,131 @@
+import json
+import os
+import stat
+import subprocess
+import sys
+import pytest
+from src.bulk_edit import apply_operation, atomic_write, bulk_patch, escape_token, parse_path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def _document():
+    return {"report": {"type": "cohort", "labs": [{"id": 1}, {"id": 2}], "a/b": "slash", "m~n": "tilde"}}
+
+
+def _write_requests(directory, documents):
+    directory.mkdir(exist_ok=True)
+    for name, document in documents.items():
+        (directory / name).write_text(json.dumps(document, indent=2))
+
+
+def test_parse_path_pointer_and_jsonpath():
+    assert parse_path("/report/labs/0") == ["report", "labs", "0"]
+    assert parse_path("/report/a~1b/m~0n") == ["report", "a/b", "m~n"]
+    assert parse_path("$.report.labs[0]") == ["report", "labs", "0"]
+    assert parse_path("$.report['a/b'].labs[*]") == ["report", "a/b", "labs", "*"]
+    assert parse_path("") == []
+    with pytest.raises(ValueError):
+        parse_path("report/labs")
+    with pytest.raises(ValueError):
+        parse_path("$.report[")
+
+
+def test_escape_token_round_trips_through_parse_path():
+    for key in ("a/b", "m~n", "~1", "/~0/"):
+        assert parse_path(f"/{escape_token(key)}") == [key]
+
+
+@pytest.mark.parametrize(
+    "operation, changed, expected",
+    [
+        ({"op": "replace", "path": "/report/type", "value": "x"}, 1, {"type": "x"}),
+        ({"op": "replace", "path": "/report/missing", "value": "x"}, 0, {}),
+        ({"op": "add", "path": "/report/missing", "value": "x"}, 1, {"missing": "x"}),
+        ({"op": "remove", "path": "/report/type"}, 1, {"type": None}),
+        ({"op": "replace", "path": "/report/a~1b", "value": "x"}, 1, {"a/b": "x"}),
+        ({"op": "replace", "path": "/report/m~0n", "value": "x"}, 1, {"m~n": "x"}),
+        ({"op": "replace", "path": "/report/labs/*/id", "value": 0}, 2, {"labs": [{"id": 0}, {"id": 0}]}),
+        ({"op": "add", "path": "/report/labs/-", "value": {"id": 3}}, 1, {"labs": [{"id": 1}, {"id": 2}, {"id": 3}]}),
+        ({"op": "add", "path": "/report/labs/0", "value": {"id": 0}}, 1, {"labs": [{"id": 0}, {"id": 1}, {"id": 2}]}),
+        ({"op": "remove", "path": "/report/labs/1"}, 1, {"labs": [{"id": 1}]}),
+        ({"op": "remove", "path": "/report/labs/5"}, 0, {}),
+        ({"op": "remove", "path": "/report/labs/*"}, 2, {"labs": []}),
+    ],
+)
+def test_apply_operation(operation, changed, expected):
+    data = _document()
+    assert apply_operation(data, operation) == changed
+    for key, value in expected.items():
+        if value is None:
+            assert key not in data["report"]
+        else:
+            assert data["report"][key] == value
+
+
+def test_patching_the_root_is_rejected():
+    with pytest.raises(ValueError):
+        apply_operation(_document(), {"op": "remove", "path": ""})
+
+
+def test_bulk_patch_applies_file_globs_and_keeps_unchanged_files(tmp_path):
+    _write_requests(tmp_path / "rec", {"1_buildCohort.json": _document(), "2_genReport.json": _document()})
+    unchanged_text = (tmp_path / "rec" / "2_genReport.json").read_text()
+    operations = [{"op": "replace", "path": "/report/type", "value": "x", "files": "*_buildCohort.json"}]
+    assert bulk_patch([str(tmp_path / "rec")], operations) == {"scanned": 2, "changed": 1}
+    assert json.loads((tmp_path / "rec" / "1_buildCohort.json").read_text())["report"]["type"] == "x"
+    assert (tmp_path / "rec" / "2_genReport.json").read_text() == unchanged_text
+
+
+def test_bulk_patch_dry_run_prints_a_diff_without_writing(tmp_path, capsys):
+    _write_requests(tmp_path / "rec", {"1_buildCohort.json": _document()})
+    original = (tmp_path / "rec" / "1_buildCohort.json").read_text()
+    summary = bulk_patch([str(tmp_path / "rec")], [{"op": "replace", "path": "/report/a~1b", "value": "x"}], dry_run=True)
+    assert summary == {"scanned": 1, "changed": 1}
+    assert (tmp_path / "rec" / "1_buildCohort.json").read_text() == original
+    diff = capsys.readouterr().out.splitlines()
+    assert diff[0].startswith("---") and diff[0].endswith("1_buildCohort.json")
+    assert diff[1].endswith("1_buildCohort.json (patched)")
+    assert '-    "a/b": "slash",' in diff
+    assert '+    "a/b": "x",' in diff
+
+
+def test_bulk_patch_fails_on_an_invalid_path_before_writing(tmp_path):
+    _write_requests(tmp_path / "rec", {"1_buildCohort.json": _document()})
+    original = (tmp_path / "rec" / "1_buildCohort.json").read_text()
+    operations = [{"op": "replace", "path": "/report/type", "value": "x"}, {"op": "remove", "path": "report"}]
+    with pytest.raises(ValueError):
+        bulk_patch([str(tmp_path / "rec")], operations)
+    assert (tmp_path / "rec" / "1_buildCohort.json").read_text() == original
+
+
+def test_atomic_write_keeps_the_file_mode(tmp_path):
+    path = tmp_path / "request.json"
+    path.write_text("{}")
+    os.chmod(path, 0o644)
+    atomic_write(str(path), '{"a": 1}')
+    assert path.read_text() == '{"a": 1}'
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert os.listdir(tmp_path) == ["request.json"]
+
+
+def test_modify_escapes_keys_with_slashes_and_tildes(tmp_path):
+    _write_requests(tmp_path / "rec", {"1_buildCohort.json": {"a/b": "slash", "m~n": "tilde", "a": {"b": "nested"}}})
+    subprocess.run(
+        [
+            sys.executable,
+            os.path.join(REPO_ROOT, "tools", "request_manager.py"),
+            "--directory",
+            str(tmp_path / "rec"),
+            "--modify",
+            "a/b",
+            "x",
+            "--modify",
+            "m~n",
+            "y",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    patched = json.loads((tmp_path / "rec" / "1_buildCohort.json").read_text())
+    assert patched == {"a/b": "x", "m~n": "y", "a": {"b": "nested"}}
@@ -0,0 +1,132 @@
+import copy
+import json
+import os
+import re
+import pytest
+from deepdiff import DeepDiff
+from src.compare import Compare
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+INPUT_FILE_NAME = "124709301_analysisDocument.genReport_age_gender"
+
+
+def _load_config(name):
+    with open(os.path.join(REPO_ROOT, "config", name)) as file:
+        return json.load(file)
+
+
+def _legacy_normalize(figures):
+    """The figures normalization the comparer used before the canonicalizer."""
+    if isinstance(figures, dict):
+        return {k: _legacy_normalize(v) for k, v in figures.items()}
+    elif isinstance(figures, list):
+        return [_legacy_normalize(elem) for elem in figures]
+    elif isinstance(figures, str):
+        return UUID.sub("PLACEHOLDER", figures)
+    return figures
+
+
+def _legacy_diff(output, expected, ignore_paths, no_preprocessing):
+    """The comparison before the canonicalizer: figures normalization, then DeepDiff with `exclude_regex_paths`."""
+    if not no_preprocessing:
+        for data in (output, expected):
+            if "figures" in data:
+                data["figures"] = _legacy_normalize(data["figures"])
+    return DeepDiff(
+        output,
+        expected,
+        ignore_order=True,
+        report_repetition=True,
+        exclude_regex_paths=[re.compile(path) for path in ignore_paths],
+        cutoff_intersection_for_pairs=1,
+        get_deep_distance=True,
+        max_passes=3,
+        cache_size=5000,
+    )
+
+
+def _diff(config, output, expected, no_preprocessing, tmp_path):
+    """The comparison Compare runs now: canonicalization of both sides, then DeepDiff."""
+    comparison = Compare(config, reports_path=str(tmp_path / "reports"), output_dir=str(tmp_path), expected_dir=str(tmp_path))
+    comparison.no_preprocessing = no_preprocessing
+    return comparison._calculate_diff(
+        comparison._preprocess_data(output, INPUT_FILE_NAME), comparison._preprocess_data(expected, INPUT_FILE_NAME)
+    )
+
+
+def _sample_output():
+    """Report data shaped like a Wiser age/gender report with plotly figures."""
+    return {
+        "requestId": "124709301",
+        "type": "age_gender",
+        "data": [
+            {"age": "0-10", "gender": "F", "count": 12},
+            {"age": "0-10", "gender": "M", "count": 15},
+            {"age": "10-20", "gender": "F", "count": 9},
+        ],
+        "figures": {
+            "[0,10)": {"count": 27, "file": "age_0_10_8a6e0804-2bd0-4672-b79d-d97027f9071a.png"},
+            "[10,20)": {"count": 9, "file": "age_10_20_5b1f0c3e-7d7e-4a5b-9c4d-2e8f3a6b1c0d.png"},
+            "layout": {"title": "Age and gender", "margin": {"l": 40, "r": 20, "t": 30}},
+            "data": [
+                {"name": "F", "x": ["0-10", "10-20"], "y": [12, 9], "error_y": {"width": 4, "array": [1.5, 2.5]}},
+                {"name": "M", "x": ["0-10"], "y": [15], "error_y": {"width": 4, "array": [1.0]}},
+            ],
+            "export": "figure_3c9a1e2f-6b4d-4e8a-9f1c-7d2b5a8e0c4f.html",
+        },
+    }
+
+
+def _set(path, value):
+    def mutate(data):
+        *parents, last = path
+        for key in parents:
+            data = data[key]
+        data[last] = value
+
+    return mutate
+
+
+def _reverse(path):
+    def mutate(data):
+        for key in path:
+            data = data[key]
+        data.reverse()
+
+    return mutate
+
+
+MUTATIONS = {
+    "identical": lambda data: None,
+    "request_id": _set(["requestId"], "124709999"),
+    "figure_range": _set(["figures", "[0,10)", "count"], 28),
+    "layout_margin": _set(["figures", "layout", "margin", "l"], 50),
+    "error_y_width": _set(["figures", "data", 1, "error_y", "width"], 6),
+    "figure_file_uuid": _set(["figures", "export"], "figure_0f1e2d3c-4b5a-4968-8776-a5b4c3d2e1f0.html"),
+    "rows_reordered": _reverse(["data"]),
+    "traces_reordered": _reverse(["figures", "data"]),
+    "row_value": _set(["data", 1, "count"], 16),
+    "layout_title": _set(["figures", "layout", "title"], "Age"),
+    "error_y_array": _set(["figures", "data", 0, "error_y", "array"], [1.5, 3.5]),
+}
+# Mutations reported as differences with each config's ignored paths, with preprocessing
+DIFFERING = {
+    "config_weizmann.json": {"row_value", "layout_title", "error_y_array"},
+    "config_clalit.json": {"row_value", "layout_title", "error_y_array", "layout_margin", "error_y_width"},
+}
+
+
+@pytest.mark.parametrize("no_preprocessing", [False, True], ids=["preprocessing", "no_preprocessing"])
+@pytest.mark.parametrize("config_name", ["config_weizmann.json", "config_clalit.json"])
+@pytest.mark.parametrize("mutation", sorted(MUTATIONS))
+def test_canonicalized_diff_matches_exclude_regex_paths(tmp_path, config_name, mutation, no_preprocessing):
+    config = _load_config(config_name)
+    output, expected = _sample_output(), _sample_output()
+    MUTATIONS[mutation](expected)
+    legacy = _legacy_diff(copy.deepcopy(output), copy.deepcopy(expected), config["ignore_paths"], no_preprocessing)
+    diff = _diff(config, output, expected, no_preprocessing, tmp_path)
+    differing = mutation in DIFFERING[config_name] or (no_preprocessing and mutation == "figure_file_uuid")
+    assert bool(legacy) == differing
+    assert bool(diff) == differing
+    assert diff.affected_paths == legacy.affected_paths
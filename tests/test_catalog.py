@@ -0,0 +1,40 @@
+import json
+import os
+from src.catalog import RecordingCatalog
+
+
+def _write(input_dir, recording, file_name, content):
+    os.makedirs(os.path.join(input_dir, recording), exist_ok=True)
+    with open(os.path.join(input_dir, recording, file_name), "w") as file:
+        file.write(content if isinstance(content, str) else json.dumps(content))
+
+
+def test_malformed_requests_are_skipped(tmp_path):
+    input_dir = str(tmp_path)
+    _write(input_dir, "rec", "124709301_ok.json", {"messageType": "chronicDiseaseCohorts.build", "cohortId": "c1"})
+    _write(input_dir, "rec", "124709302_null_type.json", {"messageType": None})
+    _write(input_dir, "rec", "124709303_list.json", [1, 2])
+    _write(input_dir, "rec", "124709304_truncated.json", '{"messageType": ')
+    catalog = RecordingCatalog(input_dir)
+    try:
+        counts = catalog.refresh()
+        assert counts["updated"] == 2
+        assert catalog.requests("rec") == ["124709301_ok.json", "124709302_null_type.json"]
+    finally:
+        catalog.close()
+
+
+def test_only_recordings_limits_the_scan(tmp_path):
+    input_dir = str(tmp_path)
+    _write(input_dir, "rec1", "124709301_a.json", {"messageType": "x"})
+    _write(input_dir, "rec1", "124709302_b.json", {"messageType": "x"})
+    _write(input_dir, "rec2", "124709301_a.json", {"messageType": "x"})
+    db_path = os.path.join(input_dir, "rec1", ".catalog.sqlite")
+    catalog = RecordingCatalog(input_dir, db_path, only_recordings=["rec1"])
+    try:
+        catalog.refresh()
+        assert catalog.recordings() == ["rec1"]
+        assert catalog.duplicates("rec1") == [["rec1/124709301_a.json", "rec1/124709302_b.json"]]
+    finally:
+        catalog.close()
+    assert not os.path.exists(os.path.join(input_dir, ".catalog.sqlite"))
@@ -0,0 +1,29 @@
+import logging
+from src import configure
+from src.configure import JsonFormatter, SamplingFilter, setup_logging, shutdown_logging
+
+
+def test_setup_logging_reconfigures_the_running_listener(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    try:
+        logger = setup_logging()
+        listener = configure._listener
+        assert len(logger.handlers) == 1
+        assert not any(isinstance(handler.formatter, JsonFormatter) for handler in listener.handlers)
+
+        setup_logging(config={"log_format": "json", "log_sample_rate": 0.5, "log_levels": {"tester": "warning"}})
+        assert configure._listener is listener  # the handlers are kept
+        assert len(logger.handlers) == 1
+        assert all(isinstance(handler.formatter, JsonFormatter) for handler in listener.handlers)
+        assert [type(f) for f in logger.handlers[0].filters] == [SamplingFilter]
+        assert logging.getLogger("src.configure.tester").level == logging.WARNING
+
+        setup_logging(config={"log_sample_rate": 0.1})
+        assert not any(isinstance(handler.formatter, JsonFormatter) for handler in listener.handlers)
+        assert len(logger.handlers[0].filters) == 1 and logger.handlers[0].filters[0].every == 10
+
+        setup_logging()
+        assert logger.handlers[0].filters == []
+    finally:
+        shutdown_logging()
+        logging.getLogger("src.configure.tester").setLevel(logging.NOTSET)
@@ -0,0 +1,64 @@
+import re
+import pytest
+from deepdiff import DeepDiff, Delta
+from src.dashboard import PAGE_FILE, DiffDashboard
+
+ABSENT = "<td class='absent'>absent</td>"
+
+# One flat dict per Delta action, the value is "out" when it is only in the output and "exp" when only expected
+FLAT_DICTS = {
+    "values_changed": {"path": ["a"], "action": "values_changed", "value": "exp", "old_value": "out"},
+    "type_changes": {"path": ["b"], "action": "type_changes", "value": "exp", "old_value": "out", "type": "str"},
+    "dictionary_item_added": {"path": ["c"], "action": "dictionary_item_added", "value": "exp"},
+    "dictionary_item_removed": {"path": ["d"], "action": "dictionary_item_removed", "value": "out"},
+    "iterable_item_added": {"path": ["e", 0], "action": "iterable_item_added", "value": "exp"},
+    "iterable_item_removed": {"path": ["f", 0], "action": "iterable_item_removed", "value": "out"},
+    "unordered_iterable_item_added": {"path": ["g", 0], "action": "unordered_iterable_item_added", "value": "exp"},
+    "unordered_iterable_item_removed": {"path": ["h", 0], "action": "unordered_iterable_item_removed", "value": "out"},
+    "iterable_items_added_at_indexes": {"path": ["i", 0], "action": "iterable_items_added_at_indexes", "value": "exp"},
+    "iterable_items_removed_at_indexes": {"path": ["j", 0], "action": "iterable_items_removed_at_indexes", "value": "out"},
+    "set_item_added": {"path": ["k"], "action": "set_item_added", "value": "exp"},
+    "set_item_removed": {"path": ["l"], "action": "set_item_removed", "value": "out"},
+    "attribute_added": {"path": ["m"], "action": "attribute_added", "value": "exp"},
+    "attribute_removed": {"path": ["n"], "action": "attribute_removed", "value": "out"},
+}
+
+
+def _render(tmp_path, flat_dicts):
+    report_dir = tmp_path / "recording" / "input_comparison"
+    report_dir.mkdir(parents=True)
+    dashboard = DiffDashboard(str(tmp_path))
+    dashboard.add_request({"request_id": "r1", "diff": flat_dicts}, str(report_dir), "input")
+    page = (report_dir / PAGE_FILE).read_text(encoding="utf-8")
+    rows = re.findall(
+        r"<td class='action'>(\w+)</td>(<td class='(?:absent|output)'>.*?</td>)(<td class='(?:absent|expected)'>.*?</td>)</tr>",
+        page,
+        re.S,
+    )
+    return {action: (output, expected) for action, output, expected in rows}
+
+
+@pytest.mark.parametrize("action", sorted(FLAT_DICTS))
+def test_every_action_renders_its_values_on_the_right_side(tmp_path, action):
+    rows = _render(tmp_path, [FLAT_DICTS[action]])
+    output, expected = rows[action]
+    if "old_value" in FLAT_DICTS[action] or FLAT_DICTS[action]["value"] == "out":
+        assert "&quot;out&quot;" in output
+    else:
+        assert output == ABSENT
+    if FLAT_DICTS[action]["value"] == "exp":
+        assert "&quot;exp&quot;" in expected
+    else:
+        assert expected == ABSENT
+
+
+def test_compare_diff_of_unordered_lists_keeps_output_items_on_the_output_side(tmp_path):
+    output = {"items": ["kept", "only_in_output"], "removed": 1}
+    expected = {"items": ["kept", "only_expected"], "added": 2}
+    diff = DeepDiff(output, expected, ignore_order=True, report_repetition=True)  # like Compare, output first
+    rows = _render(tmp_path, Delta(diff, bidirectional=True).to_flat_dicts())
+    assert "only_in_output" in rows["unordered_iterable_item_removed"][0]
+    assert rows["unordered_iterable_item_removed"][1] == ABSENT
+    assert "only_expected" in rows["unordered_iterable_item_added"][1]
+    assert rows["dictionary_item_removed"][1] == ABSENT
+    assert rows["dictionary_item_added"][0] == ABSENT
@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "tools"))
+
+from dir_utilities import DirUtilities
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(text)
+
+
+def test_saved_digest_cache_drops_stale_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(DirUtilities, "digest_cache", {})
+    monkeypatch.setattr(DirUtilities, "scanned_keys", set())
+    monkeypatch.setattr(DirUtilities, "scanned_roots", set())
+    left, right, cache_path = tmp_path / "left", tmp_path / "right", str(tmp_path / "digests.json")
+    _write(str(left / "rec" / "a.json"), '{"a": 1, "b": 2}')
+    _write(str(right / "rec" / "a.json"), '{"b": 2, "a": 1}')
+    _write(str(right / "rec" / "b.json"), "{}")
+    assert DirUtilities.compare_trees(str(left), str(right), json_semantic=True) == {
+        "added": ["rec/b.json"],
+        "removed": [],
+        "changed": [],
+    }
+    DirUtilities.save_digest_cache(cache_path)
+    with open(cache_path) as file:
+        assert len(json.load(file)) == 3
+
+    # A new run: one file is deleted and one is modified, their old entries are dropped
+    monkeypatch.setattr(DirUtilities, "digest_cache", {})
+    monkeypatch.setattr(DirUtilities, "scanned_keys", set())
+    monkeypatch.setattr(DirUtilities, "scanned_roots", set())
+    os.remove(right / "rec" / "b.json")
+    _write(str(left / "rec" / "a.json"), '{"a": 2, "b": 2, "c": 3}')
+    DirUtilities.load_digest_cache(cache_path)
+    assert len(DirUtilities.digest_cache) == 3
+    assert DirUtilities.compare_trees(str(left), str(right), json_semantic=True)["changed"] == ["rec/a.json"]
+    DirUtilities.save_digest_cache(cache_path)
+    with open(cache_path) as file:
+        saved = {tuple(key)[0]: digest for key, digest in json.load(file)}
+    assert sorted(saved) == sorted(os.path.abspath(path) for path in (left / "rec" / "a.json", right / "rec" / "a.json"))
+    assert saved[os.path.abspath(left / "rec" / "a.json")] == DirUtilities.file_digest(str(left / "rec" / "a.json"), True)
+
+
+def test_saved_digest_cache_keeps_other_trees(tmp_path, monkeypatch):
+    monkeypatch.setattr(DirUtilities, "digest_cache", {})
+    monkeypatch.setattr(DirUtilities, "scanned_keys", set())
+    monkeypatch.setattr(DirUtilities, "scanned_roots", set())
+    cache_path = str(tmp_path / "digests.json")
+    for tree in ("left", "right", "left_other", "right_other"):
+        _write(str(tmp_path / tree / "a.json"), "{}")
+    DirUtilities.compare_trees(str(tmp_path / "left_other"), str(tmp_path / "right_other"))
+    DirUtilities.save_digest_cache(cache_path)
+
+    # A run comparing other trees keeps the cached digests of the first ones
+    for attribute, value in (("digest_cache", {}), ("scanned_keys", set()), ("scanned_roots", set())):
+        monkeypatch.setattr(DirUtilities, attribute, value)
+    DirUtilities.load_digest_cache(cache_path)
+    DirUtilities.compare_trees(str(tmp_path / "left"), str(tmp_path / "right"))
+    DirUtilities.save_digest_cache(cache_path)
+    with open(cache_path) as file:
+        saved = sorted(os.path.relpath(key[0], tmp_path) for key, _ in json.load(file))
+    assert saved == sorted(os.path.join(tree, "a.json") for tree in ("left", "right", "left_other", "right_other"))
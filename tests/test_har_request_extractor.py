@@ -0,0 +1,184 @@
+import io
+import json
+import os
+import sys
+import pytest
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "tools"))
+
+from HAR_request_extractor import (
+    HarFileProcessor,
+    StreamingHarReader,
+    entry_start_time,
+    minimize_requests,
+    recording_names,
+)
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "data", "inputs")
+RECORDING = os.path.join(INPUT_DIR, "full_comparison_with_export_all_reports")
+
+
+def _build(cohort_id, name="cohort"):
+    return "buildCohort", {"messageType": "buildCohort", "cohort": {"id": cohort_id, "name": name}}
+
+
+def _survival(cohort_id, days):
+    return "genReport", {"messageType": "genReport", "cohortId": cohort_id, "report": {"type": "survival", "days": days}}
+
+
+def _requests(*requests):
+    return [(f"{index:09d}", msg_type, json_req, 100) for index, (msg_type, json_req) in enumerate(requests)]
+
+
+def _recorded(file_name):
+    with open(os.path.join(RECORDING, file_name)) as file:
+        json_req = json.load(file)
+    return json_req["messageType"], json_req
+
+
+def test_superseded_reports_are_dropped():
+    requests = _requests(_build("c1"), _survival("c1", 30), _survival("c1", 60))
+    kept, summary = minimize_requests(requests)
+    assert [json_req for _, _, json_req, _ in kept] == [requests[0][2], requests[2][2]]
+    assert summary == {"duplicates": 0, "superseded": 1, "saved_seconds": 0.1}
+
+
+def test_keep_types_match_message_types_and_report_types():
+    requests = _requests(_build("c1"), _survival("c1", 30), _survival("c1", 60), _build("c1", "new"))
+    for keep_types in (["genReport"], ["survival"]):
+        kept, summary = minimize_requests(requests, keep_types)
+        assert len(kept) == 4, keep_types
+        assert summary["superseded"] == 0
+    kept, summary = minimize_requests(requests, ["buildCohort"])
+    assert summary["superseded"] == 1
+
+
+def test_duplicate_builds_and_reports_are_dropped_until_a_rebuild():
+    requests = _requests(
+        _build("c1"), _survival("c1", 30), _build("c1"), _survival("c1", 30), _build("c1", "new"), _survival("c1", 30)
+    )
+    kept, summary = minimize_requests(requests)
+    assert summary["duplicates"] == 2
+    assert [start_time for start_time, _, _, _ in kept] == ["000000000", "000000001", "000000004", "000000005"]
+
+
+def test_recorded_reports_with_cohort_ids_follow_cohort_rebuilds():
+    # genReport requests of the recordings name their cohorts in `cohortIds`
+    msg_type, report = _recorded("124709301_analysisDocument.genReport_age_gender.json")
+    assert report["cohortIds"] and "cohortId" not in report
+    rebuild = ("buildCohort", {"messageType": "buildCohort", "cohort": {"id": report["cohortIds"][0], "name": "x"}})
+    kept, summary = minimize_requests(_requests((msg_type, report), rebuild, (msg_type, report)))
+    assert len(kept) == 3 and summary == {"duplicates": 0, "superseded": 0, "saved_seconds": 0.0}
+    kept, summary = minimize_requests(_requests((msg_type, report), (msg_type, report)))
+    assert len(kept) == 1 and summary["duplicates"] == 1
+
+
+def test_recorded_reports_on_other_cohorts_are_not_superseded():
+    msg_type, report = _recorded("124709301_analysisDocument.genReport_age_gender.json")
+    other = json.loads(json.dumps(report))
+    other["cohortIds"] = ["c_other"]
+    other["report"]["ageBreaks"] = [0, 50, 120]
+    kept, summary = minimize_requests(_requests((msg_type, report), (msg_type, other)))
+    assert len(kept) == 2 and summary["superseded"] == 0
+
+
+def _entry(pageref, started, json_req, method="POST", status=200):
+    return {
+        "pageref": pageref,
+        "startedDateTime": started,
+        "time": 12.5,
+        "request": {"method": method, "url": "https://wiser/api", "postData": {"text": json.dumps(json_req)}},
+        "response": {"status": status, "content": {"text": "ok \u00e9\u4e2d"}},
+    }
+
+
+def _har(pages, entries, entries_first=False):
+    sections = [("entries", entries), ("pages", pages)] if entries_first else [("pages", pages), ("entries", entries)]
+    log = {"version": "1.2", "creator": {"name": "x", "version": 1.5}, "_bytes": 1234567, **dict(sections)}
+    return {"log": log, "_elapsed": 12345.678, "extra": [1e-7, None]}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_streaming_reader_round_trips_across_chunk_boundaries(chunk_size):
+    pages = [{"id": "page_1", "title": "https://wiser/", "pageTimings": {"onLoad": 1234.5678}}]
+    entries = [_entry("page_1", "2024-05-01T12:47:09.301+02:00", {"messageType": "x", "n": 12345678901234}) for _ in range(3)]
+    har = _har(pages, entries)
+    for text in (json.dumps(har), json.dumps(har, indent=2)):
+        items = list(StreamingHarReader(io.StringIO(text), chunk_size).iter_log_items())
+        assert items == [("pages", page) for page in pages] + [("entries", entry) for entry in entries]
+
+
+def test_streaming_reader_rejects_invalid_har():
+    with pytest.raises(ValueError):
+        list(StreamingHarReader(io.StringIO('{"log": {"entries": [{"a": 1} {"b": 2}]}}'), 4).iter_log_items())
+
+
+def test_entry_start_time():
+    assert entry_start_time({"startedDateTime": "2024-05-01T12:47:09.301234+02:00"}) == "124709301"
+    assert entry_start_time({"startedDateTime": "2024-05-01T12:47:09.3Z"}) == "124709300"
+    assert entry_start_time({"startedDateTime": "2024-05-01T12:47:09Z"}) == "124709000"
+
+
+def test_only_successful_posts_of_the_origin_page_are_extracted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the processor logs to ./logs
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"origin": "https://wiser", "input_dir": str(tmp_path / "inputs")}))
+    os.makedirs(tmp_path / "inputs")
+    pages = [{"id": "page_1", "title": "https://other/"}, {"id": "page_2", "title": "https://wiser/"}]
+    entries = [
+        _entry("page_2", "2024-05-01T12:47:09.301Z", {"messageType": "chronicDiseaseCohorts.buildCohort"}),
+        _entry("page_1", "2024-05-01T12:47:10.000Z", {"messageType": "buildCohort"}),
+        _entry("page_2", "2024-05-01T12:47:11.000Z", {"messageType": "buildCohort"}, method="GET"),
+        _entry("page_2", "2024-05-01T12:47:12.000Z", {"messageType": "buildCohort"}, status=500),
+        _entry("page_2", "2024-05-01T12:47:13.000Z", {"messageType": "genReport", "report": {"type": "survival"}}),
+    ]
+    for entries_first in (False, True):  # entries read before the pages are buffered until the page is known
+        har_path = tmp_path / f"rec_{entries_first}.har"
+        har_path.write_text(json.dumps(_har(pages, entries, entries_first)))
+        processor = HarFileProcessor([str(har_path)], str(config_path))
+        stats = processor.process_har_file(str(har_path))
+        assert stats == {"entries": 5, "saved": 2}
+        saved = sorted(os.listdir(tmp_path / "inputs" / har_path.stem))
+        assert saved == ["124709301_buildCohort.json", "124713000_genReport_survival.json"]
+
+
+def test_har_without_the_origin_page_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"origin": "https://wiser", "input_dir": str(tmp_path)}))
+    har_path = tmp_path / "rec.har"
+    har_path.write_text(json.dumps(_har([{"id": "page_1", "title": "https://other/"}], [])))
+    with pytest.raises(ValueError, match="No page titled"):
+        HarFileProcessor([str(har_path)], str(config_path)).process_har_file(str(har_path))
+
+
+def test_recording_names_number_shared_stems_in_path_order():
+    paths = ["b/rec.har", "a/rec.har", "a/other.har", "c/rec.har"]
+    assert recording_names(paths) == [
+        ("a/other.har", "other"),
+        ("a/rec.har", "rec"),
+        ("b/rec.har", "rec_2"),
+        ("c/rec.har", "rec_3"),
+    ]
+    assert recording_names(reversed(paths)) == recording_names(paths)
+
+
+def test_requests_sharing_a_name_are_numbered(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"origin": "https://wiser", "input_dir": str(tmp_path)}))
+    processor = HarFileProcessor([], str(config_path))
+    used_names = set()
+    report = {"messageType": "genReport", "report": {"type": "survival"}}
+    names = [
+        processor.name_request("124709301", "genReport", report, used_names)[0],
+        processor.name_request("124709301", "genReport", report, used_names)[0],
+        processor.name_request("124709301", "buildCohort", {}, used_names)[0],
+        processor.name_request("124709301", "genReport", report, used_names)[0],
+    ]
+    assert names == [
+        "124709301_genReport_survival.json",
+        "124709301_genReport_survival_2.json",
+        "124709301_buildCohort.json",
+        "124709301_genReport_survival_3.json",
+    ]
@@ -0,0 +1,68 @@
+import asyncio
+from src.recovery import SessionRecovery
+from src.request_tracker import RequestTracker
+
+
+class FakeTester:
+    """The parts of WiserTester used by the session recovery, requests are recorded instead of sent."""
+
+    def __init__(self, request_timeout=60):
+        self.config = {}
+        self.request_timeout = request_timeout
+        self.requests = RequestTracker(request_timeout=request_timeout)
+        self.session_id = None
+        self.connected = asyncio.Event()
+        self.sent = []
+
+    def load_request(self, request_path):
+        return {"path": request_path}, request_path
+
+    def prepare_request_data(self, json_request):
+        return json_request, {}
+
+    async def send_request(self, json_request, headers, input_file_name, request_path=None, input_dir=None):
+        new_request_id = f"{request_path}_again"
+        self.requests.add(new_request_id, input_file_name, input_dir, request_path, self.session_id)
+        self.sent.append(request_path)
+        return new_request_id, None
+
+
+async def _reconnect(tester, recovery):
+    recovery.on_connect("sid1")
+    tester.requests.add("recent", "recent", "rec", "recent", "sid1")
+    tester.requests.add("old", "old", "rec", "old", "sid1").sent_at -= tester.request_timeout + 1
+    tester.requests.add("timed_out", "timed_out", "rec", "timed_out", "sid1")
+    tester.requests.time_out("timed_out")
+    tester.requests.add("completed", "completed", "rec", "completed", "sid1")
+    tester.requests.complete("completed")
+    recovery.on_disconnect()
+    recovery.on_connect("sid2")
+    await asyncio.wait_for(tester.connected.wait(), timeout=5)
+
+
+def test_only_recent_in_flight_requests_are_sent_again():
+    tester = FakeTester()
+    recovery = SessionRecovery(tester)
+    asyncio.run(_reconnect(tester, recovery))
+    assert tester.sent == ["recent"]
+    assert recovery.stats()["reissued"] == 1
+    assert tester.requests.in_flight() == ["recent_again"]
+    assert "recent" not in tester.requests
+    assert tester.requests.get("old").timed_out_at is not None
+
+
+def test_same_sid_reconnect_sends_nothing():
+    async def reconnect(tester):
+        recovery = SessionRecovery(tester)
+        recovery.on_connect("sid1")
+        tester.requests.add("recent", "recent", "rec", "recent", "sid1")
+        recovery.on_disconnect()
+        recovery.on_connect("sid1")
+        assert tester.connected.is_set()
+        return recovery
+
+    tester = FakeTester()
+    recovery = asyncio.run(reconnect(tester))
+    assert tester.sent == []
+    assert recovery.stats()["reconnects"] == 1
+    assert tester.requests.in_flight() == ["recent"]
@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+from src.report_dispatcher import ReportDispatcher
+from src.request_tracker import RequestTracker
+from src.tester import WiserTester
+
+
+def test_full_queue_drops_events_and_reports_them():
+    processed, dropped = [], []
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def handler(data):
+            await gate.wait()
+            processed.append(data["id"])
+
+        dispatcher = ReportDispatcher(handler, max_pending=2, workers=1, on_drop=dropped.append)
+        results = [dispatcher.dispatch({"id": str(i)}) for i in range(5)]
+        await asyncio.sleep(0)  # the worker takes the first event, the queue has room for two more
+        results.append(dispatcher.dispatch({"id": "5"}))
+        gate.set()
+        await dispatcher.close()
+        return results, dispatcher.stats()
+
+    results, stats = asyncio.run(run())
+    assert results == [True, True, False, False, False, True]
+    assert [data["id"] for data in dropped] == ["2", "3", "4"]
+    assert processed == ["0", "1", "5"]
+    assert stats["received"] == 6 and stats["processed"] == 3 and stats["dropped"] == 3
+
+
+def test_failing_handler_is_counted():
+    async def handler(data):
+        raise ValueError("bad report")
+
+    async def run():
+        dispatcher = ReportDispatcher(handler, workers=1)
+        dispatcher.dispatch({"id": "1"})
+        await dispatcher.close()
+        return dispatcher.stats()
+
+    stats = asyncio.run(run())
+    assert stats["failed"] == 1 and stats["processed"] == 0
+
+
+def test_dropped_version_report_is_recorded_as_missing():
+    tester = SimpleNamespace(requests=RequestTracker(), missing_outputs=[], report_event=asyncio.Event())
+    tester.requests.add("version", "get_version", None)
+    tester.requests.add("report", "124709301_report", "/inputs/recording")
+    WiserTester._handle_dropped_report(tester, {"id": "version"})
+    WiserTester._handle_dropped_report(tester, {"id": "report"})
+    assert tester.missing_outputs == ["get_version.json", "recording/124709301_report.json"]
+    assert tester.requests.in_flight() == []
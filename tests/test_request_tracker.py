@@ -0,0 +1,59 @@
+import time
+from src.request_tracker import RequestTracker
+
+
+def test_complete_records_latency_and_leaves_flight():
+    tracker = RequestTracker()
+    tracker.add("a", "input_a", "rec")
+    assert tracker.in_flight() == ["a"]
+    record = tracker.complete("a")
+    assert record.latency is not None
+    assert tracker.in_flight() == []
+    assert tracker.stats() == {"in_flight": 0, "retained": 1}
+    assert len(tracker.drain_latencies()) == 1
+
+
+def test_timed_out_request_is_no_longer_in_flight_but_can_complete_late():
+    tracker = RequestTracker()
+    tracker.add("a", "input_a", "rec")
+    tracker.time_out("a")
+    assert tracker.in_flight() == []
+    assert tracker.stats() == {"in_flight": 0, "retained": 1}
+    assert tracker.input_file_name("a") == "input_a"
+    record = tracker.complete("a")  # late report
+    assert record.completed_at is not None
+    assert tracker.stats() == {"in_flight": 0, "retained": 1}
+
+
+def test_timed_out_request_is_evicted_after_the_grace_period():
+    tracker = RequestTracker(grace_period=10)
+    tracker.add("a", "input_a", "rec")
+    tracker.time_out("a")
+    tracker.evict_expired(time.monotonic() + 5)
+    assert "a" in tracker
+    tracker.evict_expired(time.monotonic() + 11)
+    assert "a" not in tracker
+    assert tracker.stats() == {"in_flight": 0, "retained": 0}
+
+
+def test_stale_in_flight_request_is_evicted_after_timeout_and_grace_period():
+    tracker = RequestTracker(grace_period=10, request_timeout=5)
+    tracker.add("a", "input_a", "rec")
+    tracker.add("b", "input_b", "rec")
+    tracker.complete("b")
+    tracker.evict_expired(time.monotonic() + 14)
+    assert tracker.in_flight() == ["a"]
+    tracker.evict_expired(time.monotonic() + 16)
+    assert tracker.in_flight() == []
+    assert "a" not in tracker and "b" not in tracker
+    assert tracker.stats() == {"in_flight": 0, "retained": 0}
+
+
+def test_in_flight_filters_by_session_and_age():
+    tracker = RequestTracker()
+    tracker.add("old", "input_old", "rec", session_id="sid1").sent_at -= 100
+    tracker.add("new", "input_new", "rec", session_id="sid1")
+    tracker.add("other", "input_other", "rec", session_id="sid2")
+    assert sorted(tracker.in_flight("sid1")) == ["new", "old"]
+    assert tracker.in_flight("sid1", max_age=30) == ["new"]
+    assert sorted(tracker.in_flight(max_age=30)) == ["new", "other"]
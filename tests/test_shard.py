@@ -0,0 +1,26 @@
+import asyncio
+import os
+from src.shard import ShardCoordinator, partition_recordings
+
+
+def _coordinator(tmp_path):
+    input_dir, output_dir = tmp_path / "inputs", tmp_path / "outputs"
+    input_dir.mkdir()
+    output_dir.mkdir()
+    config = {"input_dir": str(input_dir), "output_dir": str(output_dir), "catalog_path": str(tmp_path / "catalog.sqlite")}
+    return ShardCoordinator("user", "password", 1, config, [], 2, str(input_dir), str(output_dir))
+
+
+def test_partition_recordings_balances_by_weight():
+    weights = {"a": 5, "b": 3, "c": 2, "d": 1}
+    assert partition_recordings(list(weights), weights, 2) == [["a", "d"], ["b", "c"]]
+    assert partition_recordings(["a"], weights, 3) == [["a"]]
+    assert partition_recordings([], weights, 3) == []
+
+
+def test_run_without_recordings_replays_nothing(tmp_path):
+    coordinator = _coordinator(tmp_path)
+    assert coordinator.plan() == []
+    asyncio.run(coordinator.run())
+    asyncio.run(coordinator.run([]))
+    assert os.listdir(coordinator.output_dir) == []
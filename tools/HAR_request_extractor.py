@@ -2,9 +2,220 @@ import argparse
 import json
 import logging
 import os
+import re
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import freeze_support
 from pathlib import Path
-from haralyzer import HarParser, HarPage
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[:-2]))
+
+from src.catalog import request_cohort_ids
+
+CHUNK_SIZE = 1 << 20  # characters read from the HAR file at a time
+WRITE_BATCH_SIZE = 50  # request files written together
+START_TIME_PATTERN = re.compile(r"T(\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?")
+
+
+class StreamingHarReader:
+    """
+    Incrementally parses a HAR file, yielding its pages and entries one at a time.
+    Only the entry being decoded is held in memory, so memory use is bounded by the largest entry
+    instead of the size of the HAR file.
+    """
+
+    def __init__(self, har_file, chunk_size=CHUNK_SIZE):
+        self.har_file = har_file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_size=0):
+        """Drops the consumed part of the buffer and reads the next chunk. Returns False at the end of the file."""
+        if self.eof:
+            return False
+        chunk = self.har_file.read(max(self.chunk_size, min_size))
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def _peek(self):
+        """Skips whitespace and returns the next character, or an empty string at the end of the file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars):
+        """Consumes the next character, which must be one of `chars`, and returns it."""
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(f"Invalid HAR file, expected one of '{chars}' but found '{char}'")
+        self.pos += 1
+        return char
+
+    def _decode_value(self):
+        """Decodes the next JSON value, reading more of the file until the value is complete."""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number ending at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow the buffer by its unconsumed size, so large values are read in linear time
+            self._fill(len(self.buffer) - self.pos)
+
+    def _iter_object(self):
+        """Yields the keys of the object at the current position, the caller consumes each value."""
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self._decode_value()
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def _iter_array(self):
+        """Yields the decoded items of the array at the current position."""
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            if self._expect(",]") == "]":
+                return
+
+    def iter_log_items(self):
+        """Yields ("pages", page) and ("entries", entry) tuples in file order, other HAR content is skipped."""
+        for key in self._iter_object():
+            if key != "log":
+                self._decode_value()
+                continue
+            for log_key in self._iter_object():
+                if log_key in ("pages", "entries") and self._peek() == "[":
+                    for item in self._iter_array():
+                        yield log_key, item
+                else:
+                    self._decode_value()
+
+
+def is_successful_post(entry):
+    """Checks whether a HAR entry is a POST request with a 2xx response."""
+    status = entry.get("response", {}).get("status", 0)
+    return entry.get("request", {}).get("method") == "POST" and 200 <= status < 300
+
+
+def entry_start_time(entry):
+    """Formats the start time of a HAR entry as HHMMSSmmm, in the time zone it was recorded in."""
+    match = START_TIME_PATTERN.search(entry.get("startedDateTime", ""))
+    hours, minutes, seconds, fraction = match.groups()
+    return f"{hours}{minutes}{seconds}{(fraction or '')[:3].ljust(3, '0')}"
+
+
+def request_report_type(msg_type, json_req):
+    """Returns the report type of a genReport request, None for other requests."""
+    return json_req.get("report", {}).get("type") if "genReport" in msg_type else None
+
+
+def minimize_requests(requests, keep_types=()):
+    """
+    Drops requests that don't change what a replay covers.
+    - exact duplicates: a request identical to an earlier one, with no build of its cohorts in between.
+    - superseded reports: a genReport followed by a genReport of the same cohorts and report type, with no other
+      request on those cohorts in between (e.g. a report re-run while tweaking its parameters in the UI).
+    Requests whose message type or report type is in `keep_types` are always kept.
+    Args:
+        requests (list): (start time, message type, request data, duration in ms) tuples in recording order.
+        keep_types (iterable): Message types and report types that are never dropped.
+    Returns:
+        tuple: The kept requests, and a summary of the dropped requests and their estimated replay time.
+    """
+    keep_types = set(keep_types)
+    epochs = {}  # cohort ID -> number of builds so far
+    last_build = {}  # cohort ID -> payload of its last build
+    last_touch = {}  # cohort ID -> index of the last request using it
+    seen = set()  # (payload, cohort epochs) of the requests kept so far
+    request_keys = {}  # request index -> its key in `seen`
+    dropped = {}  # request index -> reason
+
+    for index, (_, msg_type, json_req, _) in enumerate(requests):
+        cohorts = frozenset(request_cohort_ids(json_req))
+        report_type = request_report_type(msg_type, json_req)
+        payload = json.dumps(json_req, sort_keys=True)
+        keep = msg_type in keep_types or report_type in keep_types
+
+        if msg_type.startswith("build"):
+            if not keep and cohorts and all(last_build.get(cohort) == payload for cohort in cohorts):
+                dropped[index] = "duplicate"
+                continue
+            for cohort in cohorts:
+                epochs[cohort] = epochs.get(cohort, 0) + 1
+                last_build[cohort] = payload
+        else:
+            key = (payload, tuple(sorted((cohort, epochs.get(cohort, 0)) for cohort in cohorts)))
+            if not keep and key in seen:
+                dropped[index] = "duplicate"
+                continue
+            seen.add(key)
+            request_keys[index] = key
+
+        previous = {last_touch.get(cohort) for cohort in cohorts}
+        if report_type and not keep and len(previous) == 1 and None not in previous:
+            prev_index = previous.pop()
+            _, prev_type, prev_req, _ = requests[prev_index]
+            same_report = prev_type == msg_type and request_report_type(prev_type, prev_req) == report_type
+            if same_report and frozenset(request_cohort_ids(prev_req)) == cohorts:
+                dropped[prev_index] = "superseded"
+                # A later copy of the superseded request is not a duplicate of anything that will be replayed
+                seen.discard(request_keys.pop(prev_index, None))
+        for cohort in cohorts:
+            last_touch[cohort] = index
+
+    summary = {
+        "duplicates": sum(1 for reason in dropped.values() if reason == "duplicate"),
+        "superseded": sum(1 for reason in dropped.values() if reason == "superseded"),
+        "saved_seconds": round(sum(requests[index][3] or 0 for index in dropped) / 1000, 3),
+    }
+    kept = [request for index, request in enumerate(requests) if index not in dropped]
+    return kept, summary
+
+
+def recording_names(har_paths):
+    """
+    Assigns each HAR file the name of its recording folder, the stem of the file.
+    HAR files sharing a stem are numbered in sorted path order, so the assignment doesn't depend on input order.
+    Returns:
+        list: (HAR path, recording name) tuples sorted by path.
+    """
+    names, seen = [], {}
+    for har_path in sorted(har_paths):
+        stem = Path(har_path).stem
+        seen[stem] = seen.get(stem, 0) + 1
+        names.append((har_path, stem if seen[stem] == 1 else f"{stem}_{seen[stem]}"))
+    return names
+
+
+def _process_har_in_worker(har_path, rec_name, config_path, output_dir, excluded_request_types, minimize, keep_types):
+    """Worker process entry point, extracts one HAR file."""
+    processor = HarFileProcessor([har_path], config_path, output_dir, excluded_request_types, minimize, keep_types)
+    return processor.process_har_file(har_path, rec_name)
 
 
 class HarFileProcessor:
@@ -15,15 +226,22 @@ class HarFileProcessor:
         har_input (list): The HAR file list to be processed.
         config_path (str): The path to the config file.
         excluded_request_types (list): list of request types to ignore
+        minimize (bool): drop duplicate and superseded requests before saving
+        keep_types (list): message types and report types that minimization never drops
     """
 
-    def __init__(self, har_input, config_path="config.json", output_dir=None, excluded_request_types=None):
+    def __init__(
+        self, har_input, config_path="config.json", output_dir=None, excluded_request_types=None, minimize=False, keep_types=None
+    ):
         with open(config_path, "r") as config_file:
             self.config = json.load(config_file)
+        self.config_path = config_path
         self.har_input = har_input
         self.output_dir = output_dir or self.config.get("input_dir")
         self.page_title = f'{self.config.get("origin")}/'
         self.excluded_request_types = excluded_request_types or []
+        self.minimize = minimize
+        self.keep_types = keep_types or []
         self.logger = self.setup_logger()
 
     def setup_logger(self):
@@ -32,6 +250,8 @@ class HarFileProcessor:
             os.mkdir("logs")
         logger = logging.getLogger(__name__)
         logger.setLevel(logging.INFO)
+        if logger.handlers:  # already set up by another processor in this process
+            return logger
         formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
 
         stdout_handler = logging.StreamHandler(sys.stdout)
@@ -46,51 +266,158 @@ class HarFileProcessor:
         logger.addHandler(stdout_handler)
         return logger
 
-    def make_dir(self, file_path):
+    def make_dir(self, rec_name):
         """Creates a directory for storing processed files, if it does not already exist."""
-        path = os.path.join(self.output_dir, Path(file_path).stem)
+        path = os.path.join(self.output_dir, rec_name)
         if not os.path.isdir(path):
             os.mkdir(path)
             self.logger.info(f"Created dir {path}")
         return path
 
-    def save_request_file(self, dir, json_data, file_name):
-        """Saves processed request data to a JSON file."""
-        new_req_path = os.path.join(dir, file_name)
-        with open(new_req_path, "w") as file:
-            json.dump(json_data, file, indent=2)
-        self.logger.info(f"Saved file {new_req_path}")
-        return new_req_path
-
-    def process_har_file(self, file_path):
-        """Processes the HAR file, extracting and saving POST request data."""
-        har_parser = HarParser.from_file(file_path)
-
-        self.logger.info(har_parser.hostname)
-        new_rec_dir = self.make_dir(file_path)
-        pages = {}
-        for page in har_parser.pages:
-            page_id = page.page_id
-            pages[page.title] = page_id
-            self.logger.info(f"id: {page_id}, title: {page.title}")
-
-        har_page = HarPage(pages[self.page_title], har_parser=har_parser)
-        entries = har_page.filter_entries(request_type="POST", status_code="2.*")
-        for entry in entries:
-            req_txt = entry.request.text
-            json_req = json.loads(req_txt)
+    def save_request_files(self, dir, batch):
+        """Saves a batch of processed requests, given as (file name, request data) tuples, to JSON files."""
+        for file_name, json_data in batch:
+            with open(os.path.join(dir, file_name), "w") as file:
+                json.dump(json_data, file, indent=2)
+        self.logger.info(f"Saved {len(batch)} files to {dir}: {[file_name for file_name, _ in batch]}")
+
+    def process_har_file(self, file_path, rec_name=None):
+        """
+        Processes the HAR file, extracting and saving POST request data of the origin page.
+        The HAR is parsed incrementally and request files are written in batches as the entries are read. Only POST
+        entries read before the origin page is known are buffered, holding just their start time and request text.
+        With minimization enabled, the requests are collected and minimized before any file is written.
+        Args:
+            file_path (str): Path of the HAR file.
+            rec_name (str, optional): Name of the recording folder, defaults to the stem of the HAR file.
+        Returns:
+            dict: The number of entries read and of request files saved.
+        """
+        new_rec_dir = self.make_dir(rec_name or Path(file_path).stem)
+        page_id = None
+        pending = []  # (pageref, start time, request text, duration) of POST entries read before the pages
+        collected = []  # requests waiting for minimization
+        batch, used_names = [], set()
+        stats = {"entries": 0, "saved": 0}
+
+        def add_request(start_time, msg_type, json_req):
+            batch.append(self.name_request(start_time, msg_type, json_req, used_names))
+            stats["saved"] += 1
+            if len(batch) >= WRITE_BATCH_SIZE:
+                self.save_request_files(new_rec_dir, batch)
+                batch.clear()
+
+        def read_request(start_time, request_text, duration):
+            json_req = json.loads(request_text)
             msg_type = json_req.get("messageType").replace("chronicDiseaseCohorts.", "")
-            if "genReport" in msg_type:
-                report_type = json_req.get("report").get("type")
-                name = f'{entry.startTime.strftime("%H%M%S%f")[:-3]}_{msg_type}_{report_type}.json'
+            if msg_type in self.excluded_request_types:
+                return
+            if self.minimize:
+                collected.append((start_time, msg_type, json_req, duration))
             else:
-                name = f'{entry.startTime.strftime("%H%M%S%f")[:-3]}_{msg_type}.json'
-            if msg_type not in self.excluded_request_types:
-                self.save_request_file(new_rec_dir, json_req, name)
+                add_request(start_time, msg_type, json_req)
+
+        with open(file_path, "r", encoding="utf-8-sig") as har_file:
+            for section, item in StreamingHarReader(har_file).iter_log_items():
+                if section == "pages":
+                    self.logger.info(f"id: {item.get('id')}, title: {item.get('title')}")
+                    if item.get("title") == self.page_title:
+                        page_id = item.get("id")  # the last page with the origin title is used
+                    continue
+                stats["entries"] += 1
+                if is_successful_post(item):
+                    request_text = item["request"].get("postData", {}).get("text")
+                    request = (item.get("pageref"), entry_start_time(item), request_text, item.get("time"))
+                    if page_id is None:
+                        pending.append(request)
+                    elif request[0] == page_id:
+                        read_request(*request[1:])
+
+        if page_id is None:
+            raise ValueError(f"No page titled {self.page_title} found in {file_path}")
+        for pageref, start_time, request_text, duration in pending:
+            if pageref == page_id:
+                read_request(start_time, request_text, duration)
+
+        if self.minimize:
+            kept, summary = minimize_requests(collected, self.keep_types)
+            self.logger.info(
+                f"Minimized {file_path}: dropped {summary['duplicates']} duplicate and {summary['superseded']} superseded "
+                f"requests, saving an estimated {summary['saved_seconds']}s of replay time"
+            )
+            for start_time, msg_type, json_req, _ in kept:
+                add_request(start_time, msg_type, json_req)
+        if batch:
+            self.save_request_files(new_rec_dir, batch)
+        return stats
+
+    def name_request(self, start_time, msg_type, json_req, used_names):
+        """
+        Names a POST request after its start time and type.
+        Requests sharing a name within the recording are numbered in the order they were read.
+        Returns:
+            tuple: (file name, request data).
+        """
+        if "genReport" in msg_type:
+            report_type = json_req.get("report").get("type")
+            stem = f"{start_time}_{msg_type}_{report_type}"
+        else:
+            stem = f"{start_time}_{msg_type}"
+        name, index = f"{stem}.json", 1
+        while name in used_names:
+            index += 1
+            name = f"{stem}_{index}.json"
+        used_names.add(name)
+        return name, json_req
 
-    def process_files(self):
-        for har_path in self.har_input:
-            self.process_har_file(har_path)
+    def process_files(self, workers=1):
+        """
+        Processes all HAR files, in parallel worker processes when `workers` is more than 1.
+        Progress and throughput are logged as each HAR file completes.
+        """
+        names = recording_names(self.har_input)
+        started = time.monotonic()
+        totals = {"entries": 0, "saved": 0}
+        done = []
+
+        def report(har_path, stats):
+            for key in totals:
+                totals[key] += stats[key]
+            elapsed = max(time.monotonic() - started, 1e-9)  # the clock may not have ticked for tiny files
+            self.logger.info(
+                f"Processed {har_path}: {stats['saved']} requests from {stats['entries']} entries "
+                f"({len(done)}/{len(names)} files, {totals['entries'] / elapsed:.0f} entries/s)"
+            )
+
+        if workers > 1 and len(names) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(
+                        _process_har_in_worker,
+                        har_path,
+                        rec_name,
+                        self.config_path,
+                        self.output_dir,
+                        self.excluded_request_types,
+                        self.minimize,
+                        self.keep_types,
+                    ): har_path
+                    for har_path, rec_name in names
+                }
+                for future in as_completed(futures):
+                    done.append(futures[future])
+                    report(futures[future], future.result())
+        else:
+            for har_path, rec_name in names:
+                stats = self.process_har_file(har_path, rec_name)
+                done.append(har_path)
+                report(har_path, stats)
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.logger.info(
+            f"Saved {totals['saved']} requests from {totals['entries']} entries in {elapsed:.1f}s "
+            f"({totals['entries'] / elapsed:.0f} entries/s)"
+        )
 
 
 def find_har_files(dir):
@@ -108,6 +435,11 @@ def main():
     parser.add_argument("--output", help="The desired location of the output")
     parser.add_argument("--config", required=True, help="Path to the configuration file")
     parser.add_argument("--exclude_request_types", nargs="*", help="List of request types to exclude from saving", default=[])
+    parser.add_argument("--minimize", action="store_true", help="Drop duplicate and superseded requests before saving")
+    parser.add_argument(
+        "--keep_request_types", nargs="*", help="Message or report types that minimization never drops", default=[]
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Number of HAR files to process in parallel")
 
     args = parser.parse_args()
     paths = []
@@ -124,9 +456,12 @@ def main():
         config_path=args.config,
         output_dir=args.output,
         excluded_request_types=args.exclude_request_types,
+        minimize=args.minimize,
+        keep_types=args.keep_request_types,
     )
-    processor.process_files()
+    processor.process_files(args.workers)
 
 
 if __name__ == "__main__":
+    freeze_support()  # required for worker processes in the PyInstaller executable
     main()
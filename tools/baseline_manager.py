@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[:-2]))
+
+from src.baseline import BaselineStore
+from src.configure import setup_logging
+from src.utils import load_json_file, save_json_file
+
+
+def print_versions(store):
+    """Prints the stored versions, oldest first, marking the current expectations."""
+    for manifest in store.versions():
+        marker = "*" if manifest["version"] == store.index["current"] else " "
+        kind = "snapshot" if manifest["snapshot"] else f"delta of {manifest['parent']}"
+        print(f"{marker} {manifest['version']}  {manifest['created']}  {len(manifest['outputs'])} outputs, {kind} {manifest['stored']}")
+
+
+def main():
+    """Main function to promote, roll back and compare expectation baselines."""
+    parser = argparse.ArgumentParser(description="Manage the baselines of expected outputs, one per Wiser version.")
+    parser.add_argument("--config", required=True, help="Path to the configuration file")
+    parser.add_argument("--store", help="Baseline store directory, defaults to the `baseline_dir` config key")
+    parser.add_argument("--expected_dir", help="Location of expectations, defaults to the config")
+    parser.add_argument("--list", action="store_true", help="List the stored versions")
+    parser.add_argument(
+        "--promote",
+        nargs="?",
+        const="",
+        metavar="OUTPUT_DIR",
+        help="Store a run's outputs as a new version and make them the expectations, defaults to the config output_dir",
+    )
+    parser.add_argument("--name", help="Version name for --promote, defaults to the Wiser version of the run")
+    parser.add_argument(
+        "--rollback",
+        nargs="?",
+        const="",
+        metavar="VERSION",
+        help="Make a stored version the expectations, defaults to the version promoted before the current one",
+    )
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two stored versions")
+    parser.add_argument("--report", help="Save the --compare differences to this JSON file")
+
+    args = parser.parse_args()
+    setup_logging()
+    config = load_json_file(args.config)
+    store = BaselineStore(
+        args.store or config.get("baseline_dir", os.path.join("data", "baselines")),
+        config.get("baseline_snapshot_interval", 30),
+        config,
+    )
+    expected_dir = args.expected_dir or config["expected_dir"]
+
+    if args.promote is not None:
+        version = store.promote(args.promote or config["output_dir"], expected_dir, args.name)
+        print(f"Promoted version {version} to {expected_dir}")
+
+    if args.rollback is not None:
+        version = store.rollback(expected_dir, args.rollback or None)
+        print(f"Rolled back {expected_dir} to version {version}")
+
+    if args.compare:
+        result = store.compare(*args.compare, config.get("ignore_paths", []))
+        for output in result["added"]:
+            print(f"added: {output}")
+        for output in result["removed"]:
+            print(f"removed: {output}")
+        for output, flat_dicts in result["changed"].items():
+            print(f"changed: {output} ({len(flat_dicts)} differences)")
+        if args.report:
+            save_json_file(result, args.report)
+            print(f"Differences saved to {args.report}")
+
+    if args.list:
+        print_versions(store)
+
+
+if __name__ == "__main__":
+    main()
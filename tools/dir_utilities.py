@@ -1,10 +1,18 @@
 import argparse
 import filecmp
+import hashlib
+import json
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 
 class DirUtilities:
+    # (absolute path, size, mtime, json_semantic) -> digest, shared by all comparisons of the process
+    digest_cache = {}
+    scanned_keys = set()  # cache keys of the files seen by the scans of this process
+    scanned_roots = set()  # absolute roots scanned by this process, their entries not seen by the scans are stale
+
     class dircmp(filecmp.dircmp):
         def phase3(self):
             fcomp = filecmp.cmpfiles(self.left, self.right, self.common_files, shallow=False)
@@ -21,6 +29,79 @@ class DirUtilities:
             DirUtilities.dir_is_same(os.path.join(dir1, subdir), os.path.join(dir2, subdir)) for subdir in compared.common_dirs
         )
 
+    @staticmethod
+    def file_digest(path, json_semantic=False):
+        """
+        Returns the SHA-1 digest of a file. In JSON-semantic mode, JSON files are hashed in a canonical form so
+        whitespace and key order don't matter; files that aren't valid JSON are hashed byte for byte.
+        """
+        with open(path, "rb") as file:
+            content = file.read()
+        if json_semantic and path.endswith(".json"):
+            try:
+                content = json.dumps(json.loads(content), sort_keys=True, separators=(",", ":")).encode()
+            except ValueError:
+                pass
+        return hashlib.sha1(content).hexdigest()
+
+    @classmethod
+    def digest_tree(cls, root, workers=8, json_semantic=False):
+        """
+        Returns the digest of every file under `root`, keyed by relative path.
+        Files unchanged since they were last hashed (same size and modification time) are taken from the cache,
+        the others are hashed in a thread pool.
+        """
+        keys = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.abspath(os.path.join(dirpath, filename))
+                stat = os.stat(path)
+                keys[os.path.relpath(path, os.path.abspath(root))] = (path, stat.st_size, stat.st_mtime_ns, json_semantic)
+        cls.scanned_roots.add(os.path.abspath(root))
+        cls.scanned_keys.update(keys.values())
+        missing = [key for key in keys.values() if key not in cls.digest_cache]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            digests = executor.map(lambda key: cls.file_digest(key[0], json_semantic), missing)
+            cls.digest_cache.update(zip(missing, digests))
+        return {rel_path: cls.digest_cache[key] for rel_path, key in keys.items()}
+
+    @classmethod
+    def compare_trees(cls, dir1, dir2, workers=8, json_semantic=False):
+        """
+        Compares two directory trees by file digest.
+        Returns:
+            dict: Sorted relative paths of the files only in `dir2` ("added"), only in `dir1` ("removed"),
+            and in both with different content ("changed").
+        """
+        left = cls.digest_tree(dir1, workers, json_semantic)
+        right = cls.digest_tree(dir2, workers, json_semantic)
+        return {
+            "added": sorted(right.keys() - left.keys()),
+            "removed": sorted(left.keys() - right.keys()),
+            "changed": sorted(path for path in left.keys() & right.keys() if left[path] != right[path]),
+        }
+
+    @classmethod
+    def load_digest_cache(cls, cache_path):
+        if os.path.exists(cache_path):
+            with open(cache_path, "r") as file:
+                cls.digest_cache.update((tuple(key), digest) for key, digest in json.load(file))
+
+    @classmethod
+    def save_digest_cache(cls, cache_path):
+        """
+        Saves the cached digests. Entries under the trees scanned in this run that the scans didn't see, of deleted
+        or modified files, are dropped; entries of other trees are kept for their next comparison.
+        """
+        roots = tuple(os.path.join(root, "") for root in cls.scanned_roots)
+        entries = [
+            [list(key), digest]
+            for key, digest in cls.digest_cache.items()
+            if key in cls.scanned_keys or not key[0].startswith(roots)
+        ]
+        with open(cache_path, "w") as file:
+            json.dump(entries, file)
+
     @staticmethod
     def clear_directories(directories, keep_gitkeep=False):
         for directory in directories:
@@ -40,12 +121,29 @@ class DirUtilities:
         parser.add_argument("--compare", nargs=2, help="Compare two directories.")
         parser.add_argument("--clear", nargs="+", help="Clear specified directories.")
         parser.add_argument("--keep-gitkeep", action="store_true", help="Keep .gitkeep files when clearing directories.")
+        parser.add_argument("--fast", action="store_true", help="Compare by file digests and list every difference.")
+        parser.add_argument(
+            "--json_semantic", action="store_true", help="With --fast, ignore whitespace and key order in JSON files."
+        )
+        parser.add_argument("--workers", type=int, default=8, help="Number of hashing threads for --fast.")
+        parser.add_argument("--digest_cache", help="File keeping the --fast digests between runs.")
 
         args = parser.parse_args()
 
         if args.compare:
             dir1, dir2 = args.compare
-            is_same = cls.dir_is_same(dir1, dir2)
+            if args.fast:
+                if args.digest_cache:
+                    cls.load_digest_cache(args.digest_cache)
+                differences = cls.compare_trees(dir1, dir2, args.workers, args.json_semantic)
+                if args.digest_cache:
+                    cls.save_digest_cache(args.digest_cache)
+                for kind, paths in differences.items():
+                    for path in paths:
+                        print(f"{kind}: {path}")
+                is_same = not any(differences.values())
+            else:
+                is_same = cls.dir_is_same(dir1, dir2)
             print(f"Directories are {'the same' if is_same else 'different'}.")
 
         if args.clear:
@@ -59,5 +157,6 @@ if __name__ == "__main__":
 """
 example usage commands
 python dir_utilities.py --compare "data/expectations" "data/outputs" 
+python dir_utilities.py --compare "data/expectations" "data/outputs" --fast --json_semantic --digest_cache .digests.json
 python dir_utilities.py --clear "data/comparison_reports" "data/outputs" --keep-gitkeep 
 """
@@ -1,4 +1,3 @@
-import json
 import os
 import sys
 from datetime import datetime
@@ -7,6 +6,9 @@ import sys
 
 sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[:-2]))
 
+from src.bulk_edit import bulk_patch, escape_token
+from src.catalog import CATALOG_FILE, RecordingCatalog
+from src.configure import setup_logging
 from src.utils import load_json_file, save_json_file
 
 
@@ -17,26 +19,15 @@ def setup_directory(directory):
     return directory
 
 
-def load_template(template_path):
-    """Load a JSON request folder template."""
-    templates = [os.path.join(template_path, f) for f in os.listdir(template_path) if f.endswith(".json")]
-    return {os.path.splitext(os.path.basename(f))[0]: json.load(open(f, "r")) for f in templates}
-
-
-def modify_request(data, modifications):
-    """Modify the JSON data based on user inputs."""
-    for file, value in modifications.items():
-        if file in data:
-            data[file] = value
-    return data
-
-
-def load_and_modify_request(file_path, modifications):
-    """Load existing requests, modify them, and save back."""
-    data = load_json_file(file_path)
-    modified_data = modify_request(data, modifications)
-    save_json_file(modified_data, file_path)
-    print(f"Modified and saved {file_path} with updates.")
+def load_template(template_path, report_types="all"):
+    """
+    Load a JSON request folder template.
+    Only the templates whose name contains one of `report_types` are read, unless it is "all".
+    """
+    names = [os.path.splitext(f)[0] for f in os.listdir(template_path) if f.endswith(".json")]
+    if report_types != "all":
+        names = [name for name in names if any(report_type in name for report_type in report_types)]
+    return {name: load_json_file(os.path.join(template_path, f"{name}.json")) for name in names}
 
 
 def save_request(data, directory, identifier):
@@ -74,10 +65,11 @@ def main():
     """Main function to handle user input for creating, modifying, or managing requests."""
     parser = argparse.ArgumentParser(description="Manage JSON request bundles based on user inputs.")
     parser.add_argument("--template", help="Path to the folder of JSON template files", required=False)
-    parser.add_argument("--directory", help="Output directory to manage the requests", required=True)
+    parser.add_argument("--directory", nargs="+", help="Output directories to manage the requests", required=True)
     parser.add_argument("--copy_all", help="Flag to copy all files from the template directory", action="store_true")
     parser.add_argument("--add", nargs="+", help="List of file names to add from the template", default=[])
     parser.add_argument("--remove", nargs="+", help="List of file names to remove from the directory", default=[])
+    parser.add_argument("--find_duplicates", help="List requests with identical content in the directory", action="store_true")
     parser.add_argument(
         "--modify",
         nargs=2,
@@ -86,32 +78,44 @@ def main():
         action="append",
         default=[],
     )
+    parser.add_argument("--patch", help="JSON file with a list of patch operations to apply to the requests")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes for --modify and --patch")
+    parser.add_argument("--dry_run", help="Print the changes of --modify and --patch without writing", action="store_true")
 
     args = parser.parse_args()
+    setup_logging()
 
-    directory = setup_directory(args.directory)
+    directories = [setup_directory(directory) for directory in args.directory]
 
     if args.template:
-        templates = load_template(args.template)
-
-    if args.copy_all:
-        add_files_to_directory(templates, "all", directory)
-
-    if args.add:
-        add_files_to_directory(templates, args.add, directory)
-
-    if args.remove:
-        remove_files_from_directory(args.remove, directory)
-
-    if args.modify:
-        modifications = dict(args.modify)
-        for filename in os.listdir(directory):
-            if filename.endswith(".json"):
-                filepath = os.path.join(directory, filename)
-                with open(filepath, "r") as file:
-                    data = json.load(file)
-                modified_data = modify_request(data, modifications)
-                save_request(modified_data, directory, filename)
+        templates = load_template(args.template, "all" if args.copy_all else args.add)
+
+    for directory in directories:
+        if args.copy_all:
+            add_files_to_directory(templates, "all", directory)
+
+        if args.add:
+            add_files_to_directory(templates, args.add, directory)
+
+        if args.remove:
+            remove_files_from_directory(args.remove, directory)
+
+        if args.find_duplicates:
+            # The catalog is kept in the directory itself, only its own recording is scanned
+            input_dir, recording = os.path.split(os.path.abspath(directory))
+            catalog = RecordingCatalog(input_dir, os.path.join(directory, CATALOG_FILE), only_recordings=[recording])
+            catalog.refresh()
+            for group in catalog.duplicates(recording):
+                print(f"Identical requests: {', '.join(group)}")
+            catalog.close()
+
+    operations = [{"op": "replace", "path": f"/{escape_token(key)}", "value": value} for key, value in args.modify]
+    if args.patch:
+        operations += load_json_file(args.patch)
+    if operations:
+        summary = bulk_patch(directories, operations, args.workers, args.dry_run)
+        action = "Would modify" if args.dry_run else "Modified"
+        print(f"{action} {summary['changed']} of {summary['scanned']} requests.")
 
 
 if __name__ == "__main__":
@@ -1,12 +1,15 @@
 import asyncio
-from src.configure import LOGGER
+import multiprocessing
+from src.configure import LOGGER, setup_logging
 from src.exceptions import handle_exceptions
-from src.compare import Compare
-from src.tester import WiserTester
 from src.utils import load_json_file
 from src.arg_parser import parse_args
+from src.profiler import PhaseProfiler
 import contextlib
 
+# The replay (socketio, httpx) and comparison (deepdiff) modules are imported by the code paths that need them,
+# so a --compare_only or --no_comparison run doesn't pay for loading the other side.
+
 
 def load_configuration(file_path):
     """Load configuration from a JSON file."""
@@ -14,13 +17,35 @@ def load_configuration(file_path):
 
 
 @handle_exceptions("An unexpected error occurred during the test", False)
-async def run_tests_and_comparison(config, args, tester):
+async def run_tests_and_comparison(config, args, tester, profiler):
     """Run tests and comparisons based on provided arguments."""
     specific_list = args.specific_inputs
+    if len(args.config) > 1:
+        await run_fan_out(args, profiler)
+        return
     if not args.compare_only:
-        await tester.start_testing(specific_list)
+        if args.shards > 1:
+            from src.shard import ShardCoordinator
+
+            coordinator = ShardCoordinator(
+                args.username,
+                args.password,
+                args.request_timeout,
+                config,
+                args.exclude_inputs,
+                args.shards,
+                args.input_dir,
+                args.output_dir,
+                args.report_types,
+                args.select,
+            )
+            await coordinator.run(specific_list)
+        else:
+            await tester.start_testing(specific_list, args.soak_duration, args.soak_iterations)
     if not args.no_comparison:
         LOGGER.info("Comparing outputs")
+        from src.compare import Compare
+
         comparison = Compare(
             config=config,
             reports_path=args.comparison_reports,
@@ -28,15 +53,70 @@ async def run_tests_and_comparison(config, args, tester):
             output_dir=args.output_dir,
             expected_dir=args.expected_dir,
             specific_list=specific_list,
+            profiler=profiler,
         )
-        report_paths = comparison.compare_outputs_with_expectations(args.no_preprocessing)
+        with profiler.phase("compare"):
+            report_paths = comparison.compare_outputs_with_expectations(args.no_preprocessing)
         LOGGER.info(f"Comparison reports: {report_paths}")
 
 
+async def run_fan_out(args, profiler):
+    """Replays the recordings against every configured environment concurrently, then compares the environments."""
+    from src.fanout import EnvironmentFanOut, environment_name
+
+    configs = {environment_name(path): load_configuration(path) for path in args.config}
+    if len(configs) < len(args.config):
+        raise ValueError(f"Config files must have distinct names, got {args.config}")
+    fan_out = EnvironmentFanOut(
+        args.username,
+        args.password,
+        args.request_timeout,
+        configs,
+        args.exclude_inputs,
+        args.input_dir,
+        args.output_dir,
+        args.report_types,
+        args.select,
+        args.shards,
+    )
+    environments = list(configs)
+    if not args.compare_only:
+        with profiler.phase("replay", monitor_loop=True):
+            environments = await fan_out.run(args.specific_inputs, args.soak_duration, args.soak_iterations)
+    if not args.no_comparison:
+        LOGGER.info("Comparing environments")
+        with profiler.phase("compare"):
+            parity_path = fan_out.compare(
+                environments, args.comparison_reports, args.expected_dir, args.specific_inputs, args.no_preprocessing
+            )
+        LOGGER.info(f"Environment parity report: {parity_path}")
+
+
+def create_tester(config, args, profiler):
+    """Creates the tester for a single process replay, or returns None if this run doesn't replay in this process."""
+    if args.compare_only or args.shards > 1 or len(args.config) > 1:
+        return None
+    from src.tester import WiserTester
+
+    return WiserTester(
+        args.username,
+        args.password,
+        args.request_timeout,
+        config,
+        args.exclude_inputs,
+        args.input_dir,
+        args.output_dir,
+        args.report_types,
+        args.select,
+        profiler,
+    )
+
+
 async def shutdown(loop, tester):
     """Gracefully shut down asynchronous operations and close the event loop."""
-    LOGGER.info("Closing client sessions...")
-    await tester.close()
+    if tester is not None:
+        LOGGER.info("Closing client sessions...")
+        await tester.close()
 
     LOGGER.info("Cancelling outstanding tasks...")
     tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
@@ -49,17 +129,21 @@ async def shutdown(loop, tester):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # required for worker processes in the PyInstaller executable
     args = parse_args()
-    config = load_configuration(args.config)
-    tester = WiserTester(
-        args.username, args.password, args.request_timeout, config, args.exclude_inputs, args.input_dir, args.output_dir
-    )
+    setup_logging()  # errors loading the configuration are logged
+    config = load_configuration(args.config[0])  # the first environment's config, when several are given
+    setup_logging(config=config)
+    profiler = PhaseProfiler(args.profile)
+    profiler.start()
+    tester = create_tester(config, args, profiler)
     loop = asyncio.get_event_loop()
 
     try:
-        loop.run_until_complete(run_tests_and_comparison(config, args, tester))
+        loop.run_until_complete(run_tests_and_comparison(config, args, tester, profiler))
     except KeyboardInterrupt:
         LOGGER.info("KeyboardInterrupt caught in main")
     finally:
         loop.run_until_complete(shutdown(loop, tester))
         loop.close()
+        profiler.save(args.comparison_reports)